@@ -0,0 +1,66 @@
+"""Program cache benchmark: runs the same snippet many times with and without
+lisp.cache, and loads a large parsed program from a cold disk cache.
+
+Usage: python -m benchmarks.bench_cache [--runs N] [--forms N]
+"""
+import argparse
+import tempfile
+import time
+from typing import List
+
+from lisp import cache, env, leval, lexer, parser
+
+SNIPPET = """
+(define sqr (lambda (x) (* x x)))
+(define odd (lambda (x) (= 1 (% x 2))))
+(if (odd 3) (sqr 12) (sqr 13))
+"""
+
+
+def run_uncached(runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        environment = env.new()
+        for form in parser.parse_iter(lexer.tokenize(SNIPPET)):
+            leval.evaluate(form, environment)
+    return time.perf_counter() - start
+
+
+def run_cached(runs: int) -> float:
+    program_cache = cache.ProgramCache()
+    start = time.perf_counter()
+    for _ in range(runs):
+        program_cache.evaluate(SNIPPET, env.new())
+    return time.perf_counter() - start
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=10000)
+    arg_parser.add_argument("--forms", type=int, default=20000)
+    args = arg_parser.parse_args(argv)
+
+    uncached = run_uncached(args.runs)
+    cached = run_cached(args.runs)
+    print("snippet x {}".format(args.runs))
+    print("  tokenize+parse : {:8.3f}s".format(uncached))
+    print("  program cache  : {:8.3f}s  ({:.1f}x)".format(cached, uncached / cached))
+
+    program = "\n".join(
+        "(define f{} (lambda (x) (+ (* x {}) 1.5)))".format(i, i)
+        for i in range(args.forms)
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        cache.ProgramCache(directory=directory).forms(program)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        cache.ProgramCache(directory=directory).forms(program)
+        warm = time.perf_counter() - start
+    print("{} forms".format(args.forms))
+    print("  parse and store: {:8.3f}s".format(cold))
+    print("  load from disk : {:8.3f}s  ({:.1f}x)".format(warm, cold / warm))
+
+
+if __name__ == "__main__":
+    main()
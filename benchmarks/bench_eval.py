@@ -0,0 +1,75 @@
+"""Evaluation benchmark: compares the evaluation engines on the same programs.
+
+Usage: python -m benchmarks.bench_eval [--engines closure tree] [--repeat N]
+"""
+import argparse
+import time
+from typing import List
+
+from lisp import env, leval, lexer, parser
+
+WORKLOADS = {
+    "fib": """(
+        (define fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))
+        (fib 20)
+    )""",
+    "fact": """(
+        (define fact (lambda (n) (if (< n 1) 1 (* n (fact (- n 1))))))
+        (define loop (lambda (i acc) (if (= i 0) acc (loop (- i 1) (+ acc (fact 50))))))
+        (loop 200 0)
+    )""",
+    "sum-n": """(
+        (define sum-n (lambda (n a) (if (= n 0) a (sum-n (- n 1) (+ n a)))))
+        (define loop (lambda (i acc) (if (= i 0) acc (loop (- i 1) (+ acc (sum-n 300 0))))))
+        (loop 100 0)
+    )""",
+    "memo-fib": """(
+        (define fib (memoize (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))))
+        (fib 20)
+    )""",
+    "map-filter-reduce": """(
+        (define sqr (lambda (x) (* x x)))
+        (define odd (lambda (x) (= 1 (% x 2))))
+        (reduce (lambda (x y) (+ x y)) (map sqr (filter odd (range 0 50000 1))))
+    )""",
+}
+
+
+def bench(program: str, engine: str, repeat: int) -> float:
+    ast = parser.parse(lexer.tokenize(program))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        leval.evaluate(ast, env.new(), engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--engines", nargs="+", default=leval.ENGINES)
+    arg_parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS))
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    baseline = args.engines[-1]
+    print("{:<20}".format("workload"), end="")
+    for engine in args.engines:
+        print("{:>12}".format(engine), end="")
+    print("  speedup vs {}".format(baseline))
+
+    for name in args.workloads:
+        timings = {e: bench(WORKLOADS[name], e, args.repeat) for e in args.engines}
+        print("{:<20}".format(name), end="")
+        for engine in args.engines:
+            print("{:>11.3f}s".format(timings[engine]), end="")
+        speedups = [
+            "{}={:.1f}x".format(e, timings[baseline] / timings[e])
+            for e in args.engines
+            if e != baseline
+        ]
+        print("  " + " ".join(speedups))
+
+
+if __name__ == "__main__":
+    main()
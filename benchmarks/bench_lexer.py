@@ -0,0 +1,56 @@
+"""Lexer throughput benchmark.
+
+Usage: python -m benchmarks.bench_lexer [--sizes 1KB 1MB 50MB] [--repeat N]
+"""
+import argparse
+import time
+from typing import List
+
+from lisp import lexer
+
+SNIPPET = """(
+    (define fact (lambda (n) (if (< n 1) 1 (* n (fact (- n 1))))))
+    (define greeting "Hello World")
+    (print (map (lambda (x) (* x 3.14)) (range 0 100 1)))
+    (fact 20)
+)
+"""
+
+_UNITS = {"KB": 1024, "MB": 1024 * 1024}
+
+
+def parse_size(size: str) -> int:
+    for unit, factor in _UNITS.items():
+        if size.upper().endswith(unit):
+            return int(size[: -len(unit)]) * factor
+    return int(size)
+
+
+def make_program(size: int) -> str:
+    count = size // len(SNIPPET) + 1
+    return (SNIPPET * count)[:size].rsplit(")", 1)[0] + ")"
+
+
+def bench(size: int, repeat: int) -> float:
+    program = make_program(size)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lexer.tokenize(program)
+        best = min(best, time.perf_counter() - start)
+    return len(program) / best / (1024 * 1024)
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", nargs="+", default=["1KB", "1MB", "50MB"])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    for size in args.sizes:
+        mb_per_sec = bench(parse_size(size), args.repeat)
+        print("{:>8}: {:8.2f} MB/s".format(size, mb_per_sec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Memory benchmark: bytes per element of evaluated lists and parsed ASTs,
+and the peak memory of a map/filter/reduce pipeline.
+
+Usage: python -m benchmarks.bench_memory [--size N]
+"""
+import argparse
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from lisp import env, leval, lexer, parser
+
+
+def measure(build: Callable[[], object]) -> int:
+    return _trace(build)[0]
+
+
+def measure_peak(build: Callable[[], object]) -> int:
+    return _trace(build)[1]
+
+
+def _trace(build: Callable[[], object]) -> Tuple[int, int]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before, peak - before
+
+
+def eval_program(program: str):
+    return leval.evaluate(parser.parse(lexer.tokenize(program)), env.new())
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--size", type=int, default=1000000)
+    args = arg_parser.parse_args(argv)
+    n = args.size
+
+    range_program = "(range 0 {} 1)".format(n)
+    range_bytes = measure(lambda: eval_program(range_program).materialize())
+    print("range list     : {:8.1f} bytes/element".format(range_bytes / n))
+
+    pipeline_program = (
+        "(reduce (lambda (x y) (+ x y)) "
+        "(map (lambda (x) (* x 2)) (filter (lambda (x) (> x 2)) {})))"
+    ).format(range_program)
+    pipeline_bytes = measure_peak(lambda: eval_program(pipeline_program))
+    print("range pipeline : {:8.1f} bytes peak".format(pipeline_bytes))
+
+    ast_program = "(" + " ".join("(+ x{} 1.5)".format(i) for i in range(n // 10)) + ")"
+    tokens = lexer.tokenize(ast_program)
+    ast_bytes = measure(lambda: parser.parse(tokens))
+    print("parsed AST     : {:8.1f} bytes/form".format(ast_bytes / (n // 10)))
+
+
+if __name__ == "__main__":
+    main()
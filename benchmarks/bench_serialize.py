@@ -0,0 +1,65 @@
+"""Serialization benchmark: loads a large parsed program and a large numeric
+list from lisp.serialize files, compared to parsing the source again and to
+pickle.
+
+Usage: python -m benchmarks.bench_serialize [--forms N] [--size N]
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+from typing import Callable, List
+
+from lisp import lexer, lobject, parser, serialize
+
+
+def timed(func: Callable) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--forms", type=int, default=20000)
+    arg_parser.add_argument("--size", type=int, default=1000000)
+    args = arg_parser.parse_args(argv)
+
+    source = "\n".join(
+        "(define f{} (lambda (x) (+ (* x {}) 1.5)))".format(i, i)
+        for i in range(args.forms)
+    )
+    forms = lobject.LList(list(parser.parse_iter(lexer.tokenize(source))))
+    values = lobject.pack_values(range(args.size), int)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "forms.lpb")
+        serialize.dump(forms, path)
+        size = os.path.getsize(path)
+        parse = timed(lambda: list(parser.parse_iter(lexer.tokenize(source))))
+        load = timed(lambda: serialize.load(path))
+        pickled = pickle.dumps(forms, protocol=4)
+        unpickle = timed(lambda: pickle.loads(pickled))
+        print("{} forms".format(args.forms))
+        print("  source         : {:8d} bytes".format(len(source)))
+        print("  serialized     : {:8d} bytes".format(size))
+        print("  pickled        : {:8d} bytes".format(len(pickled)))
+        print("  tokenize+parse : {:8.3f}s".format(parse))
+        print("  serialize.load : {:8.3f}s  ({:.1f}x)".format(load, parse / load))
+        print("  pickle.loads   : {:8.3f}s".format(unpickle))
+
+        path = os.path.join(directory, "values.lpb")
+        serialize.dump(values, path)
+        size = os.path.getsize(path)
+        parse_source = "(list {})".format(" ".join(str(i) for i in range(args.size)))
+        parse = timed(lambda: parser.parse(lexer.tokenize(parse_source)))
+        load = timed(lambda: serialize.load(path))
+        print("numeric list of {}".format(args.size))
+        print("  serialized     : {:8d} bytes".format(size))
+        print("  tokenize+parse : {:8.3f}s".format(parse))
+        print("  serialize.load : {:8.3f}s  ({:.1f}x)".format(load, parse / load))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Benchmark suite: runs pinned lexer, parser, evaluation and REPL startup
+workloads, records the best time and the peak traced memory of each to JSON,
+and compares them with a baseline from an earlier run.
+
+Usage:
+  python -m benchmarks.suite [--output results.json] [--workloads NAME ...]
+  python -m benchmarks.suite --baseline benchmarks/baseline.json [--threshold 0.1]
+  python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+
+Exits with status 1 when a workload is slower, or uses more memory, than the
+baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from benchmarks import bench_lexer
+from lisp import env, leval, lexer, parser
+
+FORMAT_VERSION = 1
+
+# timings below this many seconds are too noisy to gate on.
+MIN_SECONDS = 0.005
+
+MAIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py"
+)
+
+
+class Workload(NamedTuple):
+    # setup() runs untimed and returns the function that is measured.
+    setup: Callable[[], Callable[[], object]]
+    # tracemalloc does not see other processes.
+    trace_memory: bool = True
+
+
+def _lex(size: int) -> Callable[[], object]:
+    program = bench_lexer.make_program(size)
+    return lambda: lexer.tokenize(program)
+
+
+def _parse_deep(depth: int) -> Callable[[], object]:
+    tokens = lexer.tokenize("(list " * depth + "1" + ")" * depth)
+    return lambda: parser.parse(tokens)
+
+
+def _parse_wide(forms: int) -> Callable[[], object]:
+    program = " ".join(
+        "(define f{} (lambda (x) (+ x {})))".format(i, i) for i in range(forms)
+    )
+    tokens = lexer.tokenize("(" + program + ")")
+    return lambda: parser.parse(tokens)
+
+
+def _eval(program: str, engine: str) -> Callable[[], object]:
+    ast = parser.parse(lexer.tokenize(program))
+    return lambda: leval.evaluate(ast, env.new(), engine=engine)
+
+
+def _repl_startup() -> Callable[[], object]:
+    def start():
+        subprocess.run(
+            [sys.executable, MAIN],
+            input="(+ 1 2)\nexit\n",
+            stdout=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        )
+
+    return start
+
+
+FIB = "((define fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))) (fib 20))"
+LOOP = "((define loop (lambda (i acc) (if (= i 0) acc (loop (- i 1) (+ acc i))))) (loop 20000 0))"
+PIPELINE = (
+    "(reduce (lambda (x y) (+ x y)) "
+    "(map (lambda (x) (* x x)) (filter (lambda (x) (= 1 (% x 2))) (range 0 1000000 1))))"
+)
+# the lambdas of this pipeline are not vectorized, so every element goes
+# through an engine.
+PIPELINE_CALLS = (
+    "((define sqr (lambda (x) (* x x))) "
+    "(reduce (lambda (x y) (+ x y)) (map (lambda (x) (sqr x)) (range 0 20000 1))))"
+)
+
+WORKLOADS: Dict[str, Workload] = {
+    "lex-1mb": Workload(lambda: _lex(1024 * 1024)),
+    "parse-deep": Workload(lambda: _parse_deep(20000)),
+    "parse-wide": Workload(lambda: _parse_wide(20000)),
+    "repl-startup": Workload(_repl_startup, trace_memory=False),
+}
+for _engine in leval.ENGINES:
+    WORKLOADS.update(
+        {
+            "fib-{}".format(_engine): Workload(lambda e=_engine: _eval(FIB, e)),
+            "loop-{}".format(_engine): Workload(lambda e=_engine: _eval(LOOP, e)),
+            "pipeline-{}".format(_engine): Workload(lambda e=_engine: _eval(PIPELINE, e)),
+            "pipeline-calls-{}".format(_engine): Workload(
+                lambda e=_engine: _eval(PIPELINE_CALLS, e)
+            ),
+        }
+    )
+
+
+def measure(workload: Workload, repeat: int) -> Dict[str, Optional[float]]:
+    func = workload.setup()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if workload.trace_memory:
+        # a separate run, tracing slows down the measured one.
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peak = tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run(names: List[str], repeat: int) -> dict:
+    results = {}
+    for name in names:
+        results[name] = measure(WORKLOADS[name], repeat)
+        print(
+            "{:<22} {:>9.4f}s {:>14}".format(
+                name, results[name]["seconds"], _bytes(results[name]["peak_bytes"])
+            ),
+            flush=True,
+        )
+    return {
+        "format_version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    report: dict, baseline: dict, threshold: float, memory_threshold: float
+) -> List[str]:
+    # a line for every measurement that got worse than the baseline by more
+    # than its threshold, e.g. 0.1 for 10%.
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        seconds, base_seconds = result["seconds"], base["seconds"]
+        if max(seconds, base_seconds) >= MIN_SECONDS and seconds > base_seconds * (
+            1 + threshold
+        ):
+            regressions.append(
+                "{}: {:.4f}s -> {:.4f}s ({:+.1%})".format(
+                    name, base_seconds, seconds, seconds / base_seconds - 1
+                )
+            )
+        peak, base_peak = result["peak_bytes"], base["peak_bytes"]
+        if peak is not None and base_peak and peak > base_peak * (1 + memory_threshold):
+            regressions.append(
+                "{}: peak {} -> {} ({:+.1%})".format(
+                    name, _bytes(base_peak), _bytes(peak), peak / base_peak - 1
+                )
+            )
+    return regressions
+
+
+def _bytes(n: Optional[float]) -> str:
+    if n is None:
+        return "-"
+    for unit in ["B", "KB", "MB"]:
+        if n < 1024:
+            return "{:.1f}{}".format(n, unit)
+        n /= 1024
+    return "{:.1f}GB".format(n)
+
+
+def _read(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("format_version") != FORMAT_VERSION:
+        raise ValueError("{}: unsupported format version".format(path))
+    return report
+
+
+def _write(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: List[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    arg_parser.add_argument(
+        "--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS)
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--output", help="write the results to this JSON file.")
+    arg_parser.add_argument("--baseline", help="compare the results with this JSON file.")
+    arg_parser.add_argument(
+        "--save-baseline", metavar="PATH", help="write the results as the new baseline."
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed slowdown against the baseline, 0.1 for 10%%.",
+    )
+    arg_parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="allowed growth of peak memory against the baseline.",
+    )
+    args = arg_parser.parse_args(argv)
+
+    report = run(args.workloads, args.repeat)
+    if args.output is not None:
+        _write(report, args.output)
+    if args.save_baseline is not None:
+        _write(report, args.save_baseline)
+    if args.baseline is None:
+        return 0
+
+    regressions = compare(
+        report, _read(args.baseline), args.threshold, args.memory_threshold
+    )
+    if len(regressions) == 0:
+        print("no regressions against {}".format(args.baseline))
+        return 0
+    print("regressions against {}:".format(args.baseline))
+    for line in regressions:
+        print("  " + line)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
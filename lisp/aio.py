@@ -0,0 +1,81 @@
+import asyncio
+import io
+from typing import Optional
+
+from lisp import env, lexer, lobject, parser, primitives, vm
+from lisp.limits import Governor, Limits
+
+# evaluation for asyncio programs. forms run on the vm as a vm.Task, which
+# stops every slice_calls lisp calls, including those map, filter and reduce
+# make for every element, and the coroutine yields to the event loop before
+# it continues. so one long script does not block the other scripts and
+# requests served by the same loop.
+#
+# print writes to out, an asyncio.StreamWriter or anything with write(bytes)
+# and a drain() coroutine. output is collected while a slice runs and written
+# and drained after it, so a slow reader holds back only its own script.
+# without out, print writes to sys.stdout.
+#
+# with limits, a Governor is active while the slices of a script run,
+# so the time the script waits for the loop counts toward its timeout.
+
+# lisp calls a script makes before it lets other tasks of the event loop run.
+DEFAULT_SLICE = 1000
+
+
+async def evaluate(
+    o: lobject.Object,
+    environment: env.Env,
+    out=None,
+    slice_calls: int = DEFAULT_SLICE,
+    governor: Optional[Governor] = None,
+) -> lobject.Object:
+    task = vm.Task(vm.compile_obj(o), environment)
+    buffer: Optional[io.StringIO] = None
+    if out is not None:
+        buffer = io.StringIO()
+
+    while True:
+        token = primitives.output.set(buffer)
+        try:
+            if governor is None:
+                done = task.run(slice_calls)
+            else:
+                with governor:
+                    done = task.run(slice_calls)
+        finally:
+            primitives.output.reset(token)
+            if buffer is not None:
+                await _flush(buffer, out)
+        if done:
+            return task.result  # type: ignore
+        await asyncio.sleep(0)
+
+
+async def run(
+    program: str,
+    environment: env.Env,
+    out=None,
+    slice_calls: int = DEFAULT_SLICE,
+    limits: Optional[Limits] = None,
+) -> lobject.Object:
+    # evaluates every top-level form of program and returns the value of the
+    # last. the loop also gets to run between forms.
+    governor = None
+    if limits is not None:
+        governor = Governor(limits)
+    result: lobject.Object = lobject.Void
+    for form in parser.parse_iter(lexer.tokenize(program)):
+        result = await evaluate(form, environment, out, slice_calls, governor)
+        await asyncio.sleep(0)
+    return result
+
+
+async def _flush(buffer: io.StringIO, out):
+    data = buffer.getvalue()
+    if len(data) == 0:
+        return
+    buffer.seek(0)
+    buffer.truncate()
+    out.write(data.encode("utf-8"))
+    await out.drain()
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from lisp import env, leval, lexer, lobject, parser, serialize
+
+DEFAULT_SIZE = 256
+
+
+class _Entry(object):
+    __slots__ = ("forms", "programs")
+
+    def __init__(self, forms: List[lobject.Object]):
+        self.forms = forms
+        # engine -> compiled forms, filled in the first time they are run.
+        self.programs: Dict[str, List[leval.Program]] = {}
+
+
+class ProgramCache(object):
+    # parsed top-level forms of programs keyed by a hash of their source, so
+    # a program that is run again skips the lexer, the parser and, within the
+    # same process, the compiler. the maxsize most recently used programs are
+    # kept in memory. with a directory, parsed forms are also stored on disk
+    # in the versioned lisp.serialize format and a new process finds them
+    # there.
+    def __init__(self, maxsize: int = DEFAULT_SIZE, directory: Optional[str] = None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def forms(self, source: str) -> List[lobject.Object]:
+        return self._entry(source).forms
+
+    def evaluate(
+        self, source: str, environment: env.Env, engine: str = None
+    ) -> lobject.Object:
+        # evaluates every top-level form and returns the value of the last.
+        if engine is None:
+            engine = leval.DEFAULT_ENGINE
+        entry = self._entry(source)
+        programs = entry.programs.get(engine)
+        if programs is None:
+            programs = [leval.compile_program(form, engine) for form in entry.forms]
+            entry.programs[engine] = programs
+
+        result: lobject.Object = lobject.Void
+        for program in programs:
+            result = program(environment)
+        return result
+
+    def _entry(self, source: str) -> _Entry:
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        forms = self._load(key)
+        if forms is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            forms = list(parser.parse_iter(lexer.tokenize(source)))
+            self._store(key, forms)
+
+        entry = _Entry(forms)
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return entry
+
+    def _path(self, key: str) -> str:
+        # files are lisp.serialize encodings of an LList of the forms.
+        return os.path.join(self.directory, key + ".lpc")  # type: ignore
+
+    def _load(self, key: str) -> Optional[List[lobject.Object]]:
+        if self.directory is None:
+            return None
+        try:
+            forms = serialize.load(self._path(key))
+        except (OSError, serialize.SerializeError):
+            # a missing file, or one written by another format version, is
+            # replaced by the next _store().
+            return None
+        if not isinstance(forms, lobject.LList):
+            return None
+        return forms.object_list
+
+    def _store(self, key: str, forms: List[lobject.Object]):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        data = serialize.dumps(lobject.LList(forms))
+        # write to a temporary file first, so a concurrent reader never sees
+        # a partly written cache file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,405 @@
+import operator
+from typing import Callable, Dict, List
+
+from lisp import lobject, env, primitives
+from lisp.primitives import EvalError
+
+# a compiled form: evaluates the form in the given environment.
+Code = Callable[[env.Env], lobject.Object]
+
+
+class _TailCall(object):
+    # returned by a call in tail position instead of running the lambda body,
+    # so that run() can continue in a loop rather than growing the python stack.
+    __slots__ = ("code", "environment")
+
+    def __init__(self, code: Code, environment: env.Env):
+        self.code = code
+        self.environment = environment
+
+
+# integer fast paths of binary operators: op -> (function, result constructor)
+_INT_OPS = {
+    "+": (operator.add, lobject.make_integer),
+    "-": (operator.sub, lobject.make_integer),
+    "*": (operator.mul, lobject.make_integer),
+    "/": (operator.floordiv, lobject.make_integer),
+    "%": (operator.mod, lobject.make_integer),
+    "<": (operator.lt, lobject.make_bool),
+    ">": (operator.gt, lobject.make_bool),
+    "=": (operator.eq, lobject.make_bool),
+    "!=": (operator.ne, lobject.make_bool),
+}
+
+
+# parameter name -> slot of the lambda whose body is being compiled.
+Scope = Dict[str, int]
+
+_TOP_LEVEL: Scope = {}
+
+
+def compile_obj(o: lobject.Object) -> Code:
+    return _compile_obj(o, _TOP_LEVEL, tail=True)
+
+
+def run(code: Code, environment: env.Env) -> lobject.Object:
+    result = code(environment)
+    while type(result) is _TailCall:
+        result = result.code(result.environment)
+    return result
+
+
+def compile_lambda(lambda_obj: lobject.Lambda) -> Code:
+    if lambda_obj.code is None:
+        lambda_obj.code = _compile_obj(
+            lobject.LList(lambda_obj.body), lambda_obj.param_index, tail=True
+        )
+    return lambda_obj.code
+
+
+def _apply(
+    lambda_obj: lobject.Lambda, args: List[lobject.Object], environment: env.Env
+) -> lobject.Object:
+    num_params = len(lambda_obj.params)
+    args = args[:num_params]
+    memo = lambda_obj.memo
+    if memo is not None:
+        value = memo.get(args)
+        if value is not None:
+            return value
+
+    new_env = env.frame(environment, lambda_obj.param_index, args)
+    result = run(compile_lambda(lambda_obj), new_env)
+    if memo is not None:
+        memo.put(args, result)
+    return result
+
+
+def _error(err: str) -> Code:
+    # invalid forms fail when they are evaluated, not when they are compiled,
+    # so that e.g. an if branch that is never taken behaves as before.
+    def eval_error(environment: env.Env) -> lobject.Object:
+        raise EvalError(err)
+
+    return eval_error
+
+
+def _constant(o: lobject.Object) -> Code:
+    def eval_constant(environment: env.Env) -> lobject.Object:
+        return o
+
+    return eval_constant
+
+
+def _compile_obj(o: lobject.Object, scope: Scope, tail: bool) -> Code:
+    if isinstance(o, lobject.LList):
+        if len(o.object_list) == 0:
+            return _compile_llist(o, scope)
+
+        # every code compiled from a list adds the list to the EvalErrors
+        # raised in it, so they can be located in the source.
+        head = o.object_list[0]
+        if isinstance(head, lobject.BinaryOp):
+            return _compile_binary_op(o, scope)
+        elif isinstance(head, lobject.Keyword):
+            return _compile_keyword(o, scope)
+        elif head == lobject.If:
+            return _compile_if(o, scope, tail)
+        elif isinstance(head, lobject.Symbol):
+            return _compile_call(o, scope, tail)
+        else:
+            return _compile_llist(o, scope)
+    elif o == lobject.Void:
+        return _constant(lobject.Void)
+    elif isinstance(o, lobject.Lambda):
+        return _constant(lobject.Void)
+    elif isinstance(o, lobject.Symbol):
+        return _compile_symbol(o.s, scope)
+    elif isinstance(
+        o,
+        (lobject.Bool, lobject.Integer, lobject.Float, lobject.String, lobject.ListData),
+    ):
+        # values are immutable, a literal evaluates to itself.
+        return _constant(o)
+    else:
+        return _error("unknown object type. object_type={}".format(type(o)))
+
+
+def _compile_symbol(s: str, scope: Scope) -> Code:
+    if s == "#t":
+        return _constant(lobject.TRUE)
+    elif s == "#f":
+        return _constant(lobject.FALSE)
+    elif s == "#nil":
+        return _constant(lobject.Void)
+
+    if s in scope:
+        # a parameter of the running lambda is always in its own frame.
+        index = scope[s]
+
+        def eval_param(environment: env.Env) -> lobject.Object:
+            return environment.slots[index]
+
+        return eval_param
+
+    def eval_symbol(environment: env.Env) -> lobject.Object:
+        val = environment.get(s)
+        if val is None:
+            raise EvalError("Unbound symbol: {}".format(s))
+        return val
+
+    return eval_symbol
+
+
+def _compile_llist(node: lobject.LList, scope: Scope) -> Code:
+    codes = [_compile_obj(obj, scope, tail=False) for obj in node.object_list]
+    void = lobject.Void
+
+    def eval_llist(environment: env.Env) -> lobject.Object:
+        new_list = []
+        try:
+            for code in codes:
+                result = code(environment)
+                if result == void:
+                    pass
+                else:
+                    new_list.append(result)
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+        return lobject.LList(new_list)
+
+    return eval_llist
+
+
+def _compile_keyword(node: lobject.LList, scope: Scope) -> Code:
+    object_list = node.object_list
+    kw = object_list[0].keyword  # type: ignore
+
+    if kw == "define":
+        return _compile_define(node, scope)
+    elif kw == "lambda":
+        return _compile_function_def(object_list)
+
+    if kw not in primitives.KEYWORD_FUNCTIONS:
+        return _error("Unbound keyword: {}".format(kw))
+
+    func, num_args = primitives.KEYWORD_FUNCTIONS[kw]
+    if num_args is not None and len(object_list) != num_args + 1:
+        return _error(
+            "Invalid number of arguments for {} {}".format(
+                kw, lobject.LList(object_list)
+            )
+        )
+
+    codes = [_compile_obj(obj, scope, tail=False) for obj in object_list[1:]]
+
+    def eval_keyword(environment: env.Env) -> lobject.Object:
+        try:
+            args = [code(environment) for code in codes]
+            return func(args, lambda lambda_obj, a: _apply(lambda_obj, a, environment))
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+
+    return eval_keyword
+
+
+def _compile_define(node: lobject.LList, scope: Scope) -> Code:
+    object_list = node.object_list
+    if len(object_list) != 3:
+        return _error("Invalid number of arguments for define")
+
+    if not isinstance(object_list[1], lobject.Symbol):
+        return _error("Invalid define")
+    sym = object_list[1].s
+
+    value = _compile_obj(object_list[2], scope, tail=False)
+    void = lobject.Void
+
+    def eval_define(environment: env.Env) -> lobject.Object:
+        try:
+            environment.set(sym, value(environment))
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+        return void
+
+    return eval_define
+
+
+def _compile_function_def(object_list: List[lobject.Object]) -> Code:
+    if len(object_list) < 3:
+        return _error("Invalid number of arguments for lambda")
+
+    # parse parameters
+    if not isinstance(object_list[1], lobject.LList):
+        return _error('Invalid lambda parameter. "{}"'.format(object_list[1]))
+    params: List[str] = []
+    for param in object_list[1].object_list:
+        if not isinstance(param, lobject.Symbol):
+            return _error('Invalid lambda parameter. "{}"'.format(param))
+        params.append(param.s)
+
+    # parse body
+    if not isinstance(object_list[2], lobject.LList):
+        return _error("Invalid lambda. body must be lobject.LList")
+    body = object_list[2].object_list.copy()
+    param_index = env.make_param_index(params)
+    # the body list of the form itself is compiled, so errors in it are
+    # located in the source.
+    code = _compile_obj(object_list[2], param_index, tail=True)
+    vectorized: dict = {}
+
+    def eval_function_def(environment: env.Env) -> lobject.Object:
+        return lobject.Lambda(
+            params, body, code, param_index=param_index, vectorized=vectorized
+        )
+
+    return eval_function_def
+
+
+def _compile_if(node: lobject.LList, scope: Scope, tail: bool) -> Code:
+    object_list = node.object_list
+    if len(object_list) != 4:
+        return _error("Invalid number of arguments for if statement")
+
+    cond = _compile_obj(object_list[1], scope, tail=False)
+    then_code = _compile_obj(object_list[2], scope, tail)
+    else_code = _compile_obj(object_list[3], scope, tail)
+    bool_type = lobject.Bool
+
+    def eval_if(environment: env.Env) -> lobject.Object:
+        try:
+            cond_obj = cond(environment)
+            if type(cond_obj) is not bool_type:
+                raise EvalError("Condition must be a boolean")
+
+            if cond_obj.b:  # type: ignore
+                return then_code(environment)
+            else:
+                return else_code(environment)
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+
+    return eval_if
+
+
+def _compile_call(node: lobject.LList, scope: Scope, tail: bool) -> Code:
+    object_list = node.object_list
+    name = object_list[0].s  # type: ignore
+    arg_codes = [_compile_obj(obj, scope, tail=False) for obj in object_list[1:]]
+    num_args = len(arg_codes)
+    lambda_type = lobject.Lambda
+    make_frame = env.frame
+    tail_call_parent = env.tail_call_parent
+
+    # returns the code and frame of the call, or None and the result of a
+    # memoized lambda.
+    def bind(environment: env.Env):
+        lambda_obj = environment.get(name)
+        if lambda_obj is None:
+            raise EvalError("Unbound function: {}".format(name))
+        if type(lambda_obj) is not lambda_type:
+            raise EvalError("Not a lambda")
+
+        num_params = len(lambda_obj.params)  # type: ignore
+        if num_params > num_args:
+            raise EvalError(
+                "Invalid number of arguments for {}. expected={}, actual={}".format(
+                    name, num_params, num_args
+                )
+            )
+
+        # arguments are evaluated in the caller's environment.
+        if num_params == num_args:
+            slots = [arg_code(environment) for arg_code in arg_codes]
+        else:
+            slots = [arg_code(environment) for arg_code in arg_codes[:num_params]]
+
+        if lambda_obj.memo is not None:  # type: ignore
+            # the result has to be stored, so this is not a tail call.
+            return None, _apply(lambda_obj, slots, environment)  # type: ignore
+
+        param_index = lambda_obj.param_index  # type: ignore
+        if tail:
+            parent = tail_call_parent(environment, param_index)
+        else:
+            parent = environment
+
+        code = lambda_obj.code  # type: ignore
+        if code is None:
+            code = compile_lambda(lambda_obj)  # type: ignore
+        return code, make_frame(parent, param_index, slots)
+
+    if tail:
+
+        def eval_tail_call(environment: env.Env) -> lobject.Object:
+            try:
+                code, new_env = bind(environment)
+            except EvalError as e:
+                e.forms.append(node)
+                raise
+            if code is None:
+                return new_env
+            return _TailCall(code, new_env)  # type: ignore
+
+        return eval_tail_call
+
+    def eval_call(environment: env.Env) -> lobject.Object:
+        try:
+            code, new_env = bind(environment)
+            if code is None:
+                return new_env
+            result = code(new_env)
+            while type(result) is _TailCall:
+                result = result.code(result.environment)  # type: ignore
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+        return result
+
+    return eval_call
+
+
+def _compile_binary_op(node: lobject.LList, scope: Scope) -> Code:
+    object_list = node.object_list
+    if len(object_list) != 3:
+        return _error(
+            "Invalid number of arguments for infix operator. len={}".format(
+                len(object_list)
+            )
+        )
+
+    op = object_list[0].op  # type: ignore
+    lhs = _compile_obj(object_list[1], scope, tail=False)
+    rhs = _compile_obj(object_list[2], scope, tail=False)
+    binary_op = primitives.binary_op
+
+    if op not in _INT_OPS:
+
+        def eval_binary_op(environment: env.Env) -> lobject.Object:
+            try:
+                return binary_op(op, lhs(environment), rhs(environment))
+            except EvalError as e:
+                e.forms.append(node)
+                raise
+
+        return eval_binary_op
+
+    func, make_result = _INT_OPS[op]
+    int_type = lobject.Integer
+
+    def eval_int_binary_op(environment: env.Env) -> lobject.Object:
+        try:
+            left = lhs(environment)
+            right = rhs(environment)
+            if type(left) is int_type and type(right) is int_type:
+                return make_result(func(left.i, right.i))  # type: ignore
+            return binary_op(op, left, right)
+        except EvalError as e:
+            e.forms.append(node)
+            raise
+
+    return eval_int_binary_op
@@ -1,32 +1,129 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
-from lisp import lobject
+from lisp import limits, lobject
+
+_NO_PARAMS: Dict[str, int] = {}
+
+
+# bumped whenever a frame gets a variable it did not have, which may hide a
+# binding further up the chain and so invalidates every lookup cache.
+_defines = [0]
+
+# a lookup that walks more frames than this remembers where it found the name.
+_CACHE_AFTER = 8
 
 
 class Env(object):
+    __slots__ = ("parent", "vars", "param_index", "slots", "cache", "depth")
+
     vars: Dict[str, lobject.Object]
 
-    def __init__(self, parent) -> None:
+    def __init__(
+        self,
+        parent,
+        param_index: Dict[str, int] = _NO_PARAMS,
+        slots: Optional[List[lobject.Object]] = None,
+    ) -> None:
         self.parent = parent
         self.vars = {}
+        # parameters of a lambda frame live in a fixed-size list. param_index
+        # maps their names to positions and is shared by every frame of the
+        # same lambda, so compiled code can load them by position.
+        self.param_index = param_index
+        self.slots = slots if slots is not None else []
+        # name -> (frame binding it, _defines when it was found). with dynamic
+        # scope a deep recursion looks up its own name through every frame
+        # of the recursion. the cache lets the next frame stop at this one.
+        self.cache: Optional[Dict[str, Tuple["Env", int]]] = None
+        # number of frames above this one, for lisp.limits.
+        self.depth = 0 if parent is None else parent.depth + 1
 
     def get(self, name: str) -> Optional[lobject.Object]:
-        v = self.vars.get(name, None)
-        if v is not None:
-            return v
+        e = self
+        walked = 0
+        while e is not None:
+            i = e.param_index.get(name)
+            if i is not None:
+                if walked > _CACHE_AFTER:
+                    self._remember(name, e)
+                return e.slots[i]
+
+            v = e.vars.get(name, None)
+            if v is not None:
+                if walked > _CACHE_AFTER:
+                    self._remember(name, e)
+                return v
 
-        if self.parent is not None:
-            return self.parent.get(name)
+            cache = e.cache
+            if cache is not None:
+                hit = cache.get(name)
+                if hit is not None and hit[1] == _defines[0]:
+                    e = hit[0]
+                    continue
+
+            e = e.parent
+            walked += 1
 
         return None
 
+    def _remember(self, name: str, e: "Env"):
+        if self.cache is None:
+            self.cache = {}
+        self.cache[name] = (e, _defines[0])
+
     def set(self, name: str, val: lobject.Object):
-        self.vars[name] = val
+        i = self.param_index.get(name)
+        if i is not None:
+            self.slots[i] = val
+        else:
+            if name not in self.vars:
+                _defines[0] += 1
+            self.vars[name] = val
 
 
 def new() -> Env:
     return Env(None)
 
 
-def extend(parent: Env) -> Env:
-    return Env(parent)
+# the lisp.limits countdown of this thread.
+_state = limits.state
+
+
+def extend(parent: Env, variables: Optional[Dict[str, lobject.Object]] = None) -> Env:
+    e = Env(parent)
+    if variables is not None:
+        # a new frame hides nothing yet, so unlike set() this does not
+        # invalidate lookup caches.
+        e.vars = variables
+    ticks = _state.ticks - 1
+    _state.ticks = ticks
+    if ticks == 0:
+        limits.check(e.depth)
+    return e
+
+
+def frame(
+    parent: Env, param_index: Dict[str, int], slots: List[lobject.Object]
+) -> Env:
+    e = Env(parent, param_index, slots)
+    ticks = _state.ticks - 1
+    _state.ticks = ticks
+    if ticks == 0:
+        limits.check(e.depth)
+    return e
+
+
+def make_param_index(params: List[str]) -> Dict[str, int]:
+    # a repeated parameter name refers to its last position, like a second
+    # set() of the same name would.
+    return {param: i for i, param in enumerate(params)}
+
+
+def tail_call_parent(caller: Env, param_index: Dict[str, int]) -> Env:
+    # a lambda calling itself in tail position rebinds every name of its own
+    # frame, so the new frame can replace it instead of extending it. this
+    # keeps the environment chain short in tail-recursive loops without
+    # changing what any lookup finds.
+    if caller.param_index is param_index and len(caller.vars) == 0:
+        return caller.parent
+    return caller
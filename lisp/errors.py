@@ -0,0 +1,10 @@
+from typing import List
+
+
+class EvalError(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+        # the lobject.LList forms being evaluated when the error was raised,
+        # innermost first, and the location lisp.source found for them.
+        self.forms: List = []
+        self.location = None
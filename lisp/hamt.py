@@ -0,0 +1,195 @@
+from typing import Iterator, Optional, Tuple, Union
+
+# a persistent hash array mapped trie: a map from hashable keys to values.
+# every node has a bitmap of which of its 32 slots are used and a tuple with
+# only the used ones, each an Entry or a child node for the next 5 bits of
+# the hash. nothing is modified after it is made, so an update copies the
+# nodes on the path to its key, at most 13 small tuples, and shares the rest
+# with the map it came from. keys whose hashes are equal share a Collision.
+#
+# keys are compared by hash and ==, so the lobject values used as keys need
+# both.
+
+BITS = 5
+MASK = (1 << BITS) - 1
+# hashes are taken as unsigned 64-bit ints, so they run out after 13 levels.
+_HASH_MASK = (1 << 64) - 1
+
+
+class Entry(object):
+    __slots__ = ("hash", "key", "value")
+
+    def __init__(self, h: int, key, value):
+        self.hash = h
+        self.key = key
+        self.value = value
+
+
+class Collision(object):
+    # entries with the same hash and different keys.
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, h: int, entries: Tuple[Entry, ...]):
+        self.hash = h
+        self.entries = entries
+
+
+class Node(object):
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+Child = Union[Entry, Collision, Node]
+
+EMPTY = Node(0, ())
+
+
+def hash_key(key) -> int:
+    # TypeError for a key that cannot be hashed.
+    return hash(key) & _HASH_MASK
+
+
+def _slot(bitmap: int, bit: int) -> int:
+    # index in the entries tuple of the slot of bit.
+    return bin(bitmap & (bit - 1)).count("1")
+
+
+def get(root: Node, key, default=None):
+    h = hash_key(key)
+    node: Child = root
+    shift = 0
+    while True:
+        if isinstance(node, Node):
+            bit = 1 << ((h >> shift) & MASK)
+            if not node.bitmap & bit:
+                return default
+            node = node.entries[_slot(node.bitmap, bit)]
+            shift += BITS
+        elif isinstance(node, Entry):
+            if node.hash == h and node.key == key:
+                return node.value
+            return default
+        else:
+            if node.hash == h:
+                for entry in node.entries:
+                    if entry.key == key:
+                        return entry.value
+            return default
+
+
+def assoc(root: Node, key, value) -> Tuple[Node, bool]:
+    # the map with key set to value, and whether key is new.
+    node, added = _assoc(root, 0, Entry(hash_key(key), key, value))
+    return node, added  # type: ignore
+
+
+def _assoc(node: Child, shift: int, new: Entry) -> Tuple[Child, bool]:
+    if isinstance(node, Collision):
+        if node.hash != new.hash:
+            return _pair(shift, node, new), True
+        for i, entry in enumerate(node.entries):
+            if entry.key == new.key:
+                return Collision(new.hash, _replace(node.entries, i, new)), False
+        return Collision(new.hash, node.entries + (new,)), True
+
+    bit = 1 << ((new.hash >> shift) & MASK)
+    i = _slot(node.bitmap, bit)  # type: ignore
+    if not node.bitmap & bit:  # type: ignore
+        entries = node.entries[:i] + (new,) + node.entries[i:]  # type: ignore
+        return Node(node.bitmap | bit, entries), True  # type: ignore
+
+    child: Child = node.entries[i]  # type: ignore
+    if isinstance(child, Entry):
+        if child.hash == new.hash and child.key == new.key:
+            added = False
+            child = new
+        else:
+            added = True
+            child = _pair(shift + BITS, child, new)
+    else:
+        child, added = _assoc(child, shift + BITS, new)
+    return Node(node.bitmap, _replace(node.entries, i, child)), added  # type: ignore
+
+
+def _pair(shift: int, a: Union[Entry, Collision], b: Entry) -> Child:
+    # a node holding a and b, which were in the same slot above shift.
+    if a.hash == b.hash:
+        return Collision(b.hash, (a, b))  # type: ignore
+    a_index = (a.hash >> shift) & MASK
+    b_index = (b.hash >> shift) & MASK
+    if a_index == b_index:
+        return Node(1 << a_index, (_pair(shift + BITS, a, b),))
+    bitmap = (1 << a_index) | (1 << b_index)
+    if a_index < b_index:
+        return Node(bitmap, (a, b))
+    return Node(bitmap, (b, a))
+
+
+def _replace(entries: tuple, i: int, child) -> tuple:
+    return entries[:i] + (child,) + entries[i + 1:]
+
+
+def dissoc(root: Node, key) -> Tuple[Node, bool]:
+    # the map without key, and whether it had key.
+    node, removed = _dissoc(root, 0, hash_key(key), key)
+    if node is None:
+        return EMPTY, removed
+    if not isinstance(node, Node):
+        # the root stays a node.
+        return Node(1 << (node.hash & MASK), (node,)), removed
+    return node, removed
+
+
+def _dissoc(node: Child, shift: int, h: int, key) -> Tuple[Optional[Child], bool]:
+    # None for a node that became empty.
+    if isinstance(node, Collision):
+        if node.hash != h:
+            return node, False
+        for i, entry in enumerate(node.entries):
+            if entry.key == key:
+                rest = node.entries[:i] + node.entries[i + 1:]
+                if len(rest) == 1:
+                    return rest[0], True
+                return Collision(h, rest), True
+        return node, False
+
+    bit = 1 << ((h >> shift) & MASK)
+    if not node.bitmap & bit:  # type: ignore
+        return node, False
+    i = _slot(node.bitmap, bit)  # type: ignore
+    child: Optional[Child] = node.entries[i]  # type: ignore
+    if isinstance(child, Entry):
+        if child.hash != h or child.key != key:
+            return node, False
+        child = None
+    else:
+        child, removed = _dissoc(child, shift + BITS, h, key)  # type: ignore
+        if not removed:
+            return node, False
+
+    if child is None:
+        if node.bitmap == bit:  # type: ignore
+            return None, True
+        entries = node.entries[:i] + node.entries[i + 1:]  # type: ignore
+        node = Node(node.bitmap ^ bit, entries)  # type: ignore
+    else:
+        node = Node(node.bitmap, _replace(node.entries, i, child))  # type: ignore
+    # a node left with a single entry is replaced by it, so removing keys
+    # shortens the paths again.
+    if len(node.entries) == 1 and not isinstance(node.entries[0], Node):
+        return node.entries[0], True
+    return node, True
+
+
+def items(root: Node) -> Iterator[Tuple[object, object]]:
+    # (key, value) in the order of the hashes of the keys.
+    stack: list = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        if isinstance(node, Entry):
+            yield node.key, node.value
+        else:
+            stack.extend(reversed(node.entries))
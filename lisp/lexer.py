@@ -1,4 +1,6 @@
-from typing import List, Optional
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from lisp.token import Token, TokenType
 
@@ -10,15 +12,40 @@ KEYWORDS = [
     "map",
     "filter",
     "reduce",
+    "pmap",
+    "pfilter",
+    "preduce",
     "length",
+    "car",
+    "cdr",
+    "nth",
+    "cons",
+    "append",
+    "reverse",
+    "slice",
+    "hash-map",
+    "get",
+    "assoc",
+    "dissoc",
+    "keys",
+    "contains?",
     "range",
     "print",
+    "memoize",
+    "memo-stats",
 ]
 
 IF_KEYWORD = "if"
 
 BINARY_OP = ["+", "-", "*", "/", "%", "<", ">", "=", "!="]
 
+_WHITESPACE = " \t\n\r"
+
+# One lexeme per match: a paren, a (possibly unterminated) string, or a word.
+# Whitespace is the only thing that cannot start a match, so findall() skips
+# exactly the whitespace between lexemes.
+_LEXEME_RE = re.compile(r'[()]|"[^"]*"?|[^ \t\n\r()"][^ \t\n\r()]*')
+
 
 class TokenError(Exception):
     def __init__(self, err: str):
@@ -26,70 +53,100 @@ class TokenError(Exception):
 
 
 def tokenize(program: str) -> List[Token]:
+    return _make_tokens(_LEXEME_RE.findall(program), _new_token_types())
+
+
+def iter_tokens(chunks: Iterable[str]) -> Iterator[Token]:
+    # tokenize a program that arrives in pieces (e.g. blocks read from a file).
+    # tokens are yielded chunk by chunk, so only the current chunk and at most
+    # one unfinished lexeme are held in memory.
+    token_types = _new_token_types()
+    pending = ""
+
+    for chunk in chunks:
+        text = pending + chunk if pending else chunk
+        if len(text) == 0:
+            continue
+
+        lexemes = _LEXEME_RE.findall(text)
+        pending = ""
+        # a word touching the end of the buffer or an open string may continue
+        # in the next chunk. parens and closed strings can not.
+        if len(lexemes) > 0 and not _is_closed(lexemes[-1]):
+            if text[-1] not in _WHITESPACE or lexemes[-1][0] == '"':
+                pending = lexemes.pop()
+
+        yield from _make_tokens(lexemes, token_types)
+
+    if pending:
+        yield from _make_tokens([pending], token_types)
+
+
+def token_spans(program: str) -> Tuple[array, array]:
+    # start and end offsets of the tokens tokenize() returns for program.
+    # tokens do not carry their offsets, because storing them would slow
+    # down tokenize(); lisp.source calls this only when a position is needed.
+    starts = array("q")
+    ends = array("q")
+    for m in _LEXEME_RE.finditer(program):
+        starts.append(m.start())
+        ends.append(m.end())
+    return starts, ends
+
+
+def _new_token_types() -> Dict[str, TokenType]:
+    return {
+        "(": TokenType.LPAREN,
+        ")": TokenType.RPAREN,
+    }
+
+
+def _make_tokens(lexemes: List[str], token_types: Dict[str, TokenType]) -> List[Token]:
+    # lexemes repeat a lot in real programs, so classify each distinct one once.
     tokens: List[Token] = []
-    chars = list(program)
-
-    if len(chars) == 0:
-        return tokens
-
-    while len(chars) > 0:
-        ch = chars.pop(0)
-        if ch == "(":
-            tokens.append(Token(TokenType.LPAREN, ch))
-        elif ch == ")":
-            tokens.append(Token(TokenType.RPAREN, ch))
-        elif ch == '"':
-            # read string
-            word_buf = []
-            while len(chars) > 0 and chars[0] != '"':
-                word_buf.append(chars.pop(0))
-
-            if len(chars) > 0 and chars[0] == '"':
-                chars.pop(0)
-            else:
-                raise TokenError("Unterminated string: {}".format("".join(word_buf)))
-
-            word = "".join(word_buf)
-            tokens.append(Token(TokenType.STRING, word))
+    append = tokens.append
+    string_type = TokenType.STRING
+
+    for lexeme in lexemes:
+        token_type = token_types.get(lexeme)
+        if token_type is None:
+            token_type = _classify(lexeme)
+            token_types[lexeme] = token_type
+
+        if token_type is string_type:
+            append(Token(token_type, lexeme[1:-1]))
         else:
-            word_buf = []
-            while len(chars) > 0 and not _is_whitespace(ch) and ch != "(" and ch != ")":
-                word_buf.append(ch)
-                peek = chars[0]
-                if peek == "(" or peek == ")":
-                    break
-
-                ch = chars.pop(0)
-
-            if len(word_buf) == 0:
-                continue
-
-            word = "".join(word_buf)
-
-            i = _parse_int(word)
-            if i is not None:
-                tokens.append(Token(TokenType.INT, word))
-                continue
-
-            f = _parse_float(word)
-            if f is not None:
-                tokens.append(Token(TokenType.FLOAT, word))
-                continue
-
-            if word in KEYWORDS:
-                tokens.append(Token(TokenType.KEYWORD, word))
-            elif word == IF_KEYWORD:
-                tokens.append(Token(TokenType.IF, word))
-            elif word in BINARY_OP:
-                tokens.append(Token(TokenType.BINARY_OP, word))
-            else:
-                tokens.append(Token(TokenType.SYMBOL, word))
+            append(Token(token_type, lexeme))
 
     return tokens
 
 
-def _is_whitespace(ch: str) -> bool:
-    return ch in [" ", "\t", "\n", "\r"]
+def _is_closed(lexeme: str) -> bool:
+    if lexeme == "(" or lexeme == ")":
+        return True
+    return len(lexeme) >= 2 and lexeme[0] == '"' and lexeme[-1] == '"'
+
+
+def _classify(lexeme: str) -> TokenType:
+    if lexeme[0] == '"':
+        if len(lexeme) < 2 or lexeme[-1] != '"':
+            raise TokenError("Unterminated string: {}".format(lexeme[1:]))
+        return TokenType.STRING
+
+    if _parse_int(lexeme) is not None:
+        return TokenType.INT
+
+    if _parse_float(lexeme) is not None:
+        return TokenType.FLOAT
+
+    if lexeme in KEYWORDS:
+        return TokenType.KEYWORD
+    elif lexeme == IF_KEYWORD:
+        return TokenType.IF
+    elif lexeme in BINARY_OP:
+        return TokenType.BINARY_OP
+    else:
+        return TokenType.SYMBOL
 
 
 def _parse_int(word: str) -> Optional[int]:
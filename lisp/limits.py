@@ -0,0 +1,270 @@
+import copy
+import threading
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from lisp.errors import EvalError
+
+# a Governor stops a program that runs too long, too deep or builds too large
+# lists. steps are lisp calls: every call makes a frame in env.frame() or
+# env.extend(), which count down ticks and call check() when it reaches 0.
+# the governor then checks all its limits and sets ticks to the number of
+# frames that can pass before any of them can be exceeded, at most
+# CHECK_INTERVAL, so the steps and depth limits are exact and the deadline is
+# checked at least every CHECK_INTERVAL calls. without an active governor
+# ticks is negative and never reaches 0. loops that make no frames, like
+# vectorized map, filter and reduce, walk their values through checked(),
+# which counts every element as a step. governors and ticks are per thread.
+# a worker process runs under a governor of its own with the limits that were
+# left when the work was sent, see budget(), and its steps are added back
+# with count().
+#
+# list sizes are checked where lists are made: range, list, concatenation
+# and the elements of a lazy list when it is stored.
+
+CHECK_INTERVAL = 1000
+
+
+class LimitError(EvalError):
+    pass
+
+
+class StepLimitError(LimitError):
+    pass
+
+
+class ListSizeError(LimitError):
+    pass
+
+
+class DepthLimitError(LimitError):
+    pass
+
+
+class DeadlineError(LimitError):
+    pass
+
+
+class Limits(NamedTuple):
+    # None is no limit.
+    steps: Optional[int] = None
+    list_size: Optional[int] = None
+    # frames of the environment of a call. a tail call replaces the frame of
+    # its caller on the closure and vm engines.
+    depth: Optional[int] = None
+    # seconds from when the Governor is made.
+    timeout: Optional[float] = None
+
+
+class _State(threading.local):
+    # the governor active in this thread and the number of frames left
+    # before its next check, negative without one.
+    active: Optional["Governor"] = None
+    ticks = -1
+
+
+state = _State()
+
+
+class Governor(object):
+    # enforces limits while it is active, in a with statement in one thread.
+    # it can be entered again, e.g. for every form of a script, and keeps
+    # counting. an inner governor suspends the outer one until it exits. for
+    # another thread, e.g. a worker of a thread pool, enter a fork().
+    def __init__(self, limits: Limits, clock=time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self.deadline: Optional[float] = None
+        if limits.timeout is not None:
+            self.deadline = clock() + limits.timeout
+        # steps counted so far, shared with the forks of this governor.
+        self.counted = [0]
+        self.lock = threading.Lock()
+        # frames of the current countdown of ticks.
+        self.period = 0
+        # the governors this one suspended.
+        self.saved: List[Optional[Governor]] = []
+
+    @property
+    def steps(self) -> int:
+        return self.counted[0]
+
+    def fork(self) -> "Governor":
+        # a governor with the same deadline that counts steps together with
+        # this one.
+        forked = copy.copy(self)
+        forked.period = 0
+        forked.saved = []
+        return forked
+
+    def budget(self) -> Limits:
+        # the limits left now, for a governor in another process.
+        limits = self.limits
+        if limits.steps is not None:
+            steps = self.counted[0]
+            if state.active is self:
+                steps += self.period - state.ticks
+            limits = limits._replace(steps=max(0, limits.steps - steps))
+        if self.deadline is not None:
+            limits = limits._replace(timeout=max(0.0, self.deadline - self.clock()))
+        return limits
+
+    def __enter__(self) -> "Governor":
+        if state.active is not None:
+            state.active._suspend()
+        self.saved.append(state.active)
+        state.active = self
+        # the first frame checks the limits, as the depth of the environment
+        # is only known then.
+        self.period = state.ticks = 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._suspend()
+        state.active = self.saved.pop()
+        if state.active is not None:
+            state.active.period = state.ticks = 1
+        else:
+            state.ticks = -1
+
+    def _suspend(self):
+        self._count(self.period - state.ticks)
+        self.period = 0
+
+    def _count(self, steps: int) -> int:
+        with self.lock:
+            self.counted[0] += steps
+            return self.counted[0]
+
+    def check(self, depth: int):
+        steps = self._count(self.period)
+        limits = self.limits
+        # a failed check is repeated on the next frame.
+        self.period = state.ticks = 1
+        if limits.steps is not None and steps > limits.steps:
+            raise StepLimitError("Step limit exceeded: {}".format(limits.steps))
+        if limits.depth is not None and depth > limits.depth:
+            raise DepthLimitError("Depth limit exceeded: {}".format(limits.depth))
+        self._check_deadline()
+
+        period = CHECK_INTERVAL
+        if limits.steps is not None:
+            period = min(period, limits.steps - steps + 1)
+        if limits.depth is not None:
+            period = min(period, limits.depth - depth + 1)
+        self.period = state.ticks = period
+
+    def _check_deadline(self):
+        if self.deadline is not None and self.clock() > self.deadline:
+            raise DeadlineError("Deadline exceeded: {}s".format(self.limits.timeout))
+
+    def checked(self, values: Iterable) -> Iterator:
+        # values, counting each as a step. for loops that make no frames,
+        # such as vectorized lambdas, so they cannot run past the limits.
+        count = 0
+        period = self._loop_period()
+        for value in values:
+            count += 1
+            if count == period:
+                self._count_loop(count)
+                count = 0
+                period = self._loop_period()
+            yield value
+        self._count(count)
+
+    def _loop_period(self) -> int:
+        period = CHECK_INTERVAL
+        if self.limits.steps is not None:
+            steps = self.counted[0]
+            if state.active is self:
+                steps += self.period - state.ticks
+            period = max(1, min(period, self.limits.steps - steps + 1))
+        return period
+
+    def _count_loop(self, count: int):
+        if state.active is not self:
+            # the loop outlived the with statement.
+            self._count(count)
+            return
+        # the frames of the current period are counted too, and it is cut
+        # short if fewer steps are left than frames in it.
+        steps = self._count(count + self.period - state.ticks)
+        self.period = state.ticks
+        limits = self.limits
+        if limits.steps is not None:
+            if steps > limits.steps:
+                raise StepLimitError("Step limit exceeded: {}".format(limits.steps))
+            left = limits.steps - steps + 1
+            if state.ticks > left:
+                self.period = state.ticks = left
+        self._check_deadline()
+
+
+def check(depth: int):
+    # called by env when ticks reaches 0.
+    if state.active is not None:
+        state.active.check(depth)
+
+
+def checked(values: Iterable) -> Iterable:
+    # values, checked by the governor active when the walk over them starts.
+    if state.active is None:
+        return values
+    return state.active.checked(values)
+
+
+def count(steps: int):
+    # adds steps made elsewhere, e.g. in a worker process, to the active
+    # governor and checks its limits.
+    if state.active is not None:
+        state.active._count_loop(steps)
+
+
+def budget() -> Optional[Limits]:
+    # the limits left to the active governor, to send to a worker process.
+    if state.active is None:
+        return None
+    return state.active.budget()
+
+
+def reset():
+    # forgets the governor of this thread, which a forked process inherits
+    # from the thread that forked it.
+    state.active = None
+    state.ticks = -1
+
+
+def fork() -> Optional[Governor]:
+    # a fork of the active governor, to enter in another thread.
+    if state.active is None:
+        return None
+    return state.active.fork()
+
+
+def _max_list_size() -> Optional[int]:
+    if state.active is None:
+        return None
+    return state.active.limits.list_size
+
+
+def check_list_size(size: int):
+    max_size = _max_list_size()
+    if max_size is not None and size > max_size:
+        raise ListSizeError(
+            "List size limit exceeded: {} > {}".format(size, max_size)
+        )
+
+
+def bounded(values: Iterable) -> Iterable:
+    # values, raising ListSizeError on the element past the list size limit.
+    max_size = _max_list_size()
+    if max_size is None:
+        return values
+    return _bounded(values, max_size)
+
+
+def _bounded(values: Iterable, max_size: int) -> Iterator:
+    for i, value in enumerate(values):
+        if i == max_size:
+            raise ListSizeError("List size limit exceeded: {}".format(max_size))
+        yield value
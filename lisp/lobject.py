@@ -1,105 +1,149 @@
-from abc import ABC
-from typing import List
+import itertools
+import sys
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
+from lisp import hamt, limits, rope
+
+
+# every object type declares __slots__, so instances carry no __dict__ and
+# large ASTs and lists stay small.
+class Object(object):
+    __slots__ = ()
 
-class Object(ABC):
     def __ne__(self, other: object) -> bool:
         return not self.__eq__(other)
 
 
 class _Void(Object):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, _Void):
-            return False
-        return True
+        return isinstance(other, _Void)
+
+    def __hash__(self) -> int:
+        return hash(_Void)
 
     def __str__(self) -> str:
         return "Void"
 
+    def __reduce__(self):
+        # unpickles as the module's instance.
+        return "Void"
+
 
 Void = _Void()
 
 
 class Integer(Object):
+    __slots__ = ("i",)
+
     def __init__(self, i: int):
-        super().__init__()
         self.i = i
 
     def __str__(self) -> str:
         return "{}".format(self.i)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, Integer):
-            return False
-        return self.i == other.i
+        return isinstance(other, Integer) and self.i == other.i
+
+    def __hash__(self) -> int:
+        return hash(self.i)
 
 
 class Float(Object):
+    __slots__ = ("f",)
+
     def __init__(self, f: float):
-        super().__init__()
         self.f = f
 
     def __str__(self) -> str:
         return "{}".format(self.f)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, Float):
-            return False
-        return self.f == other.f
+        return isinstance(other, Float) and self.f == other.f
+
+    def __hash__(self) -> int:
+        return hash(self.f)
 
 
 class Symbol(Object):
+    __slots__ = ("s",)
+
     def __init__(self, s: str):
-        super().__init__()
         self.s = s
 
     def __str__(self) -> str:
         return "{}".format(self.s)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, Symbol):
-            return False
-        return self.s == other.s
+        return isinstance(other, Symbol) and self.s == other.s
+
+    def __hash__(self) -> int:
+        return hash(self.s)
 
 
 class String(Object):
+    __slots__ = ("string",)
+
     def __init__(self, string: str):
-        super().__init__()
         self.string = string
 
     def __str__(self) -> str:
         return "{}".format(self.string)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, String):
-            return False
-        return self.string == other.string
+        return isinstance(other, String) and self.string == other.string
+
+    def __hash__(self) -> int:
+        return hash(self.string)
 
 
 class Bool(Object):
+    __slots__ = ("b",)
+
     def __init__(self, b: bool):
-        super().__init__()
         self.b = b
 
     def __str__(self) -> str:
         return "{}".format(self.b)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, Bool):
-            return False
-        return self.b == other.b
+        return isinstance(other, Bool) and self.b == other.b
+
+    def __hash__(self) -> int:
+        return hash(self.b)
+
+
+# values are immutable, so equal small values can be shared instead of being
+# allocated again on every evaluation.
+TRUE = Bool(True)
+FALSE = Bool(False)
+
+
+def make_bool(b: bool) -> Bool:
+    return TRUE if b else FALSE
+
+
+_SMALL_INT_MIN = -128
+_SMALL_INT_MAX = 1024
+_SMALL_INTS = [Integer(i) for i in range(_SMALL_INT_MIN, _SMALL_INT_MAX)]
+
+
+def make_integer(i: int) -> Integer:
+    if _SMALL_INT_MIN <= i < _SMALL_INT_MAX:
+        return _SMALL_INTS[i - _SMALL_INT_MIN]
+    return Integer(i)
 
 
 class LList(Object):
+    __slots__ = ("object_list",)
+
     def __init__(self, object_list: List[Object]):
-        super().__init__()
         self.object_list = object_list
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, LList):
+        if not isinstance(other, LList):
             return False
         return _eq_obj_list(self.object_list, other.object_list)
 
@@ -108,65 +152,404 @@ class LList(Object):
 
 
 class ListData(Object):
+    __slots__ = ("list_data",)
+
     def __init__(self, list_data: List[Object]):
-        super().__init__()
         self.list_data = list_data
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, ListData):
+        if not isinstance(other, ListData):
             return False
         return _eq_obj_list(self.list_data, other.list_data)
 
+    def __iter__(self) -> Iterator[Object]:
+        return iter(self.list_data)
+
     def __str__(self) -> str:
         return _obj_list_as_str(self.list_data)
 
 
+class NumericListData(ListData):
+    # a list of only integers or only floats, stored unboxed in an
+    # array("q") or array("d"). list_data boxes the elements on access, so
+    # code that does not know about the array still works.
+    __slots__ = ("array",)
+
+    def __init__(self, values: array):
+        self.array = values
+
+    @property
+    def list_data(self) -> List[Object]:  # type: ignore
+        return list(map(self.box, self.array))
+
+    @property
+    def value_type(self) -> type:
+        if self.array.typecode == "d":
+            return float
+        return int
+
+    @property
+    def box(self):
+        return box_function(self.value_type)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NumericListData):
+            if self.array.typecode != other.array.typecode:
+                return False
+            return self.array == other.array
+        return super().__eq__(other)
+
+    def __iter__(self) -> Iterator[Object]:
+        return map(self.box, self.array)
+
+    def __str__(self) -> str:
+        # an int or float prints like the Integer or Float holding it.
+        return _obj_list_as_str(self.array)  # type: ignore
+
+
+def box_function(value_type: type) -> Callable[..., Object]:
+    # python int, float or bool -> the object holding it.
+    if value_type is float:
+        return Float
+    if value_type is bool:
+        return make_bool
+    return make_integer
+
+
+def pack_values(values: Iterable, value_type: type) -> ListData:
+    # stores python ints or floats unboxed when they fit in an array.
+    if value_type is float:
+        return NumericListData(array("d", values))
+    if value_type is int:
+        values = list(values)
+        try:
+            return NumericListData(array("q", values))
+        except OverflowError:
+            pass
+    return ListData(list(map(box_function(value_type), values)))
+
+
+def make_list_data(objects: List[Object]) -> ListData:
+    if len(objects) > 0:
+        t = type(objects[0])
+        if t is Integer and all(type(o) is Integer for o in objects):
+            return pack_values([o.i for o in objects], int)  # type: ignore
+        elif t is Float and all(type(o) is Float for o in objects):
+            return pack_values([o.f for o in objects], float)  # type: ignore
+    return ListData(objects)
+
+
+class LazyListData(ListData):
+    # a list whose elements are produced by source(), which returns a new
+    # iterator every time the list is walked. map and filter of a vectorized
+    # lambda over a lazy list are lazy too, so such a pipeline holds one
+    # element at a time. the elements are only stored once list_data is
+    # needed, e.g. to print or compare.
+    __slots__ = ("source", "size", "materialized")
+
+    def __init__(self, source: Callable[[], Iterator[Object]], size=None):
+        self.source = source
+        # number of elements, if it is known without walking the list.
+        self.size: Optional[int] = size
+        self.materialized: Optional[ListData] = None
+
+    @property
+    def list_data(self) -> List[Object]:  # type: ignore
+        return self.materialize().list_data
+
+    def materialize(self) -> ListData:
+        if self.materialized is None:
+            if self.size is not None:
+                limits.check_list_size(self.size)
+            self.materialized = make_list_data(
+                list(limits.checked(limits.bounded(self.source())))
+            )
+        return self.materialized
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyListData):
+            other = other.materialize()
+        return self.materialize() == other
+
+    def __iter__(self) -> Iterator[Object]:
+        if self.materialized is not None:
+            return iter(self.materialized)
+        return self.source()
+
+    def __str__(self) -> str:
+        return str(self.materialize())
+
+
+class NumericLazyListData(LazyListData):
+    # a lazy list of python ints or floats. values() returns a new iterable
+    # of the unboxed values, e.g. a range, and elements are boxed only when
+    # they leave the list.
+    __slots__ = ("values", "value_type")
+
+    def __init__(self, values: Callable[[], Iterable], value_type: type, size=None):
+        super().__init__(self._iter_boxed, size)
+        self.values = values
+        self.value_type = value_type
+
+    def _iter_boxed(self) -> Iterator[Object]:
+        return map(box_function(self.value_type), self.values())
+
+    def materialize(self) -> ListData:
+        if self.materialized is None:
+            if self.size is not None:
+                limits.check_list_size(self.size)
+            self.materialized = pack_values(
+                limits.checked(limits.bounded(self.values())), self.value_type
+            )
+        return self.materialized
+
+
+_VALUE_TYPES = {"q": int, "d": float}
+
+
+class RopeListData(ListData):
+    # a list stored in a rope.Rope, which concatenation makes instead of
+    # copying both lists. leaves that are arrays hold unboxed numbers and are
+    # boxed when they leave the list. list_data is stored the first time it
+    # is needed.
+    __slots__ = ("rope", "materialized")
+
+    def __init__(self, r: rope.Rope):
+        self.rope = r
+        self.materialized: Optional[List[Object]] = None
+
+    @property
+    def list_data(self) -> List[Object]:  # type: ignore
+        if self.materialized is None:
+            self.materialized = list(self)
+        return self.materialized
+
+    @property
+    def value_type(self) -> Optional[type]:
+        # int or float when every element is stored unboxed as one of them.
+        return _VALUE_TYPES.get(self.rope.typecode)  # type: ignore
+
+    def flatten(self) -> ListData:
+        # the elements in a single list or array.
+        value_type = self.value_type
+        if value_type is not None:
+            return NumericListData(
+                array(self.rope.typecode, rope.values(self.rope))  # type: ignore
+            )
+        return ListData(self.list_data)
+
+    def __iter__(self) -> Iterator[Object]:
+        if self.materialized is not None:
+            return iter(self.materialized)
+        return self._iter_boxed()
+
+    def _iter_boxed(self) -> Iterator[Object]:
+        for seq, start, stop in rope.leaves(self.rope):
+            values = rope.leaf_values(seq, start, stop)
+            if isinstance(seq, array):
+                yield from map(box_function(_VALUE_TYPES[seq.typecode]), values)
+            else:
+                yield from values
+
+
+def concat(left: ListData, right: ListData) -> ListData:
+    # left followed by right, neither of them lazy. a result larger than a
+    # leaf of a rope shares both lists in one.
+    left_rope = _as_rope(left)
+    right_rope = _as_rope(right)
+    if left_rope.size + right_rope.size > rope.LEAF_SIZE:
+        return RopeListData(rope.concat(left_rope, right_rope))
+    if isinstance(left, NumericListData) and isinstance(right, NumericListData):
+        if left.array.typecode == right.array.typecode:
+            return NumericListData(left.array + right.array)
+    return ListData(left.list_data + right.list_data)
+
+
+def _as_rope(list_data: ListData) -> rope.Rope:
+    if isinstance(list_data, RopeListData):
+        return list_data.rope
+    if isinstance(list_data, NumericListData):
+        return rope.leaf(list_data.array)
+    return rope.leaf(list_data.list_data)
+
+
+def element(list_data: ListData, i: int) -> Object:
+    # the element at index i >= 0, IndexError past the end. a lazy list is
+    # walked up to the element without storing it.
+    if isinstance(list_data, LazyListData):
+        if list_data.materialized is None:
+            if list_data.size is None or i < list_data.size:
+                for o in itertools.islice(list_data, i, None):
+                    return o
+            raise IndexError(i)
+        list_data = list_data.materialized
+    if isinstance(list_data, NumericListData):
+        return list_data.box(list_data.array[i])
+    if isinstance(list_data, RopeListData) and list_data.materialized is None:
+        seq, j = rope.find(list_data.rope, i)
+        if isinstance(seq, array):
+            return box_function(_VALUE_TYPES[seq.typecode])(seq[j])
+        return seq[j]
+    return list_data.list_data[i]
+
+
+def sub_list(list_data: ListData, start: int, stop: int) -> ListData:
+    # elements start to stop, 0 <= start and stop, clamped to the list like a
+    # python slice. the result is a view that shares the storage of the list,
+    # and keeps all of it alive. the sub list of a lazy list is lazy.
+    if isinstance(list_data, LazyListData):
+        if list_data.materialized is None:
+            return _lazy_sub_list(list_data, start, stop)
+        list_data = list_data.materialized
+    return RopeListData(rope.sub(_as_rope(list_data), start, stop))
+
+
+def _lazy_sub_list(list_data: LazyListData, start: int, stop: int) -> ListData:
+    # islice takes at most sys.maxsize.
+    start = min(start, sys.maxsize)
+    stop = min(stop, sys.maxsize)
+    size = None
+    if list_data.size is not None:
+        size = max(0, min(stop, list_data.size) - start)
+    if isinstance(list_data, NumericLazyListData):
+        values = list_data.values
+        return NumericLazyListData(
+            lambda: itertools.islice(values(), start, stop),
+            list_data.value_type,
+            size,
+        )
+    return LazyListData(lambda: itertools.islice(list_data, start, stop), size)
+
+
+class HashMap(Object):
+    # a persistent map in a hamt.Node. assoc and dissoc return a new map
+    # that shares all but one path of the trie with this one. keys are
+    # values with a __hash__: integers, floats, strings, bools and symbols.
+    __slots__ = ("root", "size")
+
+    def __init__(self, root: hamt.Node = hamt.EMPTY, size: int = 0):
+        self.root = root
+        self.size = size
+
+    def get(self, key: Object, default=None):
+        return hamt.get(self.root, key, default)
+
+    def assoc(self, key: Object, value: Object) -> "HashMap":
+        root, added = hamt.assoc(self.root, key, value)
+        return HashMap(root, self.size + 1 if added else self.size)
+
+    def dissoc(self, key: Object) -> "HashMap":
+        root, removed = hamt.dissoc(self.root, key)
+        if not removed:
+            return self
+        return HashMap(root, self.size - 1)
+
+    def items(self) -> Iterator:
+        # (key, value) in the order of the hashes of the keys.
+        return hamt.items(self.root)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, HashMap) or self.size != other.size:
+            return False
+        for key, value in self.items():
+            if other.get(key, _MISSING) != value:
+                return False
+        return True
+
+    def __str__(self) -> str:
+        return "{{{}}}".format(
+            ", ".join("{} {}".format(key, value) for key, value in self.items())
+        )
+
+
+_MISSING = object()
+
+
 class Lambda(Object):
-    def __init__(self, params, body):
-        super().__init__()
+    __slots__ = (
+        "params",
+        "body",
+        "code",
+        "bytecode",
+        "param_index",
+        "vectorized",
+        "memo",
+    )
+
+    def __init__(
+        self,
+        params,
+        body,
+        code=None,
+        bytecode=None,
+        param_index=None,
+        vectorized=None,
+        memo=None,
+    ):
         self.params: List[str] = params
         self.body: List[Object] = body
+        # compiled body for lisp.compiler and lisp.vm, filled in by each of
+        # them the first time it is needed.
+        self.code = code
+        self.bytecode = bytecode
+        # parameter name -> slot in the frames of this lambda.
+        if param_index is None:
+            param_index = {param: i for i, param in enumerate(params)}
+        self.param_index: Dict[str, int] = param_index
+        # lisp.vectorize results by element type. lambdas made by the same
+        # form share one dict.
+        self.vectorized: Optional[dict] = vectorized
+        # lisp.memo.LRUCache of a lambda made by memoize, checked by every
+        # call of it.
+        self.memo = memo
 
 
 class Keyword(Object):
+    __slots__ = ("keyword",)
+
     def __init__(self, keyword: str):
-        super().__init__()
         self.keyword = keyword
 
     def __str__(self) -> str:
         return "{}".format(self.keyword)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, Keyword):
-            return False
-        return self.keyword == other.keyword
+        return isinstance(other, Keyword) and self.keyword == other.keyword
+
+    def __hash__(self) -> int:
+        return hash(self.keyword)
 
 
 class BinaryOp(Object):
+    __slots__ = ("op",)
+
     def __init__(self, op: str):
-        super().__init__()
         self.op = op
 
     def __str__(self) -> str:
         return "{}".format(self.op)
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, BinaryOp):
-            return False
-        return self.op == other.op
+        return isinstance(other, BinaryOp) and self.op == other.op
+
+    def __hash__(self) -> int:
+        return hash(self.op)
 
 
 class _If(Object):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
 
     def __str__(self) -> str:
         return "if"
 
     def __eq__(self, other: object) -> bool:
-        if other is None or not isinstance(other, _If):
-            return False
-        return True
+        return isinstance(other, _If)
+
+    def __hash__(self) -> int:
+        return hash(_If)
+
+    def __reduce__(self):
+        return "If"
 
 
 If = _If()
@@ -192,10 +575,8 @@ If = _If()
 def _eq_obj_list(lhs: List[Object], rhs: List[Object]) -> bool:
     if len(lhs) != len(rhs):
         return False
-    for i, e in enumerate(lhs):
-        if e != rhs[i]:
-            return False
-    return True
+    # list comparison runs the element loop in C.
+    return lhs == rhs
 
 
 def _obj_list_as_str(obj_list: List[Object]) -> str:
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+from typing import List, Optional
+
+from lisp import lobject
+
+DEFAULT_SIZE = 1024
+
+
+class LRUCache(object):
+    # results of a memoized lambda keyed by its arguments. once it holds
+    # maxsize results, storing a new one evicts the least recently used.
+    # calls with an argument that has no hash, e.g. a list, are not cached.
+    __slots__ = ("maxsize", "entries", "hits", "misses", "evictions")
+
+    def __init__(self, maxsize: int = DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, args: List[lobject.Object]) -> Optional[lobject.Object]:
+        key = tuple(args)
+        try:
+            value = self.entries.get(key)
+        except TypeError:
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, args: List[lobject.Object], value: lobject.Object):
+        key = tuple(args)
+        try:
+            self.entries[key] = value
+        except TypeError:
+            return
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
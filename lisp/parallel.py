@@ -0,0 +1,267 @@
+import concurrent.futures
+import itertools
+import os
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from lisp import limits, lobject, serialize
+
+# pmap, pfilter and preduce split their list into chunks and run map, filter
+# or reduce on each chunk in a pool, then join the results in order.
+#
+# "process" runs the chunks in worker processes, so they use every core. the
+# lambda, the values of the symbols it refers to and each chunk are sent with
+# lisp.serialize, and the workers evaluate with their own
+# lisp.leval.DEFAULT_ENGINE, which they inherit where processes are forked.
+# "thread" runs the chunks in threads of this process. nothing is copied,
+# but with the GIL only calls that wait, e.g. print, overlap.
+POOLS = ["process", "thread"]
+
+POOL = "process"
+# number of workers of a pool, None for the number of CPUs. with one worker,
+# or a list that fits in one chunk, the keyword runs in the caller.
+WORKERS: Optional[int] = None
+
+DEFAULT_CHUNK_SIZE = 1024
+
+# names only a worker binds: they contain a space, so no program can refer to
+# them.
+_LAMBDA = " lambda"
+_CHUNK = " chunk"
+
+_executors: Dict[str, concurrent.futures.Executor] = {}
+_lock = threading.Lock()
+
+# a keyword function of lisp.primitives and the apply it is called with.
+KeywordFunction = Callable[[List[lobject.Object], Callable], lobject.Object]
+
+
+def workers() -> int:
+    if WORKERS is not None:
+        return WORKERS
+    return os.cpu_count() or 1
+
+
+def shutdown():
+    # stops the pools, the next chunks start new ones. call it after changing
+    # WORKERS, or a forked child would keep its parent's pool.
+    with _lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
+
+
+def _executor(pool: str) -> concurrent.futures.Executor:
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            if pool == "process":
+                # a worker forked while a governor is active would keep it.
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    workers(), initializer=limits.reset
+                )
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(workers())
+            _executors[pool] = executor
+        return executor
+
+
+def chunks(list_data: lobject.ListData, size: int) -> List[lobject.ListData]:
+    if isinstance(list_data, lobject.LazyListData):
+        list_data = list_data.materialize()
+    elif isinstance(list_data, lobject.RopeListData):
+        list_data = list_data.flatten()
+    if isinstance(list_data, lobject.NumericListData):
+        values = list_data.array
+        return [
+            lobject.NumericListData(values[i:i + size])
+            for i in range(0, len(values), size)
+        ]
+    objects = list_data.list_data
+    return [lobject.ListData(objects[i:i + size]) for i in range(0, len(objects), size)]
+
+
+def join(parts: List[lobject.ListData]) -> lobject.ListData:
+    typecodes = set(
+        part.array.typecode if isinstance(part, lobject.NumericListData) else None
+        for part in parts
+    )
+    if len(typecodes) == 1 and None not in typecodes:
+        values = array(parts[0].array.typecode)  # type: ignore
+        for part in parts:
+            values.extend(part.array)  # type: ignore
+        return lobject.NumericListData(values)
+    return lobject.ListData(list(itertools.chain.from_iterable(parts)))
+
+
+def captured(lambda_obj: lobject.Lambda, apply: Callable) -> List[lobject.LList]:
+    # (symbol value) for each symbol the lambda, or a lambda bound to one of
+    # them, refers to and that is bound where it is called. scoping is
+    # dynamic, so the values are looked up by calling lambdas that return
+    # them.
+    # lisp.primitives imports this module.
+    from lisp.primitives import EvalError
+
+    bindings = []
+    seen: Set[str] = set()
+    lambdas = [lambda_obj]
+    while len(lambdas) > 0:
+        current = lambdas.pop()
+        for name in _symbols(current):
+            if name in seen:
+                continue
+            seen.add(name)
+            lookup = lobject.Lambda(
+                [], [lobject.Keyword("list"), lobject.Symbol(name)]
+            )
+            try:
+                value = apply(lookup, []).list_data[0]
+            except EvalError:
+                # bound only inside the lambda, or not at all.
+                continue
+            bindings.append(lobject.LList([lobject.Symbol(name), value]))
+            if isinstance(value, lobject.Lambda):
+                lambdas.append(value)
+    return bindings
+
+
+def _symbols(lambda_obj: lobject.Lambda) -> List[str]:
+    names = []
+    stack = list(lambda_obj.body)
+    while len(stack) > 0:
+        o = stack.pop()
+        if isinstance(o, lobject.LList):
+            stack.extend(o.object_list)
+        elif isinstance(o, lobject.Symbol) and o.s not in lambda_obj.param_index:
+            if o.s not in ("#t", "#f", "#nil"):
+                names.append(o.s)
+    return names
+
+
+def run(
+    keyword: str,
+    func: KeywordFunction,
+    lambda_obj: lobject.Lambda,
+    list_data: lobject.ListData,
+    chunk_size: int,
+    apply: Callable,
+) -> lobject.Object:
+    # func([lambda, chunk], apply) for every chunk on the pool, joined in
+    # order. keyword names func in a worker process.
+    parts = chunks(list_data, chunk_size)
+    if len(parts) <= 1 or workers() <= 1:
+        return func([lambda_obj, list_data], apply)
+    payload = _payload(keyword, lambda_obj, apply)
+    return join(_run_parts(func, lambda_obj, parts, apply, payload))  # type: ignore
+
+
+def tree_reduce(
+    func: KeywordFunction,
+    lambda_obj: lobject.Lambda,
+    list_data: lobject.ListData,
+    chunk_size: int,
+    apply: Callable,
+) -> lobject.Object:
+    # reduces every chunk on the pool, then the results of the chunks the
+    # same way until they fit in one chunk, which is reduced in the caller.
+    # the order of the elements is kept, so the lambda has to be associative
+    # but not commutative. chunk_size must be at least 2.
+    parts = chunks(list_data, chunk_size)
+    if len(parts) <= 1 or workers() <= 1:
+        return func([lambda_obj, list_data], apply)
+
+    payload = _payload("reduce", lambda_obj, apply)
+    while len(parts) > 1:
+        results = _run_parts(func, lambda_obj, parts, apply, payload)
+        parts = chunks(lobject.make_list_data(results), chunk_size)
+    return func([lambda_obj, parts[0]], apply)
+
+
+def _payload(keyword: str, lambda_obj: lobject.Lambda, apply: Callable) -> Optional[bytes]:
+    # what a worker process needs besides the chunk, None for threads.
+    if POOL == "thread":
+        return None
+    return serialize.dumps(
+        lobject.LList(
+            [
+                lobject.Keyword(keyword),
+                lambda_obj,
+                lobject.LList(captured(lambda_obj, apply)),
+            ]
+        )
+    )
+
+
+def _run_parts(
+    func: KeywordFunction,
+    lambda_obj: lobject.Lambda,
+    parts: List[lobject.ListData],
+    apply: Callable,
+    payload: Optional[bytes],
+) -> List[lobject.Object]:
+    if payload is None:
+        executor = _executor("thread")
+        futures = [
+            executor.submit(
+                _run_thread_chunk, limits.fork(), func, lambda_obj, part, apply
+            )
+            for part in parts
+        ]
+        return [future.result() for future in futures]
+
+    executor = _executor("process")
+    budget = limits.budget()
+    futures = [
+        executor.submit(_run_chunk, payload, serialize.dumps(part), budget)
+        for part in parts
+    ]
+    results = []
+    for future in futures:
+        result, steps = future.result()
+        limits.count(steps)
+        results.append(serialize.loads(result))
+    return results
+
+
+def _run_thread_chunk(
+    governor: Optional[limits.Governor],
+    func: KeywordFunction,
+    lambda_obj: lobject.Lambda,
+    part: lobject.ListData,
+    apply: Callable,
+) -> lobject.Object:
+    # governors are per thread, so a worker enters a fork of the caller's.
+    if governor is None:
+        return func([lambda_obj, part], apply)
+    with governor:
+        return func([lambda_obj, part], apply)
+
+
+def _run_chunk(
+    payload: bytes, part: bytes, budget: Optional[limits.Limits]
+) -> Tuple[bytes, int]:
+    # runs in a worker process, under a governor with the limits the caller
+    # had left. returns the result and the steps it took.
+    if budget is None:
+        return _eval_chunk(payload, part), 0
+    with limits.Governor(budget) as governor:
+        result = _eval_chunk(payload, part)
+    return result, governor.steps
+
+
+def _eval_chunk(payload: bytes, part: bytes) -> bytes:
+    # lisp.leval imports this module through lisp.primitives.
+    from lisp import env, leval
+
+    keyword, lambda_obj, bindings = serialize.loads(payload).object_list  # type: ignore
+    environment = env.new()
+    for binding in bindings.object_list:  # type: ignore
+        symbol, value = binding.object_list
+        environment.set(symbol.s, value)
+    environment.set(_LAMBDA, lambda_obj)
+    environment.set(_CHUNK, serialize.loads(part))
+    form = lobject.LList(
+        [keyword, lobject.Symbol(_LAMBDA), lobject.Symbol(_CHUNK)]
+    )
+    return serialize.dumps(leval.evaluate(form, environment))
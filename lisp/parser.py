@@ -1,52 +1,109 @@
-from typing import List
+import sys
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from lisp import lobject, token
 from lisp.token import TokenType
 
 
+_MAX_SHARED_ATOMS = 4096
+
+
 class ParseError(Exception):
     def __init__(self, err: str):
         super().__init__("Parse error: {}".format(err))
 
 
-def _parse_list(tokens: List[token.Token]) -> lobject.Object:
-    t = tokens.pop(-1)
-    if t.token_type != TokenType.LPAREN:
-        raise ParseError("Expected LParen, found {}".format(t))
-
-    objects: List[lobject.Object] = []
-    while len(tokens) != 0:
-        t = tokens.pop(-1)
-
-        if t.token_type == TokenType.INT:
-            objects.append(lobject.Integer(int(t.literal)))
-        elif t.token_type == TokenType.FLOAT:
-            objects.append(lobject.Float(float(t.literal)))
-        elif t.token_type == TokenType.KEYWORD:
-            objects.append(lobject.Keyword(t.literal))
-        elif t.token_type == TokenType.IF:
-            objects.append(lobject.If)
-        elif t.token_type == TokenType.BINARY_OP:
-            objects.append(lobject.BinaryOp(t.literal))
-        elif t.token_type == TokenType.SYMBOL:
-            objects.append(lobject.Symbol(t.literal))
-        elif t.token_type == TokenType.STRING:
-            objects.append(lobject.String(t.literal))
-        elif t.token_type == TokenType.LPAREN:
-            tokens.append(token.Token(TokenType.LPAREN, "("))
-            sub_list = _parse_list(tokens)
-            objects.append(sub_list)
+def _parse_atom(t: token.Token) -> lobject.Object:
+    if t.token_type == TokenType.INT:
+        return lobject.make_integer(int(t.literal))
+    elif t.token_type == TokenType.FLOAT:
+        return lobject.Float(float(t.literal))
+    elif t.token_type == TokenType.KEYWORD:
+        return lobject.Keyword(t.literal)
+    elif t.token_type == TokenType.IF:
+        return lobject.If
+    elif t.token_type == TokenType.BINARY_OP:
+        return lobject.BinaryOp(t.literal)
+    elif t.token_type == TokenType.SYMBOL:
+        # interned names make environment lookups compare by identity.
+        return lobject.Symbol(sys.intern(t.literal))
+    elif t.token_type == TokenType.STRING:
+        return lobject.String(t.literal)
+    else:
+        raise ParseError("Unexpected token {}".format(t))
+
+
+def _iter_forms(
+    tokens: Iterable[token.Token], strict: bool
+) -> Iterator[Tuple[int, lobject.Object]]:
+    # yields each top-level form with the index of its first token.
+    # lists that are still open, innermost last.
+    stack: List[List[lobject.Object]] = []
+    # atoms are immutable, so every occurrence of the same literal or name
+    # shares one object.
+    atoms: Dict[Tuple[TokenType, str], lobject.Object] = {}
+    start = 0
+
+    for index, t in enumerate(tokens):
+        if t.token_type == TokenType.LPAREN:
+            if len(stack) == 0:
+                start = index
+            stack.append([])
         elif t.token_type == TokenType.RPAREN:
-            return lobject.LList(objects)
+            if len(stack) == 0:
+                if strict:
+                    raise ParseError("Unexpected RParen")
+                continue
+            llist = lobject.LList(stack.pop())
+            if len(stack) == 0:
+                yield start, llist
+            else:
+                stack[-1].append(llist)
+        else:
+            key = (t.token_type, t.literal)
+            atom = atoms.get(key)
+            if atom is None:
+                atom = _parse_atom(t)
+                if len(atoms) >= _MAX_SHARED_ATOMS:
+                    # keep memory bounded when parsing an endless stream.
+                    atoms.clear()
+                atoms[key] = atom
+            if len(stack) == 0:
+                yield index, atom
+            else:
+                stack[-1].append(atom)
 
-    return lobject.LList(objects)
+    if len(stack) == 0:
+        return
+    if strict:
+        raise ParseError("Unterminated list: {} RParen missing".format(len(stack)))
+
+    # close every list that is still open.
+    llist = lobject.LList(stack.pop())
+    while len(stack) != 0:
+        stack[-1].append(llist)
+        llist = lobject.LList(stack.pop())
+    yield start, llist
 
 
 def parse(tokens: List[token.Token]) -> lobject.Object:
     if len(tokens) == 0:
         raise ParseError("tokens are empty.")
 
-    ts = tokens.copy()
-    ts.reverse()
+    if tokens[0].token_type != TokenType.LPAREN:
+        raise ParseError("Expected LParen, found {}".format(tokens[0]))
+
+    return next(_iter_forms(tokens, strict=False))[1]
+
+
+def parse_iter(tokens: Iterable[token.Token]) -> Iterator[lobject.Object]:
+    # yield each top-level form as soon as it is closed.
+    return (form for _, form in _iter_forms(tokens, strict=True))
+
 
-    return _parse_list(ts)
+def parse_iter_indexed(
+    tokens: Iterable[token.Token],
+) -> Iterator[Tuple[int, lobject.Object]]:
+    # same as parse_iter(), with the index of the first token of each form,
+    # which lisp.source turns into a line and column.
+    return _iter_forms(tokens, strict=True)
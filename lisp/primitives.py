@@ -0,0 +1,734 @@
+import contextlib
+import contextvars
+import functools
+import itertools
+import sys
+from array import array
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from lisp import limits, lobject, memo, parallel, rope, serialize, vectorize
+from lisp.errors import EvalError
+
+# evaluation engines call lambdas through an Apply function, so the
+# primitives below stay independent of how a lambda body is evaluated.
+Apply = Callable[[lobject.Lambda, List[lobject.Object]], lobject.Object]
+KeywordFunction = Callable[[List[lobject.Object], Apply], lobject.Object]
+
+
+# a keyword that calls lambdas can also run as steps: a generator that
+# yields (lambda, arguments) for each call it needs and is sent the result.
+# lisp.vm runs those calls on its own frame stack, so a lambda that calls
+# map, which calls the lambda again, does not grow the python stack.
+Steps = Generator[
+    Tuple[lobject.Lambda, List[lobject.Object]], lobject.Object, lobject.Object
+]
+KeywordSteps = Callable[[List[lobject.Object], Apply], Steps]
+
+
+def is_valid_lambda(
+    lambda_obj: lobject.Object, valid_num_params: int, keyword: str
+) -> Tuple[bool, Optional[str]]:
+    if not isinstance(lambda_obj, lobject.Lambda):
+        return (
+            False,
+            "Not a lambda while evaluating {}: {}".format(keyword, lambda_obj),
+        )
+    if len(lambda_obj.params) != valid_num_params:
+        return (
+            False,
+            "Invalid number of parameters for lambda function: {}".format(
+                lambda_obj.params
+            ),
+        )
+    return (True, None)
+
+
+def _check_lambda(lambda_obj: lobject.Object, valid_num_params: int, keyword: str):
+    ok, err = is_valid_lambda(lambda_obj, valid_num_params, keyword)
+    if not ok:
+        raise EvalError(err)
+
+
+def _check_list_data(obj: lobject.Object, keyword: str) -> lobject.ListData:
+    if not isinstance(obj, lobject.ListData):
+        raise EvalError("Invalid {} arguments: {}".format(keyword, obj))
+    return obj
+
+
+def _size(list_data: lobject.ListData) -> Optional[int]:
+    if isinstance(list_data, lobject.LazyListData):
+        if list_data.materialized is not None:
+            return _size(list_data.materialized)
+        return list_data.size
+    if isinstance(list_data, lobject.NumericListData):
+        return len(list_data.array)
+    if isinstance(list_data, lobject.RopeListData):
+        return list_data.rope.size
+    return len(list_data.list_data)
+
+
+def _numeric_values(
+    list_data: lobject.ListData,
+) -> Optional[Tuple[Callable[[], Iterable], type]]:
+    # the unboxed values of a numeric list and their python type.
+    if isinstance(list_data, lobject.LazyListData):
+        if list_data.materialized is not None:
+            list_data = list_data.materialized
+    if isinstance(list_data, lobject.NumericListData):
+        values = list_data.array
+        return (lambda: values), list_data.value_type
+    if isinstance(list_data, lobject.NumericLazyListData):
+        return list_data.values, list_data.value_type
+    if isinstance(list_data, lobject.RopeListData) and list_data.value_type is not None:
+        r = list_data.rope
+        return (lambda: rope.values(r)), list_data.value_type
+    return None
+
+
+# false while a vm.Task runs: a vectorized loop runs to its end in one go,
+# while the calls of the lambda for every element let the task stop between
+# them.
+vectorizing: contextvars.ContextVar = contextvars.ContextVar(
+    "vectorizing", default=True
+)
+
+# a vectorized lambda over a numeric list: the python function, its result
+# type, the unboxed values of the list and their type.
+_Vectorized = Tuple[Callable, type, Callable[[], Iterable], type]
+
+
+def _vectorize(
+    lambda_obj: lobject.Lambda, list_data: lobject.ListData
+) -> Optional[_Vectorized]:
+    # a memoized lambda has to go through its cache.
+    if not vectorizing.get() or lambda_obj.memo is not None:
+        return None
+    numeric = _numeric_values(list_data)
+    if numeric is None:
+        return None
+    values, value_type = numeric
+    kernel = vectorize.analyze(lambda_obj, value_type)
+    if kernel is None:
+        return None
+    func, result_type = kernel
+    # a vectorized loop makes no frames, so its elements are counted by the
+    # governor instead.
+    return func, result_type, (lambda: limits.checked(values())), value_type
+
+
+def make_list(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    limits.check_list_size(len(args))
+    return lobject.ListData(args)
+
+
+def run_steps(steps: Steps, apply: Apply) -> lobject.Object:
+    try:
+        lambda_obj, args = next(steps)
+        while True:
+            lambda_obj, args = steps.send(apply(lambda_obj, args))
+    except StopIteration as stop:
+        return stop.value
+
+
+def map_list(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    return run_steps(map_steps(args, apply), apply)
+
+
+def map_steps(args: List[lobject.Object], apply: Apply) -> Steps:
+    lambda_obj, arg_list = args
+    _check_lambda(lambda_obj, 1, "map")
+    arg_list = _check_list_data(arg_list, "map")
+
+    vectorized = _vectorize(lambda_obj, arg_list)  # type: ignore
+    if vectorized is not None:
+        return _vectorized_map(vectorized, arg_list)
+
+    # other lambdas run now, once per element, even over a lazy list: they
+    # may print, fail or depend on symbols that are redefined later.
+    result_list: List[lobject.Object] = []
+    for arg in arg_list:
+        result_list.append((yield lambda_obj, [arg]))  # type: ignore
+    if isinstance(arg_list, (lobject.NumericListData, lobject.LazyListData)):
+        return lobject.make_list_data(result_list)
+    return lobject.ListData(result_list)
+
+
+def _vectorized_map(
+    vectorized: _Vectorized, arg_list: lobject.ListData
+) -> lobject.Object:
+    func, result_type, values, _ = vectorized
+    if not isinstance(arg_list, lobject.LazyListData):
+        return lobject.pack_values(map(func, values()), result_type)
+
+    if result_type is bool:
+        return lobject.LazyListData(
+            lambda: map(lobject.make_bool, map(func, values())), _size(arg_list)
+        )
+    return lobject.NumericLazyListData(
+        lambda: map(func, values()), result_type, _size(arg_list)
+    )
+
+
+def filter_list(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    return run_steps(filter_steps(args, apply), apply)
+
+
+def filter_steps(args: List[lobject.Object], apply: Apply) -> Steps:
+    lambda_obj, arg_list = args
+    _check_lambda(lambda_obj, 1, "filter")
+    arg_list = _check_list_data(arg_list, "filter")
+
+    vectorized = _vectorize(lambda_obj, arg_list)  # type: ignore
+    if vectorized is not None and vectorized[1] is bool:
+        return _vectorized_filter(vectorized, arg_list)
+
+    if isinstance(arg_list, lobject.NumericListData):
+        box = arg_list.box
+        result_array = array(arg_list.array.typecode)
+        for value in arg_list.array:
+            if _is_kept((yield lambda_obj, [box(value)])):  # type: ignore
+                result_array.append(value)
+        return lobject.NumericListData(result_array)
+
+    # a lazy list is walked once, without storing the elements that are
+    # dropped.
+    result_list: List[lobject.Object] = []
+    for arg in arg_list:
+        if _is_kept((yield lambda_obj, [arg])):  # type: ignore
+            result_list.append(arg)
+    if isinstance(arg_list, lobject.LazyListData):
+        return lobject.make_list_data(result_list)
+    return lobject.ListData(result_list)
+
+
+def _vectorized_filter(
+    vectorized: _Vectorized, arg_list: lobject.ListData
+) -> lobject.Object:
+    func, _, values, value_type = vectorized
+    if not isinstance(arg_list, lobject.LazyListData):
+        return lobject.pack_values(filter(func, values()), value_type)
+    return lobject.NumericLazyListData(lambda: filter(func, values()), value_type)
+
+
+def _is_kept(result: lobject.Object) -> bool:
+    if not isinstance(result, lobject.Bool):
+        raise EvalError("Invalid fitler result: {}".format(result))
+    return result.b
+
+
+def reduce_list(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    return run_steps(reduce_steps(args, apply), apply)
+
+
+def reduce_steps(args: List[lobject.Object], apply: Apply) -> Steps:
+    lambda_obj, arg_list = args
+    _check_lambda(lambda_obj, 2, "reduce")
+    arg_list = _check_list_data(arg_list, "reduce")
+
+    vectorized = _vectorize(lambda_obj, arg_list)  # type: ignore
+    if vectorized is not None and vectorized[1] is vectorized[3]:
+        func, result_type, values, _ = vectorized
+        return _vectorized_reduce(func, result_type, values)
+
+    elements = iter(arg_list)
+    accumulator = next(elements, None)
+    if accumulator is None:
+        raise EvalError("reduce of empty list")
+
+    for arg in elements:
+        accumulator = yield lambda_obj, [accumulator, arg]  # type: ignore
+    return accumulator
+
+
+def _vectorized_reduce(
+    func: Callable, result_type: type, values: Callable[[], Iterable]
+) -> lobject.Object:
+    it = iter(values())
+    try:
+        first = next(it)
+    except StopIteration:
+        raise EvalError("reduce of empty list")
+    return lobject.box_function(result_type)(functools.reduce(func, it, first))
+
+
+def parallel_map(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    lambda_obj, arg_list, chunk_size = _parallel_args(args, "pmap", 1, 1)
+    with _sending("pmap"):
+        return parallel.run("map", map_list, lambda_obj, arg_list, chunk_size, apply)
+
+
+def parallel_filter(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    lambda_obj, arg_list, chunk_size = _parallel_args(args, "pfilter", 1, 1)
+    with _sending("pfilter"):
+        return parallel.run(
+            "filter", filter_list, lambda_obj, arg_list, chunk_size, apply
+        )
+
+
+def parallel_reduce(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # f must be associative, e.g. + or max, as chunks are reduced separately
+    # and their results are reduced again. a list of at most chunk-size
+    # elements is reduced as by reduce.
+    lambda_obj, arg_list, chunk_size = _parallel_args(args, "preduce", 2, 2)
+    with _sending("preduce"):
+        return parallel.tree_reduce(
+            reduce_list, lambda_obj, arg_list, chunk_size, apply
+        )
+
+
+def _parallel_args(
+    args: List[lobject.Object], keyword: str, num_params: int, min_chunk_size: int
+) -> Tuple[lobject.Lambda, lobject.ListData, int]:
+    # (pmap f list) or (pmap f list chunk-size), and the same for pfilter and
+    # preduce.
+    if len(args) not in (2, 3):
+        raise EvalError("Invalid number of arguments for {}".format(keyword))
+    lambda_obj, arg_list = args[0], args[1]
+    _check_lambda(lambda_obj, num_params, keyword)
+    arg_list = _check_list_data(arg_list, keyword)
+
+    chunk_size = parallel.DEFAULT_CHUNK_SIZE
+    if len(args) == 3:
+        if not isinstance(args[2], lobject.Integer) or args[2].i < min_chunk_size:
+            raise EvalError(
+                "{} chunk size must be an Integer of at least {}: {}".format(
+                    keyword, min_chunk_size, args[2]
+                )
+            )
+        chunk_size = args[2].i
+    return lambda_obj, arg_list, chunk_size  # type: ignore
+
+
+@contextlib.contextmanager
+def _sending(keyword: str):
+    try:
+        yield
+    except serialize.SerializeError as e:
+        raise EvalError("Cannot send to {} workers: {}".format(keyword, e))
+
+
+def length(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    obj = args[0]
+    if isinstance(obj, lobject.ListData):
+        size = _size(obj)
+        if size is None:
+            # counts the elements of a lazy list without storing them.
+            size = sum(1 for _ in limits.checked(obj))
+        return lobject.make_integer(size)
+
+    if isinstance(obj, lobject.LList):
+        return lobject.make_integer(len(obj.object_list))
+
+    if isinstance(obj, lobject.HashMap):
+        return lobject.make_integer(obj.size)
+
+    raise EvalError("Not a ListData or LList. {}".format(obj))
+
+
+# car, cdr, nth and slice do not copy the list: cdr and slice return views
+# that share its storage, and a lazy list stays lazy. cons and append share
+# their lists the way + does.
+
+
+def car(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    list_data = _check_list_data(args[0], "car")
+    try:
+        return lobject.element(list_data, 0)
+    except IndexError:
+        raise EvalError("car of empty list")
+
+
+def cdr(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # the cdr of an empty list is empty.
+    list_data = _check_list_data(args[0], "cdr")
+    return lobject.sub_list(list_data, 1, sys.maxsize)
+
+
+def nth(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (nth list index)
+    obj, index = args
+    list_data = _check_list_data(obj, "nth")
+    i = _index(index, "nth")
+    try:
+        return lobject.element(list_data, i)
+    except IndexError:
+        raise EvalError("nth index out of range: {}".format(i))
+
+
+def _index(obj: lobject.Object, keyword: str) -> int:
+    if not isinstance(obj, lobject.Integer) or obj.i < 0:
+        raise EvalError(
+            "{} index must be a non-negative Integer: {}".format(keyword, obj)
+        )
+    return obj.i
+
+
+def cons(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (cons element list)
+    obj, list_data = args
+    list_data = _check_list_data(list_data, "cons")
+    return binary_op("+", lobject.make_list_data([obj]), list_data)
+
+
+def append(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (append list ...): the lists one after the other.
+    result: lobject.Object = lobject.ListData([])
+    for i, arg in enumerate(args):
+        list_data = _check_list_data(arg, "append")
+        result = list_data if i == 0 else binary_op("+", result, list_data)
+    return result
+
+
+def reverse(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    list_data = _check_list_data(args[0], "reverse")
+    if isinstance(list_data, lobject.LazyListData):
+        list_data = list_data.materialize()
+    elif isinstance(list_data, lobject.RopeListData):
+        list_data = list_data.flatten()
+    if isinstance(list_data, lobject.NumericListData):
+        return lobject.NumericListData(list_data.array[::-1])
+    return lobject.ListData(list_data.list_data[::-1])
+
+
+def slice_list(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (slice list start stop): elements start to stop, clamped to the list.
+    obj, start, stop = args
+    list_data = _check_list_data(obj, "slice")
+    return lobject.sub_list(list_data, _index(start, "slice"), _index(stop, "slice"))
+
+
+# hash maps are persistent: assoc and dissoc return a new map and leave the
+# one they were given unchanged.
+_KEY_TYPES = (
+    lobject.Integer,
+    lobject.Float,
+    lobject.String,
+    lobject.Symbol,
+    lobject.Bool,
+)
+
+
+def make_hash_map(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (hash-map key value ...)
+    if len(args) % 2 != 0:
+        raise EvalError(
+            "Invalid number of arguments for hash-map: {}".format(len(args))
+        )
+    result = lobject.HashMap()
+    for i in range(0, len(args), 2):
+        result = result.assoc(_check_key(args[i], "hash-map"), args[i + 1])
+    return result
+
+
+def get(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (get map key) or (get map key default), #nil or default if map does not
+    # have key.
+    if len(args) not in (2, 3):
+        raise EvalError(
+            "Invalid number of arguments for get: {}".format(len(args))
+        )
+    hash_map = _check_hash_map(args[0], "get")
+    default = args[2] if len(args) == 3 else lobject.Void
+    return hash_map.get(_check_key(args[1], "get"), default)
+
+
+def assoc(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (assoc map key value)
+    obj, key, value = args
+    return _check_hash_map(obj, "assoc").assoc(_check_key(key, "assoc"), value)
+
+
+def dissoc(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (dissoc map key)
+    obj, key = args
+    return _check_hash_map(obj, "dissoc").dissoc(_check_key(key, "dissoc"))
+
+
+def keys(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # in no particular order.
+    hash_map = _check_hash_map(args[0], "keys")
+    return lobject.make_list_data([key for key, _ in hash_map.items()])
+
+
+def contains(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (contains? map key)
+    obj, key = args
+    hash_map = _check_hash_map(obj, "contains?")
+    key = _check_key(key, "contains?")
+    return lobject.make_bool(hash_map.get(key, _MISSING) is not _MISSING)
+
+
+_MISSING = object()
+
+
+def _check_hash_map(obj: lobject.Object, keyword: str) -> lobject.HashMap:
+    if not isinstance(obj, lobject.HashMap):
+        raise EvalError(
+            "Not a hash map while evaluating {}: {}".format(keyword, obj)
+        )
+    return obj
+
+
+def _check_key(key: lobject.Object, keyword: str) -> lobject.Object:
+    if not isinstance(key, _KEY_TYPES):
+        raise EvalError("Invalid {} key: {}".format(keyword, key))
+    return key
+
+
+def make_range(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    start_index, end_index, step_size = args
+
+    if not isinstance(start_index, lobject.Integer):
+        raise EvalError("start index must be Integer: {}".format(start_index))
+    if not isinstance(end_index, lobject.Integer):
+        raise EvalError("end index must be Integer: {}".format(end_index))
+    if not isinstance(step_size, lobject.Integer):
+        raise EvalError("step size must be Integer: {}".format(step_size))
+
+    values = range(start_index.i, end_index.i, step_size.i)
+    # checked here, though the list is lazy, so no walk over it is longer.
+    limits.check_list_size(len(values))
+    return lobject.NumericLazyListData(lambda: values, int, len(values))
+
+
+def memoize(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (memoize f) or (memoize f size): f with its results cached by argument
+    # values, keeping the size most recently used. f must not depend on
+    # anything but its arguments.
+    if len(args) not in (1, 2):
+        raise EvalError("Invalid number of arguments for memoize")
+    lambda_obj = args[0]
+    if not isinstance(lambda_obj, lobject.Lambda):
+        raise EvalError("Not a lambda while evaluating memoize: {}".format(lambda_obj))
+
+    size = memo.DEFAULT_SIZE
+    if len(args) == 2:
+        if not isinstance(args[1], lobject.Integer) or args[1].i < 1:
+            raise EvalError("memoize size must be a positive Integer: {}".format(args[1]))
+        size = args[1].i
+
+    return lobject.Lambda(
+        lambda_obj.params,
+        lambda_obj.body,
+        lambda_obj.code,
+        lambda_obj.bytecode,
+        lambda_obj.param_index,
+        lambda_obj.vectorized,
+        memo.LRUCache(size),
+    )
+
+
+def memo_stats(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    # (hits misses evictions size) of a memoized lambda.
+    lambda_obj = args[0]
+    if not isinstance(lambda_obj, lobject.Lambda) or lambda_obj.memo is None:
+        raise EvalError("Not a memoized lambda: {}".format(lambda_obj))
+    cache = lambda_obj.memo
+    return lobject.ListData(
+        [
+            lobject.make_integer(cache.hits),
+            lobject.make_integer(cache.misses),
+            lobject.make_integer(cache.evictions),
+            lobject.make_integer(len(cache.entries)),
+        ]
+    )
+
+
+# the stream print writes to, sys.stdout when it is None. lisp.aio sets it
+# for each script it runs, so concurrent scripts do not share one stream.
+output: contextvars.ContextVar = contextvars.ContextVar("output", default=None)
+
+
+def print_obj(args: List[lobject.Object], apply: Apply) -> lobject.Object:
+    print("{}".format(args[0]), file=output.get())
+    return lobject.Void
+
+
+# keyword -> (function, number of arguments). None accepts any number.
+# "define" and "lambda" are special forms and are handled by each engine.
+KEYWORD_FUNCTIONS: Dict[str, Tuple[KeywordFunction, Optional[int]]] = {
+    "list": (make_list, None),
+    "map": (map_list, 2),
+    "filter": (filter_list, 2),
+    "reduce": (reduce_list, 2),
+    "pmap": (parallel_map, None),
+    "pfilter": (parallel_filter, None),
+    "preduce": (parallel_reduce, None),
+    "length": (length, 1),
+    "car": (car, 1),
+    "cdr": (cdr, 1),
+    "nth": (nth, 2),
+    "cons": (cons, 2),
+    "append": (append, None),
+    "reverse": (reverse, 1),
+    "slice": (slice_list, 3),
+    "hash-map": (make_hash_map, None),
+    "get": (get, None),
+    "assoc": (assoc, 3),
+    "dissoc": (dissoc, 2),
+    "keys": (keys, 1),
+    "contains?": (contains, 2),
+    "range": (make_range, 3),
+    "print": (print_obj, 1),
+    "memoize": (memoize, None),
+    "memo-stats": (memo_stats, 1),
+}
+
+# keyword -> steps version of its function, see Steps.
+KEYWORD_STEPS: Dict[str, KeywordSteps] = {
+    "map": map_steps,
+    "filter": filter_steps,
+    "reduce": reduce_steps,
+}
+
+
+def binary_op(op: str, left: lobject.Object, right: lobject.Object) -> lobject.Object:
+    left_i = _as_integer(left)
+    right_i = _as_integer(right)
+
+    if left_i is not None and right_i is not None:
+        return _binary_op_with_intval(op, left_i.i, right_i.i)
+
+    left_s = _as_string(left)
+    right_s = _as_string(right)
+
+    if left_s is not None and right_s is not None:
+        return _binary_op_with_stringval(op, left_s.string, right_s.string)
+
+    left_f = _as_float(left)
+    right_f = _as_float(right)
+    if left_f is not None and right_f is not None:
+        return _binary_op_with_floatval(op, left_f.f, right_f.f)
+
+    left_l = _as_list(left)
+    left_r = _as_list(right)
+    if left_l is not None and left_r is not None:
+        left_size = _size(left_l)
+        right_size = _size(left_r)
+        if left_size is not None and right_size is not None:
+            limits.check_list_size(left_size + right_size)
+        if isinstance(left_l, lobject.LazyListData) or isinstance(
+            left_r, lobject.LazyListData
+        ):
+            return _binary_op_with_lazy(op, left_l, left_r)
+        return _binary_op_with_listdata(op, left_l, left_r)
+
+    raise EvalError(
+        "Unsupport binary op. op={}, left={}, right={}".format(op, left, right)
+    )
+
+
+def _as_integer(obj: lobject.Object) -> Optional[lobject.Integer]:
+    if isinstance(obj, lobject.Integer):
+        return obj
+    return None
+
+
+def _as_float(obj: lobject.Object) -> Optional[lobject.Float]:
+    if isinstance(obj, lobject.Float):
+        return obj
+    return None
+
+
+def _as_string(obj: lobject.Object) -> Optional[lobject.String]:
+    if isinstance(obj, lobject.String):
+        return obj
+    return None
+
+
+def _as_list(obj: lobject.Object) -> Optional[lobject.ListData]:
+    if isinstance(obj, lobject.ListData):
+        return obj
+    return None
+
+
+def _binary_op_with_intval(op: str, lhs: int, rhs: int) -> lobject.Object:
+    if op == "+":
+        return lobject.make_integer(lhs + rhs)
+    elif op == "-":
+        return lobject.make_integer(lhs - rhs)
+    elif op == "*":
+        return lobject.make_integer(lhs * rhs)
+    elif op == "/":
+        return lobject.make_integer(lhs // rhs)
+    elif op == "%":
+        return lobject.make_integer(lhs % rhs)
+    elif op == "<":
+        return lobject.make_bool(lhs < rhs)
+    elif op == ">":
+        return lobject.make_bool(lhs > rhs)
+    elif op == "=":
+        return lobject.make_bool(lhs == rhs)
+    elif op == "!=":
+        return lobject.make_bool(lhs != rhs)
+    else:
+        raise EvalError("Invalid infix operator: {}".format(op))
+
+
+def _binary_op_with_stringval(op: str, lhs: str, rhs: str) -> lobject.Object:
+    if op == "+":
+        return lobject.String(lhs + rhs)
+    elif op == "<":
+        return lobject.make_bool(lhs < rhs)
+    elif op == ">":
+        return lobject.make_bool(lhs > rhs)
+    elif op == "=":
+        return lobject.make_bool(lhs == rhs)
+    elif op == "!=":
+        return lobject.make_bool(lhs != rhs)
+    else:
+        raise EvalError("Invalid infix operator: {}".format(op))
+
+
+def _binary_op_with_floatval(op: str, lhs: float, rhs: float) -> lobject.Object:
+    if op == "+":
+        return lobject.Float(lhs + rhs)
+    elif op == "-":
+        return lobject.Float(lhs - rhs)
+    elif op == "*":
+        return lobject.Float(lhs * rhs)
+    elif op == "/":
+        return lobject.Float(lhs / rhs)
+    else:
+        raise EvalError("Invalid infix operator: {}".format(op))
+
+
+def _binary_op_with_listdata(
+    op: str, lhs: lobject.ListData, rhs: lobject.ListData
+) -> lobject.Object:
+    if op == "+":
+        return lobject.concat(lhs, rhs)
+    else:
+        raise EvalError("Invalid infix operator: {}".format(op))
+
+
+def _binary_op_with_lazy(
+    op: str, lhs: lobject.ListData, rhs: lobject.ListData
+) -> lobject.Object:
+    if op == "+":
+        lhs_size = _size(lhs)
+        rhs_size = _size(rhs)
+        size = None
+        if lhs_size is not None and rhs_size is not None:
+            size = lhs_size + rhs_size
+
+        lhs_values = _numeric_values(lhs)
+        rhs_values = _numeric_values(rhs)
+        numeric = lhs_values is not None and rhs_values is not None
+        if numeric and lhs_values[1] is rhs_values[1]:  # type: ignore
+            return lobject.NumericLazyListData(
+                lambda: itertools.chain(lhs_values[0](), rhs_values[0]()),
+                lhs_values[1],
+                size,
+            )
+        return lobject.LazyListData(lambda: itertools.chain(lhs, rhs), size)
+    else:
+        raise EvalError("Invalid infix operator: {}".format(op))
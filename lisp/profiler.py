@@ -0,0 +1,142 @@
+import time
+from typing import Dict, List, Optional
+
+from lisp import lobject
+
+# longest name a form or an anonymous lambda is shown with.
+MAX_NAME_LENGTH = 60
+
+_SORT_KEYS = {
+    "self": lambda s: (s.self_time, s.total_time, s.calls),
+    "total": lambda s: (s.total_time, s.self_time, s.calls),
+    "calls": lambda s: (s.calls, s.self_time, s.total_time),
+}
+
+
+class FunctionStats(object):
+    # times are in nanoseconds. total_time counts a recursive function once
+    # per outermost call, so it never exceeds the time of the whole program.
+    __slots__ = ("name", "calls", "self_time", "total_time")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.self_time = 0
+        self.total_time = 0
+
+
+class _Node(object):
+    # a path of calls from a top-level form, for the collapsed stacks.
+    __slots__ = ("name", "children", "self_time")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children: Dict[str, _Node] = {}
+        self.self_time = 0
+
+
+class _Frame(object):
+    __slots__ = ("node", "start", "children_time")
+
+    def __init__(self, node: _Node, start: int):
+        self.node = node
+        self.start = start
+        self.children_time = 0
+
+
+class Profiler(object):
+    # collects the calls of lisp functions evaluated with
+    # leval.evaluate(..., profiler=...). every top-level form and every call
+    # is a frame named after the form, the called symbol or, for a lambda
+    # called by map, filter or reduce, the lambda itself. a tail call ends
+    # the frame of its caller.
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.stats: Dict[str, FunctionStats] = {}
+        self.root = _Node("")
+        self.frames: List[_Frame] = []
+        self.active: Dict[str, int] = {}
+        # "file:line" of the next top-level form, shown before its name.
+        self.location: Optional[str] = None
+
+    def enter(self, name: str):
+        if len(self.frames) > 0:
+            parent = self.frames[-1].node
+        else:
+            parent = self.root
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = _Node(name)
+        self.active[name] = self.active.get(name, 0) + 1
+        self.frames.append(_Frame(node, self.clock()))
+
+    def exit(self):
+        frame = self.frames.pop()
+        elapsed = self.clock() - frame.start
+        self_time = elapsed - frame.children_time
+        node = frame.node
+        node.self_time += self_time
+
+        stats = self.stats.get(node.name)
+        if stats is None:
+            stats = self.stats[node.name] = FunctionStats(node.name)
+        stats.calls += 1
+        stats.self_time += self_time
+        self.active[node.name] -= 1
+        if self.active[node.name] == 0:
+            stats.total_time += elapsed
+
+        if len(self.frames) > 0:
+            self.frames[-1].children_time += elapsed
+
+    def report(self, sort: str = "self", limit: int = None) -> str:
+        if sort not in _SORT_KEYS:
+            raise ValueError("Unknown sort key: {}".format(sort))
+        stats = sorted(self.stats.values(), key=_SORT_KEYS[sort], reverse=True)
+        if limit is not None:
+            stats = stats[:limit]
+
+        lines = ["{:>10} {:>12} {:>12}  {}".format("calls", "self(ms)", "total(ms)", "name")]
+        for s in stats:
+            lines.append(
+                "{:>10} {:>12.3f} {:>12.3f}  {}".format(
+                    s.calls, s.self_time / 1e6, s.total_time / 1e6, s.name
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        # one "form;caller;callee self_time_in_microseconds" line per call
+        # path, the input format of flamegraph.pl and similar tools.
+        lines = []
+        stack = [(node, _frame_name(node.name)) for node in self.root.children.values()]
+        stack.reverse()
+        while len(stack) > 0:
+            node, path = stack.pop()
+            if node.self_time >= 1000:
+                lines.append("{} {}\n".format(path, node.self_time // 1000))
+            for child in reversed(list(node.children.values())):
+                stack.append((child, path + ";" + _frame_name(child.name)))
+        return "".join(lines)
+
+
+def form_name(o: lobject.Object, location: str = None) -> str:
+    if location is not None:
+        return "{} {}".format(location, _shorten(str(o)))
+    return _shorten(str(o))
+
+
+def lambda_name(lambda_obj: lobject.Lambda) -> str:
+    body = " ".join(str(o) for o in lambda_obj.body)
+    return _shorten("(lambda ({}) ({}))".format(" ".join(lambda_obj.params), body))
+
+
+def _shorten(name: str) -> str:
+    if len(name) > MAX_NAME_LENGTH:
+        return name[: MAX_NAME_LENGTH - 3] + "..."
+    return name
+
+
+def _frame_name(name: str) -> str:
+    # ";" separates frames in the collapsed format.
+    return name.replace(";", ",")
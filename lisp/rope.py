@@ -0,0 +1,194 @@
+import itertools
+from array import array
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+# a persistent sequence: a height-balanced (AVL) tree whose leaves are views
+# of python lists or arrays. nothing is modified after it is made, so ropes
+# share subtrees and leaves freely. concatenation, indexing and splitting
+# walk one or two paths of the tree, O(log n), and a slice shares the leaves
+# it covers instead of copying them. leaves are never copied, except that
+# small neighbouring leaves are merged, so a rope built by appending a few
+# elements at a time does not get a leaf for every append.
+#
+# leaves that are arrays keep their unboxed values. a rope whose leaves all
+# are arrays of the same typecode has that typecode.
+
+# leaves up to this size are merged when they meet in a concatenation.
+LEAF_SIZE = 64
+
+
+class Rope(object):
+    __slots__ = ("seq", "start", "left", "right", "size", "depth", "typecode")
+
+    def __init__(self, seq, start, left, right, size, depth, typecode):
+        # a leaf is seq[start : start + size], a node is left followed by
+        # right.
+        self.seq: Optional[Sequence] = seq
+        self.start: int = start
+        self.left: Optional[Rope] = left
+        self.right: Optional[Rope] = right
+        self.size: int = size
+        self.depth: int = depth
+        self.typecode: Optional[str] = typecode
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def leaf(seq: Sequence, start: int = 0, stop: int = None) -> Rope:
+    # a view of seq, which must not be modified afterwards.
+    if stop is None:
+        stop = len(seq)
+    typecode = seq.typecode if isinstance(seq, array) else None
+    return Rope(seq, start, None, None, stop - start, 0, typecode)
+
+
+EMPTY = leaf([])
+
+
+def _node(left: Rope, right: Rope) -> Rope:
+    typecode = left.typecode if left.typecode == right.typecode else None
+    return Rope(
+        None,
+        0,
+        left,
+        right,
+        left.size + right.size,
+        max(left.depth, right.depth) + 1,
+        typecode,
+    )
+
+
+def concat(left: Rope, right: Rope) -> Rope:
+    if left.size == 0:
+        return right
+    if right.size == 0:
+        return left
+    return _join(left, right)
+
+
+def _join(left: Rope, right: Rope) -> Rope:
+    # AVL join: descends the taller tree to a subtree as tall as the other
+    # one and rebalances on the way back up.
+    if left.depth > right.depth + 1:
+        return _balance(left.left, _join(left.right, right))  # type: ignore
+    if right.depth > left.depth + 1:
+        return _balance(_join(left, right.left), right.right)  # type: ignore
+
+    if _mergeable(left, right):
+        return _merge(left, right)
+    # one of them is a leaf and the other a node of two leaves here.
+    if left.depth == 1 and _mergeable(left.right, right):  # type: ignore
+        return _node(left.left, _merge(left.right, right))  # type: ignore
+    if right.depth == 1 and _mergeable(left, right.left):  # type: ignore
+        return _node(_merge(left, right.left), right.right)  # type: ignore
+    return _node(left, right)
+
+
+def _mergeable(left: Rope, right: Rope) -> bool:
+    if left.seq is None or right.seq is None:
+        return False
+    return left.size + right.size <= LEAF_SIZE and left.typecode == right.typecode
+
+
+def _merge(left: Rope, right: Rope) -> Rope:
+    seq = _values(left) + _values(right)  # type: ignore
+    return leaf(seq)
+
+
+def _values(r: Rope) -> Sequence:
+    # the elements of a leaf, copied.
+    stop = r.start + r.size
+    return r.seq[r.start:stop]  # type: ignore
+
+
+def _balance(left: Rope, right: Rope) -> Rope:
+    # the depths of left and right differ by at most 2.
+    if left.depth > right.depth + 1:
+        if left.left.depth >= left.right.depth:  # type: ignore
+            return _node(left.left, _node(left.right, right))  # type: ignore
+        inner = left.right
+        return _node(
+            _node(left.left, inner.left), _node(inner.right, right)  # type: ignore
+        )
+    if right.depth > left.depth + 1:
+        if right.right.depth >= right.left.depth:  # type: ignore
+            return _node(_node(left, right.left), right.right)  # type: ignore
+        inner = right.left
+        return _node(
+            _node(left, inner.left), _node(inner.right, right.right)  # type: ignore
+        )
+    return _node(left, right)
+
+
+def index(r: Rope, i: int):
+    seq, j = find(r, i)
+    return seq[j]
+
+
+def find(r: Rope, i: int) -> Tuple[Sequence, int]:
+    # the sequence of the leaf holding element i and the index of the element
+    # in it.
+    if i < 0 or i >= r.size:
+        raise IndexError(i)
+    while r.seq is None:
+        if i < r.left.size:  # type: ignore
+            r = r.left  # type: ignore
+        else:
+            i -= r.left.size  # type: ignore
+            r = r.right  # type: ignore
+    return r.seq, r.start + i
+
+
+def split(r: Rope, i: int) -> Tuple[Rope, Rope]:
+    # the first i elements and the rest.
+    if i <= 0:
+        return EMPTY, r
+    if i >= r.size:
+        return r, EMPTY
+    if r.seq is not None:
+        return (
+            leaf(r.seq, r.start, r.start + i),
+            leaf(r.seq, r.start + i, r.start + r.size),
+        )
+    if i < r.left.size:  # type: ignore
+        head, tail = split(r.left, i)  # type: ignore
+        return head, concat(tail, r.right)  # type: ignore
+    head, tail = split(r.right, i - r.left.size)  # type: ignore
+    return concat(r.left, head), tail  # type: ignore
+
+
+def sub(r: Rope, start: int, stop: int) -> Rope:
+    # elements start to stop, clamped to the rope like a python slice with
+    # non-negative bounds.
+    head, _ = split(r, stop)
+    _, middle = split(head, start)
+    return middle
+
+
+def leaves(r: Rope) -> Iterator[Tuple[Sequence, int, int]]:
+    # (seq, start, stop) of every leaf in order.
+    stack = [r]
+    while len(stack) > 0:
+        r = stack.pop()
+        if r.seq is not None:
+            if r.size > 0:
+                yield r.seq, r.start, r.start + r.size
+        else:
+            stack.append(r.right)  # type: ignore
+            stack.append(r.left)  # type: ignore
+
+
+def values(r: Rope) -> Iterator:
+    return itertools.chain.from_iterable(
+        leaf_values(seq, start, stop) for seq, start, stop in leaves(r)
+    )
+
+
+def leaf_values(seq: Sequence, start: int, stop: int) -> Iterable:
+    # seq[start:stop] without copying it or walking the elements before start.
+    if start == 0:
+        return itertools.islice(seq, stop)
+    if isinstance(seq, array):
+        return memoryview(seq)[start:stop]
+    return map(seq.__getitem__, range(start, stop))
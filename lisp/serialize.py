@@ -0,0 +1,317 @@
+import itertools
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple, Union
+
+from lisp import lobject
+
+# binary encoding of lobject values and ASTs:
+#
+#   MAGIC, FORMAT_VERSION (1 byte)
+#   symbol table: count, then a length-prefixed utf-8 name per entry
+#   one tagged value
+#
+# counts, lengths and symbol indexes are unsigned LEB128 varints and integers
+# are zigzag varints, so small numbers take one byte. symbols, keywords and
+# operators are stored once in the table and referenced by index. numeric
+# lists are stored as the raw little-endian contents of their array. lazy
+# lists and ropes are stored as the plain lists they stand for. a hash map is
+# stored as its keys and values, one after the other.
+MAGIC = b"LPYB"
+FORMAT_VERSION = 1
+
+_VOID = 0
+_IF = 1
+_TRUE = 2
+_FALSE = 3
+_INT = 4
+_FLOAT = 5
+_STRING = 6
+_SYMBOL = 7
+_KEYWORD = 8
+_BINARY_OP = 9
+_LLIST = 10
+_LIST_DATA = 11
+_INT_ARRAY = 12
+_FLOAT_ARRAY = 13
+_LAMBDA = 14
+_HASH_MAP = 15
+
+_DOUBLE = struct.Struct("<d")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class SerializeError(Exception):
+    pass
+
+
+def dumps(o: lobject.Object) -> bytes:
+    symbols: Dict[str, int] = {}
+    body = bytearray()
+    _encode(o, body, symbols)
+
+    out = bytearray(MAGIC)
+    out.append(FORMAT_VERSION)
+    _write_uvarint(out, len(symbols))
+    for name in symbols:
+        data = name.encode("utf-8")
+        _write_uvarint(out, len(data))
+        out += data
+    out += body
+    return bytes(out)
+
+
+def dump(o: lobject.Object, path: str):
+    with open(path, "wb") as f:
+        f.write(dumps(o))
+
+
+def loads(data: Buffer) -> lobject.Object:
+    buf = memoryview(data)
+    try:
+        header = bytes(buf[: len(MAGIC) + 1])
+        if header[: len(MAGIC)] != MAGIC:
+            raise SerializeError("Not a serialized lobject")
+        if header[len(MAGIC)] != FORMAT_VERSION:
+            raise SerializeError(
+                "Unsupported format version: {}".format(header[len(MAGIC)])
+            )
+        pos = len(MAGIC) + 1
+
+        count, pos = _read_uvarint(buf, pos)
+        symbols: List[str] = []
+        for _ in range(count):
+            size, pos = _read_uvarint(buf, pos)
+            symbols.append(sys.intern(str(buf[pos:pos + size], "utf-8")))
+            pos += size
+
+        o, pos = _decode(buf, pos, symbols)
+    except (IndexError, struct.error, UnicodeDecodeError, ValueError) as e:
+        raise SerializeError("Broken serialized lobject: {}".format(e))
+    finally:
+        buf.release()
+
+    if pos != len(data):
+        raise SerializeError("Trailing data after serialized lobject")
+    return o
+
+
+def load(path: str) -> lobject.Object:
+    # maps the file instead of reading it into a separate buffer first.
+    with open(path, "rb") as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file cannot be mapped.
+            raise SerializeError("Not a serialized lobject")
+        with m:
+            return loads(m)
+
+
+def _write_uvarint(out: bytearray, n: int):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_uvarint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    n = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _symbol(name: str, symbols: Dict[str, int]) -> int:
+    index = symbols.get(name)
+    if index is None:
+        index = symbols[name] = len(symbols)
+    return index
+
+
+def _write_array(out: bytearray, values: array):
+    _write_uvarint(out, len(values))
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    out += values.tobytes()
+
+
+def _encode(o: lobject.Object, out: bytearray, symbols: Dict[str, int]):
+    # walks the value with an explicit stack, so deeply nested lists do not
+    # hit the python recursion limit.
+    stack = [iter([o])]
+    while len(stack) > 0:
+        o = next(stack[-1], None)  # type: ignore
+        if o is None:
+            stack.pop()
+            continue
+
+        t = type(o)
+        if t is lobject.Integer:
+            i = o.i  # type: ignore
+            out.append(_INT)
+            _write_uvarint(out, i * 2 if i >= 0 else -i * 2 - 1)
+        elif t is lobject.Symbol:
+            out.append(_SYMBOL)
+            _write_uvarint(out, _symbol(o.s, symbols))  # type: ignore
+        elif t is lobject.LList:
+            out.append(_LLIST)
+            _write_uvarint(out, len(o.object_list))  # type: ignore
+            stack.append(iter(o.object_list))  # type: ignore
+        elif t is lobject.Bool:
+            out.append(_TRUE if o.b else _FALSE)  # type: ignore
+        elif t is lobject.Float:
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(o.f)  # type: ignore
+        elif t is lobject.String:
+            data = o.string.encode("utf-8")  # type: ignore
+            out.append(_STRING)
+            _write_uvarint(out, len(data))
+            out += data
+        elif t is lobject.Keyword:
+            out.append(_KEYWORD)
+            _write_uvarint(out, _symbol(o.keyword, symbols))  # type: ignore
+        elif t is lobject.BinaryOp:
+            out.append(_BINARY_OP)
+            _write_uvarint(out, _symbol(o.op, symbols))  # type: ignore
+        elif o == lobject.If:
+            out.append(_IF)
+        elif o == lobject.Void:
+            out.append(_VOID)
+        elif isinstance(o, lobject.LazyListData):
+            stack.append(iter([o.materialize()]))
+        elif isinstance(o, lobject.RopeListData):
+            stack.append(iter([o.flatten()]))
+        elif isinstance(o, lobject.NumericListData):
+            out.append(_FLOAT_ARRAY if o.array.typecode == "d" else _INT_ARRAY)
+            _write_array(out, o.array)
+        elif isinstance(o, lobject.ListData):
+            out.append(_LIST_DATA)
+            _write_uvarint(out, len(o.list_data))
+            stack.append(iter(o.list_data))
+        elif isinstance(o, lobject.HashMap):
+            out.append(_HASH_MAP)
+            _write_uvarint(out, o.size * 2)
+            stack.append(itertools.chain.from_iterable(o.items()))
+        elif isinstance(o, lobject.Lambda):
+            out.append(_LAMBDA)
+            _write_uvarint(out, len(o.params))
+            for param in o.params:
+                _write_uvarint(out, _symbol(param, symbols))
+            _write_uvarint(out, len(o.body))
+            stack.append(iter(o.body))
+        else:
+            raise SerializeError("Cannot serialize {}".format(type(o)))
+
+
+def _read_array(buf: memoryview, pos: int, typecode: str) -> Tuple[array, int]:
+    count, pos = _read_uvarint(buf, pos)
+    end = pos + count * 8
+    values = array(typecode)
+    values.frombytes(buf[pos:end])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values, end
+
+
+def _decode(buf: memoryview, pos: int, symbols: List[str]) -> Tuple[lobject.Object, int]:
+    # equal atoms are shared, as in the parser.
+    atoms: Dict[Tuple[int, int], lobject.Object] = {}
+    # lists being read: [tag, items, number of items left, lambda params]
+    stack: List[list] = []
+    while True:
+        tag = buf[pos]
+        pos += 1
+        if tag == _INT:
+            n, pos = _read_uvarint(buf, pos)
+            o = lobject.make_integer(n >> 1 if n & 1 == 0 else -((n + 1) >> 1))
+        elif tag == _SYMBOL or tag == _KEYWORD or tag == _BINARY_OP:
+            index, pos = _read_uvarint(buf, pos)
+            o = atoms.get((tag, index))  # type: ignore
+            if o is None:
+                o = _make_atom(tag, symbols[index])
+                atoms[(tag, index)] = o
+        elif tag == _LLIST or tag == _LIST_DATA or tag == _HASH_MAP:
+            count, pos = _read_uvarint(buf, pos)
+            if count > 0:
+                stack.append([tag, [], count, None])
+                continue
+            o = _make_list(tag, [], None)
+        elif tag == _TRUE:
+            o = lobject.TRUE
+        elif tag == _FALSE:
+            o = lobject.FALSE
+        elif tag == _FLOAT:
+            o = lobject.Float(_DOUBLE.unpack_from(buf, pos)[0])
+            pos += _DOUBLE.size
+        elif tag == _STRING:
+            size, pos = _read_uvarint(buf, pos)
+            o = lobject.String(str(buf[pos:pos + size], "utf-8"))
+            pos += size
+        elif tag == _IF:
+            o = lobject.If
+        elif tag == _VOID:
+            o = lobject.Void
+        elif tag == _INT_ARRAY or tag == _FLOAT_ARRAY:
+            values, pos = _read_array(buf, pos, "d" if tag == _FLOAT_ARRAY else "q")
+            o = lobject.NumericListData(values)
+        elif tag == _LAMBDA:
+            num_params, pos = _read_uvarint(buf, pos)
+            params = []
+            for _ in range(num_params):
+                index, pos = _read_uvarint(buf, pos)
+                params.append(symbols[index])
+            count, pos = _read_uvarint(buf, pos)
+            if count > 0:
+                stack.append([tag, [], count, params])
+                continue
+            o = _make_list(tag, [], params)
+        else:
+            raise SerializeError("Unknown tag: {}".format(tag))
+
+        # add the value to the lists it completes.
+        while True:
+            if len(stack) == 0:
+                return o, pos
+            top = stack[-1]
+            top[1].append(o)
+            top[2] -= 1
+            if top[2] > 0:
+                break
+            stack.pop()
+            o = _make_list(top[0], top[1], top[3])
+
+
+def _make_atom(tag: int, name: str) -> lobject.Object:
+    if tag == _SYMBOL:
+        return lobject.Symbol(name)
+    elif tag == _KEYWORD:
+        return lobject.Keyword(name)
+    return lobject.BinaryOp(name)
+
+
+def _make_list(tag: int, items: List[lobject.Object], params) -> lobject.Object:
+    if tag == _LLIST:
+        return lobject.LList(items)
+    elif tag == _LIST_DATA:
+        return lobject.ListData(items)
+    elif tag == _HASH_MAP:
+        if len(items) % 2 != 0:
+            raise SerializeError("Hash map without a value for its last key")
+        hash_map = lobject.HashMap()
+        for i in range(0, len(items), 2):
+            try:
+                hash_map = hash_map.assoc(items[i], items[i + 1])
+            except TypeError:
+                raise SerializeError("Invalid hash map key: {}".format(items[i]))
+        return hash_map
+    return lobject.Lambda(params, items)
@@ -0,0 +1,161 @@
+import bisect
+from array import array
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from lisp import lexer, lobject
+from lisp.primitives import EvalError
+
+# positions of forms are not stored on the AST. the parser reports the index
+# of the first token of every top-level form, and the index of any list in it
+# follows from the shape of the form, because every atom is one token and
+# every list adds its two parens. offsets, lines and columns of the tokens
+# are computed from the text only when a position is asked for.
+
+
+class Position(NamedTuple):
+    # 1-based line and column.
+    line: int
+    column: int
+
+
+class Span(NamedTuple):
+    # start is the first character of a form and end the one after its last.
+    start: Position
+    end: Position
+
+
+class Source(object):
+    # a program and the positions of its tokens. without text, it is read
+    # from the file name when a position is asked for.
+    def __init__(self, name: str, text: Optional[str] = None):
+        self.name = name
+        self.text = text
+        self.starts: Optional[array] = None
+        self.ends: Optional[array] = None
+        self.line_starts: Optional[List[int]] = None
+        # top-level defines, whose lambdas may raise while a later form runs.
+        self.definitions: List[Tuple[int, lobject.Object]] = []
+
+    def add_form(self, form: lobject.Object, first_token: int):
+        # only definitions are kept, so a streamed program does not keep
+        # every form it ran alive.
+        if isinstance(form, lobject.LList) and len(form.object_list) > 0:
+            if form.object_list[0] == lobject.Keyword("define"):
+                self.definitions.append((first_token, form))
+
+    def _load(self):
+        if self.text is None:
+            with open(self.name) as f:
+                self.text = f.read()
+        self.starts, self.ends = lexer.token_spans(self.text)
+        line_starts = [0]
+        offset = self.text.find("\n")
+        while offset >= 0:
+            line_starts.append(offset + 1)
+            offset = self.text.find("\n", offset + 1)
+        self.line_starts = line_starts
+
+    def position(self, offset: int) -> Position:
+        if self.line_starts is None:
+            self._load()
+        line = bisect.bisect_right(self.line_starts, offset)  # type: ignore
+        return Position(line, offset - self.line_starts[line - 1] + 1)  # type: ignore
+
+    def token_span(self, first: int, last: int) -> Optional[Span]:
+        # span from the first to the last token, both included.
+        if self.starts is None:
+            self._load()
+        if first >= len(self.starts):  # type: ignore
+            return None
+        # the missing parens of an unterminated list end at the last token.
+        last = min(last, len(self.ends) - 1)  # type: ignore
+        return Span(
+            self.position(self.starts[first]),  # type: ignore
+            self.position(self.ends[last]),  # type: ignore
+        )
+
+    def locate(
+        self, form: lobject.Object, first_token: int, node: lobject.Object = None
+    ) -> Optional[Span]:
+        # span of node, a list inside the top-level form whose first token
+        # is first_token, or of the form itself.
+        if node is None:
+            node = form
+        tokens = _find_tokens(form, first_token, node)
+        if tokens is None:
+            return None
+        return self.token_span(*tokens)
+
+    def locate_error(
+        self, error: EvalError, form: lobject.Object, first_token: int
+    ) -> Optional[Span]:
+        # sets error.location to the innermost list the error was raised in,
+        # found in form or in a definition added before, or else to form.
+        # lists the engines made up at run time, e.g. the body of a lambda in
+        # the tree engine, are in neither.
+        forms = [(first_token, form)] + self.definitions[::-1]
+        for node in error.forms + [form]:
+            for start, candidate in forms:
+                span = self.locate(candidate, start, node)
+                if span is not None:
+                    error.location = "{}:{}:{}".format(
+                        self.name, span.start.line, span.start.column
+                    )
+                    return span
+        return None
+
+
+def index_forms(forms: Iterable[lobject.Object]) -> Iterator[Tuple[int, lobject.Object]]:
+    # the index of the first token of each form of a program parsed by
+    # parser.parse_iter(), e.g. one loaded from the program cache.
+    index = 0
+    for form in forms:
+        yield index, form
+        index += _token_count(form)
+
+
+def _token_count(form: lobject.Object) -> int:
+    count = 0
+    stack = [form]
+    while len(stack) > 0:
+        o = stack.pop()
+        if isinstance(o, lobject.LList):
+            count += 2
+            stack.extend(o.object_list)
+        else:
+            count += 1
+    return count
+
+
+_END = object()
+
+
+def _find_tokens(
+    form: lobject.Object, first_token: int, node: lobject.Object
+) -> Optional[Tuple[int, int]]:
+    # indexes of the first and last token of node in form, walking the form
+    # in token order without recursion.
+    if not isinstance(node, lobject.LList):
+        if node is form:
+            return first_token, first_token
+        return None
+
+    index = first_token
+    stack = [iter([form])]
+    # lists being walked and the index of their left paren.
+    lists: List[Tuple[lobject.Object, int]] = []
+    while len(stack) > 0:
+        o = next(stack[-1], _END)
+        if o is _END:
+            stack.pop()
+            if len(lists) > 0:
+                llist, start = lists.pop()
+                if llist is node:
+                    return start, index
+                index += 1
+            continue
+        if isinstance(o, lobject.LList):
+            lists.append((o, index))
+            stack.append(iter(o.object_list))
+        index += 1
+    return None
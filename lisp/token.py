@@ -14,6 +14,8 @@ class TokenType(IntEnum):
 
 
 class Token:
+    __slots__ = ("token_type", "literal")
+
     def __init__(self, token_type: TokenType, literal: str) -> None:
         self.token_type = token_type
         self.literal = literal
@@ -0,0 +1,110 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lisp import lobject
+
+# a lambda whose body only combines its parameters and integer or float
+# literals with binary operators and if does not depend on the environment,
+# so it can run as one python function over unboxed numbers instead of going
+# through an evaluation engine for each element. it is only used when every
+# operation has the operand types the engines accept, so results and errors
+# stay the same.
+
+# python function over unboxed values and the python type of its result.
+Kernel = Tuple[Callable, type]
+
+_INT_OPS = {"+": "+", "-": "-", "*": "*", "/": "//", "%": "%"}
+_INT_COMPARISONS = {"<": "<", ">": ">", "=": "==", "!=": "!="}
+_FLOAT_OPS = {"+": "+", "-": "-", "*": "*", "/": "/"}
+
+# symbols the engines resolve before looking at parameters.
+_CONSTANT_SYMBOLS = ("#t", "#f", "#nil")
+
+
+class _NotVectorizable(Exception):
+    pass
+
+
+def analyze(lambda_obj: lobject.Lambda, value_type: type) -> Optional[Kernel]:
+    # value_type is the python type of every argument, int or float.
+    if lambda_obj.vectorized is None:
+        lambda_obj.vectorized = {}
+    cache = lambda_obj.vectorized
+    if value_type not in cache:
+        cache[value_type] = _analyze(lambda_obj, value_type)
+    return cache[value_type]
+
+
+def _analyze(lambda_obj: lobject.Lambda, value_type: type) -> Optional[Kernel]:
+    args = ["p{}".format(i) for i in range(len(lambda_obj.params))]
+    names: Dict[str, Tuple[str, type]] = {}
+    for param, i in lambda_obj.param_index.items():
+        if param in _CONSTANT_SYMBOLS:
+            return None
+        names[param] = (args[i], value_type)
+
+    consts: Dict[str, object] = {}
+    try:
+        expr, result_type = _expr(lobject.LList(lambda_obj.body), names, consts)
+    except _NotVectorizable:
+        return None
+
+    func = eval("lambda {}: {}".format(", ".join(args), expr), consts)
+    return func, result_type
+
+
+def _expr(
+    o: lobject.Object, names: Dict[str, Tuple[str, type]], consts: Dict[str, object]
+) -> Tuple[str, type]:
+    if isinstance(o, lobject.LList):
+        object_list = o.object_list
+        if len(object_list) == 3 and isinstance(object_list[0], lobject.BinaryOp):
+            return _binary_op(object_list, names, consts)
+        if len(object_list) == 4 and object_list[0] == lobject.If:
+            return _if(object_list, names, consts)
+    elif isinstance(o, lobject.Symbol):
+        if o.s in names:
+            return names[o.s]
+    elif type(o) is lobject.Integer:
+        return _const(o.i, consts), int
+    elif type(o) is lobject.Float:
+        return _const(o.f, consts), float
+    raise _NotVectorizable()
+
+
+def _const(value: object, consts: Dict[str, object]) -> str:
+    name = "c{}".format(len(consts))
+    consts[name] = value
+    return name
+
+
+def _binary_op(
+    object_list: List[lobject.Object],
+    names: Dict[str, Tuple[str, type]],
+    consts: Dict[str, object],
+) -> Tuple[str, type]:
+    op = object_list[0].op  # type: ignore
+    lhs, lhs_type = _expr(object_list[1], names, consts)
+    rhs, rhs_type = _expr(object_list[2], names, consts)
+
+    if lhs_type is int and rhs_type is int:
+        if op in _INT_OPS:
+            return "({} {} {})".format(lhs, _INT_OPS[op], rhs), int
+        if op in _INT_COMPARISONS:
+            return "({} {} {})".format(lhs, _INT_COMPARISONS[op], rhs), bool
+    elif lhs_type is float and rhs_type is float:
+        if op in _FLOAT_OPS:
+            return "({} {} {})".format(lhs, _FLOAT_OPS[op], rhs), float
+    raise _NotVectorizable()
+
+
+def _if(
+    object_list: List[lobject.Object],
+    names: Dict[str, Tuple[str, type]],
+    consts: Dict[str, object],
+) -> Tuple[str, type]:
+    cond, cond_type = _expr(object_list[1], names, consts)
+    then_expr, then_type = _expr(object_list[2], names, consts)
+    else_expr, else_type = _expr(object_list[3], names, consts)
+    if cond_type is not bool or then_type is not else_type:
+        raise _NotVectorizable()
+    return "({} if {} else {})".format(then_expr, cond, else_expr), then_type
@@ -0,0 +1,725 @@
+import operator
+from enum import IntEnum, auto
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+from lisp import lobject, env, primitives
+from lisp.primitives import EvalError
+
+
+class Op(IntEnum):
+    # push consts[arg]
+    CONST = auto()
+    # push a parameter of the running lambda. arg: slot in its frame
+    LOAD_LOCAL = auto()
+    # push a variable found by name up the environment chain. arg: index in names
+    LOAD_GLOBAL = auto()
+    # pop a value and define it in the current environment, push Void.
+    STORE = auto()
+    # pop rhs and lhs, push the result. arg: index in BINARY_OPS
+    BINARY_OP = auto()
+    # pop a Bool and jump to arg when it is false.
+    JUMP_IF_FALSE = auto()
+    # jump to arg
+    JUMP = auto()
+    # push the lambda of the call consts[arg], a _Call, after checking that it
+    # takes the arguments that follow.
+    LOAD_FUNC = auto()
+    # pop arg arguments and a lambda, run the lambda body and push its result.
+    CALL = auto()
+    # same as CALL, but replaces the running lambda instead of returning to it.
+    TAIL_CALL = auto()
+    # pop arg values and push an LList of the ones that are not Void.
+    BUILD_LLIST = auto()
+    # consts[arg] is (function, number of arguments, steps) of a keyword.
+    # steps, if not None, is its primitives.KeywordSteps and the lambdas it
+    # calls run on the frame stack of run().
+    CALL_KEYWORD = auto()
+    # consts[arg] is (params, body, code, param_index, vectorized). push a new
+    # lambda.
+    MAKE_LAMBDA = auto()
+    # pop a value and return it to the caller.
+    RETURN = auto()
+    # raise EvalError(consts[arg])
+    ERROR = auto()
+
+
+# the dispatch loop compares plain ints, which is much faster than looking up
+# enum members on every instruction.
+CONST = int(Op.CONST)
+LOAD_LOCAL = int(Op.LOAD_LOCAL)
+LOAD_GLOBAL = int(Op.LOAD_GLOBAL)
+STORE = int(Op.STORE)
+BINARY_OP = int(Op.BINARY_OP)
+JUMP_IF_FALSE = int(Op.JUMP_IF_FALSE)
+JUMP = int(Op.JUMP)
+LOAD_FUNC = int(Op.LOAD_FUNC)
+CALL = int(Op.CALL)
+TAIL_CALL = int(Op.TAIL_CALL)
+BUILD_LLIST = int(Op.BUILD_LLIST)
+CALL_KEYWORD = int(Op.CALL_KEYWORD)
+MAKE_LAMBDA = int(Op.MAKE_LAMBDA)
+RETURN = int(Op.RETURN)
+ERROR = int(Op.ERROR)
+
+BINARY_OPS = ["+", "-", "*", "/", "%", "<", ">", "=", "!="]
+
+# integer fast paths of BINARY_OPS, in the same order: (function, result constructor)
+_INT_OPS: List[Tuple[Any, Any]] = [
+    (operator.add, lobject.make_integer),
+    (operator.sub, lobject.make_integer),
+    (operator.mul, lobject.make_integer),
+    (operator.floordiv, lobject.make_integer),
+    (operator.mod, lobject.make_integer),
+    (operator.lt, lobject.make_bool),
+    (operator.gt, lobject.make_bool),
+    (operator.eq, lobject.make_bool),
+    (operator.ne, lobject.make_bool),
+]
+
+
+class Code(object):
+    __slots__ = ("ops", "consts", "names", "spans")
+
+    def __init__(
+        self,
+        ops: List[int],
+        consts: List[Any],
+        names: List[str],
+        spans: List[Tuple[int, int, lobject.LList]] = None,
+    ):
+        # ops is a flat list of (opcode, argument) pairs.
+        self.ops = ops
+        self.consts = consts
+        self.names = names
+        # (start, end, list) of the ops compiled from each list, inner lists
+        # first. only read when an EvalError is raised.
+        self.spans = spans if spans is not None else []
+
+    def forms(self, pc: int) -> List[lobject.LList]:
+        # the lists the op at pc was compiled from, innermost first.
+        return [node for start, end, node in self.spans if start <= pc < end]
+
+    def __str__(self) -> str:
+        return disassemble(self)
+
+
+def disassemble(code: Code) -> str:
+    lines = []
+    for pc in range(0, len(code.ops), 2):
+        op = Op(code.ops[pc])
+        arg = code.ops[pc + 1]
+        if op in (Op.LOAD_GLOBAL, Op.STORE):
+            detail = code.names[arg]
+        elif op == Op.LOAD_FUNC:
+            detail = code.consts[arg].name
+        elif op in (Op.CONST, Op.ERROR):
+            detail = "{}".format(code.consts[arg])
+        elif op == Op.BINARY_OP:
+            detail = BINARY_OPS[arg]
+        else:
+            detail = ""
+        lines.append("{:4} {:<14}{:4} {}".format(pc, op.name, arg, detail).rstrip())
+    return "\n".join(lines)
+
+
+class _Call(object):
+    # a call of the lambda bound to name with num_args arguments, compiled in
+    # the body of a lambda with param_index. end is the pc after its CALL.
+    __slots__ = ("name", "args", "num_args", "param_index", "tail", "end", "trimmed")
+
+    def __init__(
+        self,
+        name: str,
+        args: List[lobject.Object],
+        param_index: Dict[str, int],
+        tail: bool,
+    ):
+        self.name = name
+        self.args = args
+        self.num_args = len(args)
+        self.param_index = param_index
+        self.tail = tail
+        self.end = 0
+        # number of parameters -> code of the call without the extra arguments.
+        self.trimmed: Dict[int, Code] = {}
+
+    def without_extra_args(self, num_params: int) -> Code:
+        # like the other engines, arguments the lambda has no parameters for
+        # are not evaluated.
+        code = self.trimmed.get(num_params)
+        if code is None:
+            form = lobject.LList([lobject.Symbol(self.name)] + self.args[:num_params])
+            asm = _Assembler(self.param_index)
+            _compile_obj(asm, form, tail=self.tail)
+            if not self.tail:
+                asm.emit(Op.RETURN)
+            code = self.trimmed[num_params] = asm.build()
+        return code
+
+
+class _Assembler(object):
+    def __init__(self, param_index: Dict[str, int]):
+        self.ops: List[int] = []
+        self.consts: List[Any] = []
+        self.names: List[str] = []
+        self.name_index: Dict[str, int] = {}
+        self.spans: List[Tuple[int, int, lobject.LList]] = []
+        # parameter name -> slot of the lambda whose body is being compiled.
+        self.param_index = param_index
+
+    def emit(self, op: Op, arg: int = 0) -> int:
+        self.ops.append(int(op))
+        self.ops.append(arg)
+        return len(self.ops) - 2
+
+    def patch(self, pos: int, target: int):
+        self.ops[pos + 1] = target
+
+    def here(self) -> int:
+        return len(self.ops)
+
+    def const(self, value: Any) -> int:
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def name(self, name: str) -> int:
+        if name not in self.name_index:
+            self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.name_index[name]
+
+    def build(self) -> Code:
+        return Code(self.ops, self.consts, self.names, self.spans)
+
+
+def compile_obj(o: lobject.Object) -> Code:
+    asm = _Assembler({})
+    _compile_obj(asm, o, tail=True)
+    return asm.build()
+
+
+def compile_lambda(lambda_obj: lobject.Lambda) -> Code:
+    if lambda_obj.bytecode is None:
+        lambda_obj.bytecode = _compile_body(
+            lambda_obj.param_index, lobject.LList(lambda_obj.body)
+        )
+    return lambda_obj.bytecode
+
+
+def _compile_body(param_index: Dict[str, int], body: lobject.LList) -> Code:
+    asm = _Assembler(param_index)
+    _compile_obj(asm, body, tail=True)
+    return asm.build()
+
+
+def _compile_obj(asm: _Assembler, o: lobject.Object, tail: bool):
+    if isinstance(o, lobject.LList):
+        start = asm.here()
+        _compile_form(asm, o, tail)
+        asm.spans.append((start, asm.here(), o))
+        return
+    _compile_form(asm, o, tail)
+
+
+def _compile_form(asm: _Assembler, o: lobject.Object, tail: bool):
+    if isinstance(o, lobject.LList) and len(o.object_list) > 0:
+        head = o.object_list[0]
+        if isinstance(head, lobject.BinaryOp):
+            _compile_binary_op(asm, o.object_list)
+        elif isinstance(head, lobject.Keyword):
+            _compile_keyword(asm, o.object_list)
+        elif head == lobject.If:
+            _compile_if(asm, o.object_list, tail)
+            return
+        elif isinstance(head, lobject.Symbol):
+            _compile_call(asm, o.object_list, tail)
+            return
+        else:
+            _compile_llist(asm, o.object_list)
+    elif isinstance(o, lobject.LList):
+        _compile_llist(asm, o.object_list)
+    elif o == lobject.Void or isinstance(o, lobject.Lambda):
+        asm.emit(Op.CONST, asm.const(lobject.Void))
+    elif isinstance(o, lobject.Symbol):
+        _compile_symbol(asm, o.s)
+    elif isinstance(
+        o,
+        (lobject.Bool, lobject.Integer, lobject.Float, lobject.String, lobject.ListData),
+    ):
+        asm.emit(Op.CONST, asm.const(o))
+    else:
+        asm.emit(
+            Op.ERROR, asm.const("unknown object type. object_type={}".format(type(o)))
+        )
+
+    if tail:
+        asm.emit(Op.RETURN)
+
+
+def _compile_symbol(asm: _Assembler, s: str):
+    if s == "#t":
+        asm.emit(Op.CONST, asm.const(lobject.TRUE))
+    elif s == "#f":
+        asm.emit(Op.CONST, asm.const(lobject.FALSE))
+    elif s == "#nil":
+        asm.emit(Op.CONST, asm.const(lobject.Void))
+    elif s in asm.param_index:
+        asm.emit(Op.LOAD_LOCAL, asm.param_index[s])
+    else:
+        asm.emit(Op.LOAD_GLOBAL, asm.name(s))
+
+
+def _compile_llist(asm: _Assembler, object_list: List[lobject.Object]):
+    for obj in object_list:
+        _compile_obj(asm, obj, tail=False)
+    asm.emit(Op.BUILD_LLIST, len(object_list))
+
+
+def _compile_keyword(asm: _Assembler, object_list: List[lobject.Object]):
+    kw = object_list[0].keyword  # type: ignore
+
+    if kw == "define":
+        _compile_define(asm, object_list)
+        return
+    elif kw == "lambda":
+        _compile_function_def(asm, object_list)
+        return
+
+    if kw not in primitives.KEYWORD_FUNCTIONS:
+        asm.emit(Op.ERROR, asm.const("Unbound keyword: {}".format(kw)))
+        return
+
+    func, num_args = primitives.KEYWORD_FUNCTIONS[kw]
+    if num_args is not None and len(object_list) != num_args + 1:
+        err = "Invalid number of arguments for {} {}".format(
+            kw, lobject.LList(object_list)
+        )
+        asm.emit(Op.ERROR, asm.const(err))
+        return
+
+    for obj in object_list[1:]:
+        _compile_obj(asm, obj, tail=False)
+    steps = primitives.KEYWORD_STEPS.get(kw)
+    asm.emit(Op.CALL_KEYWORD, asm.const((func, len(object_list) - 1, steps)))
+
+
+def _compile_define(asm: _Assembler, object_list: List[lobject.Object]):
+    if len(object_list) != 3:
+        asm.emit(Op.ERROR, asm.const("Invalid number of arguments for define"))
+        return
+
+    if not isinstance(object_list[1], lobject.Symbol):
+        asm.emit(Op.ERROR, asm.const("Invalid define"))
+        return
+
+    _compile_obj(asm, object_list[2], tail=False)
+    asm.emit(Op.STORE, asm.name(object_list[1].s))
+
+
+def _compile_function_def(asm: _Assembler, object_list: List[lobject.Object]):
+    if len(object_list) < 3:
+        asm.emit(Op.ERROR, asm.const("Invalid number of arguments for lambda"))
+        return
+
+    # parse parameters
+    if not isinstance(object_list[1], lobject.LList):
+        err = 'Invalid lambda parameter. "{}"'.format(object_list[1])
+        asm.emit(Op.ERROR, asm.const(err))
+        return
+    params: List[str] = []
+    for param in object_list[1].object_list:
+        if not isinstance(param, lobject.Symbol):
+            asm.emit(Op.ERROR, asm.const('Invalid lambda parameter. "{}"'.format(param)))
+            return
+        params.append(param.s)
+
+    # parse body
+    if not isinstance(object_list[2], lobject.LList):
+        asm.emit(Op.ERROR, asm.const("Invalid lambda. body must be lobject.LList"))
+        return
+    body = object_list[2].object_list.copy()
+    param_index = env.make_param_index(params)
+    # the body list of the form itself is compiled, so errors in it are
+    # located in the source.
+    bytecode = _compile_body(param_index, object_list[2])
+    vectorized: dict = {}
+    asm.emit(
+        Op.MAKE_LAMBDA, asm.const((params, body, bytecode, param_index, vectorized))
+    )
+
+
+def _compile_if(asm: _Assembler, object_list: List[lobject.Object], tail: bool):
+    if len(object_list) != 4:
+        asm.emit(Op.ERROR, asm.const("Invalid number of arguments for if statement"))
+        if tail:
+            asm.emit(Op.RETURN)
+        return
+
+    _compile_obj(asm, object_list[1], tail=False)
+    jump_to_else = asm.emit(Op.JUMP_IF_FALSE)
+    _compile_obj(asm, object_list[2], tail)
+
+    if tail:
+        # both branches return, nothing to jump over.
+        asm.patch(jump_to_else, asm.here())
+        _compile_obj(asm, object_list[3], tail)
+        return
+
+    jump_to_end = asm.emit(Op.JUMP)
+    asm.patch(jump_to_else, asm.here())
+    _compile_obj(asm, object_list[3], tail)
+    asm.patch(jump_to_end, asm.here())
+
+
+def _compile_call(asm: _Assembler, object_list: List[lobject.Object], tail: bool):
+    call = _Call(object_list[0].s, object_list[1:], asm.param_index, tail)  # type: ignore
+    asm.emit(Op.LOAD_FUNC, asm.const(call))
+    for obj in object_list[1:]:
+        _compile_obj(asm, obj, tail=False)
+    asm.emit(Op.TAIL_CALL if tail else Op.CALL, call.num_args)
+    call.end = asm.here()
+
+
+def _compile_binary_op(asm: _Assembler, object_list: List[lobject.Object]):
+    if len(object_list) != 3:
+        err = "Invalid number of arguments for infix operator. len={}".format(
+            len(object_list)
+        )
+        asm.emit(Op.ERROR, asm.const(err))
+        return
+
+    op = object_list[0].op  # type: ignore
+    if op not in BINARY_OPS:
+        asm.emit(Op.ERROR, asm.const("Invalid infix operator: {}".format(op)))
+        return
+
+    _compile_obj(asm, object_list[1], tail=False)
+    _compile_obj(asm, object_list[2], tail=False)
+    asm.emit(Op.BINARY_OP, BINARY_OPS.index(op))
+
+
+def _bind(lambda_obj: lobject.Lambda, args: List[lobject.Object], parent: env.Env):
+    num_params = len(lambda_obj.params)
+    if num_params > len(args):
+        raise EvalError(
+            "Invalid number of arguments. expected={}, actual={}".format(
+                num_params, len(args)
+            )
+        )
+    if num_params < len(args):
+        args = args[:num_params]
+    return env.frame(parent, lambda_obj.param_index, args)
+
+
+def _apply(
+    lambda_obj: lobject.Lambda, args: List[lobject.Object], environment: env.Env
+) -> lobject.Object:
+    memo = lambda_obj.memo
+    if memo is not None:
+        args = args[: len(lambda_obj.params)]
+        value = memo.get(args)
+        if value is not None:
+            return value
+
+    new_env = _bind(lambda_obj, args, environment)
+    result = run(compile_lambda(lambda_obj), new_env)
+    if memo is not None:
+        memo.put(args, result)
+    return result
+
+
+class _MemoCall(object):
+    # the pending call of a memoized lambda, whose result is stored in its
+    # cache when the call returns.
+    __slots__ = ("memo", "args")
+
+    def __init__(self, memo, args: List[lobject.Object]):
+        self.memo = memo
+        self.args = args
+
+
+# a memoized lambda called in tail position returns here, so its result can
+# be stored before it is returned to the caller.
+_RETURN_CODE = Code([RETURN, 0], [], [])
+
+
+def _resume(
+    steps: primitives.Steps, value: Optional[lobject.Object]
+) -> Tuple[Optional[Tuple[lobject.Lambda, List[lobject.Object]]], Any]:
+    # sends value to a keyword running as steps, None to start it. returns
+    # the next call it asks for, or None and its result. calls of memoized
+    # lambdas that are in their cache are answered right away.
+    try:
+        request = steps.send(value)  # type: ignore
+        while True:
+            lambda_obj, args = request
+            memo = lambda_obj.memo
+            if memo is None:
+                return request, None
+            args = args[: len(lambda_obj.params)]
+            value = memo.get(args)
+            if value is None:
+                return (lambda_obj, args), None
+            request = steps.send(value)
+    except StopIteration as stop:
+        return None, stop.value
+
+
+def _enter(
+    request: Tuple[lobject.Lambda, List[lobject.Object]],
+    caller: env.Env,
+    frames: List[Tuple[Code, int, env.Env, Any]],
+) -> Tuple[Code, env.Env]:
+    # starts a call a keyword running as steps asked for.
+    lambda_obj, args = request
+    if lambda_obj.memo is not None:
+        frames.append((_RETURN_CODE, 0, caller, _MemoCall(lambda_obj.memo, args)))
+    new_env = _bind(lambda_obj, args, caller)
+    return compile_lambda(lambda_obj), new_env
+
+
+# returned by _run() when a Task used up its calls.
+_PAUSED = object()
+
+
+class Task(object):
+    # a form running on the vm that stops after a number of lisp calls and
+    # continues where it stopped when it is run again, so other work can run
+    # in between. calls made by keywords that do not run as steps, e.g. by
+    # pmap, run to the end without stopping. map, filter and reduce are not
+    # vectorized while it runs, so their lambdas are calls it can stop at.
+    __slots__ = ("code", "pc", "environment", "stack", "frames", "done", "result")
+
+    def __init__(self, code: Code, environment: env.Env):
+        self.code = code
+        self.pc = 0
+        self.environment = environment
+        self.stack: List[Any] = []
+        self.frames: List[Tuple[Code, int, env.Env, Any]] = []
+        self.done = False
+        self.result: Optional[lobject.Object] = None
+
+    def run(self, calls: int) -> bool:
+        # true once the form is evaluated and result is set.
+        if calls < 1:
+            raise ValueError("calls must be positive: {}".format(calls))
+        token = primitives.vectorizing.set(False)
+        try:
+            result = _run(
+                self.code, self.pc, self.environment, self.stack, self.frames, calls, self
+            )
+        finally:
+            primitives.vectorizing.reset(token)
+        if result is _PAUSED:
+            return False
+        self.done = True
+        self.result = result
+        return True
+
+
+def _pause(task: Task, code: Code, pc: int, environment: env.Env):
+    # the stack and frames of a task are its own lists and already up to date.
+    task.code = code
+    task.pc = pc
+    task.environment = environment
+    return _PAUSED
+
+
+def run(code: Code, environment: env.Env) -> lobject.Object:
+    # a negative ticks never counts down to 0, so the form runs to the end.
+    return _run(code, 0, environment, [], [], -1, None)
+
+
+def _run(
+    code: Code,
+    pc: int,
+    environment: env.Env,
+    stack: List[Any],
+    frames: List[Tuple[Code, int, env.Env, Any]],
+    ticks: int,
+    task: Optional[Task],
+) -> Any:
+    # ticks is the number of lisp calls left before returning _PAUSED.
+    ops = code.ops
+    consts = code.consts
+    names = code.names
+
+    push = stack.append
+    pop = stack.pop
+    # frames holds the saved (code, pc, environment, steps) of the callers.
+    # steps is the keyword waiting for the result of the call, a _MemoCall,
+    # or None.
+
+    int_type = lobject.Integer
+    bool_type = lobject.Bool
+    lambda_type = lobject.Lambda
+    binary_op = primitives.binary_op
+    void = lobject.Void
+
+    try:
+        while True:
+            op = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+
+            if op == LOAD_LOCAL:
+                push(environment.slots[arg])
+            elif op == CONST:
+                push(consts[arg])
+            elif op == BINARY_OP:
+                right = pop()
+                left = pop()
+                if type(left) is int_type and type(right) is int_type:
+                    func, make_result = _INT_OPS[arg]
+                    push(make_result(func(left.i, right.i)))
+                else:
+                    push(binary_op(BINARY_OPS[arg], left, right))
+            elif op == JUMP_IF_FALSE:
+                cond = pop()
+                if type(cond) is not bool_type:
+                    raise EvalError("Condition must be a boolean")
+                if not cond.b:
+                    pc = arg
+            elif op == LOAD_GLOBAL:
+                name = names[arg]
+                val = environment.get(name)
+                if val is None:
+                    raise EvalError("Unbound symbol: {}".format(name))
+                push(val)
+            elif op == LOAD_FUNC:
+                call = consts[arg]
+                lambda_obj = environment.get(call.name)
+                if lambda_obj is None:
+                    raise EvalError("Unbound function: {}".format(call.name))
+                if type(lambda_obj) is not lambda_type:
+                    raise EvalError("Not a lambda")
+                num_params = len(lambda_obj.params)
+                if num_params != call.num_args:
+                    # checked before any argument is evaluated.
+                    if num_params > call.num_args:
+                        raise EvalError(
+                            "Invalid number of arguments for {}. expected={}, actual={}".format(
+                                call.name, num_params, call.num_args
+                            )
+                        )
+                    if not call.tail:
+                        frames.append((code, call.end, environment, None))
+                    code = call.without_extra_args(num_params)
+                    ops = code.ops
+                    consts = code.consts
+                    names = code.names
+                    pc = 0
+                    continue
+                push(lambda_obj)
+            elif op == CALL or op == TAIL_CALL:
+                args = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                lambda_obj = pop()
+                memo = lambda_obj.memo
+                if memo is not None:
+                    args = args[: len(lambda_obj.params)]
+                    value = memo.get(args)
+                    if op == TAIL_CALL:
+                        code = _RETURN_CODE
+                        pc = 0
+                    if value is not None:
+                        push(value)
+                        ops = code.ops
+                        continue
+                    frames.append((code, pc, environment, _MemoCall(memo, args)))
+                    new_env = _bind(lambda_obj, args, environment)
+                elif op == CALL:
+                    frames.append((code, pc, environment, None))
+                    new_env = _bind(lambda_obj, args, environment)
+                else:
+                    parent = env.tail_call_parent(environment, lambda_obj.param_index)
+                    new_env = _bind(lambda_obj, args, parent)
+                code = lambda_obj.bytecode
+                if code is None:
+                    code = compile_lambda(lambda_obj)
+                ops = code.ops
+                consts = code.consts
+                names = code.names
+                pc = 0
+                environment = new_env
+                ticks -= 1
+                if ticks == 0:
+                    return _pause(task, code, pc, environment)  # type: ignore
+            elif op == RETURN:
+                if len(frames) == 0:
+                    return pop()
+                code, pc, environment, steps = frames.pop()
+                ops = code.ops
+                consts = code.consts
+                names = code.names
+                if type(steps) is _MemoCall:
+                    steps.memo.put(steps.args, stack[-1])
+                elif steps is not None:
+                    # send the result back to the keyword that asked for the call.
+                    request, result = _resume(steps, pop())
+                    if request is None:
+                        push(result)
+                    else:
+                        frames.append((code, pc, environment, steps))
+                        code, environment = _enter(request, environment, frames)
+                        ops = code.ops
+                        consts = code.consts
+                        names = code.names
+                        pc = 0
+                        ticks -= 1
+                        if ticks == 0:
+                            return _pause(task, code, pc, environment)  # type: ignore
+            elif op == JUMP:
+                pc = arg
+            elif op == STORE:
+                environment.set(names[arg], pop())
+                push(void)
+            elif op == BUILD_LLIST:
+                values = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                push(lobject.LList([val for val in values if not (val == void)]))
+            elif op == CALL_KEYWORD:
+                func, num_args, steps = consts[arg]
+                args = stack[len(stack) - num_args:]
+                del stack[len(stack) - num_args:]
+                apply = partial(_apply, environment=environment)
+                if steps is None:
+                    push(func(args, apply))
+                else:
+                    steps = steps(args, apply)
+                    request, result = _resume(steps, None)
+                    if request is None:
+                        push(result)
+                    else:
+                        frames.append((code, pc, environment, steps))
+                        code, environment = _enter(request, environment, frames)
+                        ops = code.ops
+                        consts = code.consts
+                        names = code.names
+                        pc = 0
+                        ticks -= 1
+                        if ticks == 0:
+                            return _pause(task, code, pc, environment)  # type: ignore
+            elif op == MAKE_LAMBDA:
+                params, body, bytecode, param_index, vectorized = consts[arg]
+                push(
+                    lobject.Lambda(
+                        params,
+                        body,
+                        bytecode=bytecode,
+                        param_index=param_index,
+                        vectorized=vectorized,
+                    )
+                )
+            elif op == ERROR:
+                raise EvalError(consts[arg])
+            else:
+                raise EvalError("Invalid opcode: {}".format(op))
+    except EvalError as e:
+        # pc is past the op that failed, and the saved pc of a caller is past
+        # its call.
+        e.forms.extend(code.forms(pc - 2))
+        for caller, caller_pc, _, _ in reversed(frames):
+            e.forms.extend(caller.forms(caller_pc - 2))
+        raise
@@ -1,7 +1,26 @@
-from lisp import leval, lexer, parser, env, lobject
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from functools import partial
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from lisp import cache, leval, lexer, parser, env, lobject, parallel, profiler, source
+from lisp.limits import Governor, Limits
+from lisp.primitives import EvalError
 
 PROMPT = "lisp-py> "
 
+# size of the blocks read from a script file or stdin.
+CHUNK_SIZE = 64 * 1024
+
+# most scripts a --batch worker is given at once.
+BATCH_CHUNK_SIZE = 16
+
 
 def _eval_program(program: str, environment: env.Env):
     tokens = lexer.tokenize(program)
@@ -9,7 +28,189 @@ def _eval_program(program: str, environment: env.Env):
     return leval.evaluate(ast, environment)
 
 
-def main():
+def _eval_stream(
+    stream: TextIO,
+    environment: env.Env,
+    prof: Optional[profiler.Profiler] = None,
+    src: Optional[source.Source] = None,
+) -> Iterator[lobject.Object]:
+    # evaluate top-level forms one by one while the stream is still being read.
+    chunks = iter(partial(stream.read, CHUNK_SIZE), "")
+    for first_token, form in parser.parse_iter_indexed(lexer.iter_tokens(chunks)):
+        yield _eval_form(form, first_token, environment, prof, src)
+
+
+def _eval_form(
+    form: lobject.Object,
+    first_token: int,
+    environment: env.Env,
+    prof: Optional[profiler.Profiler],
+    src: Optional[source.Source],
+) -> lobject.Object:
+    if src is not None:
+        src.add_form(form, first_token)
+    if prof is not None and src is not None:
+        span = src.locate(form, first_token)
+        if span is not None:
+            prof.location = "{}:{}".format(src.name, span.start.line)
+    try:
+        return leval.evaluate(form, environment, profiler=prof)
+    except EvalError as e:
+        if src is not None:
+            src.locate_error(e, form, first_token)
+        raise
+
+
+def _print_value(val: lobject.Object):
+    if val == lobject.Void:
+        pass
+    elif isinstance(val, lobject.Lambda):
+        print("Lambda(", end="")
+        for param in val.params:
+            print("{} ".format(param), end="")
+        print(")", end="")
+        for expr in val.body:
+            print(" {}".format(expr), end="")
+        print("")
+    else:
+        print("{}".format(val))
+
+
+def run_script(
+    path: str,
+    program_cache: Optional[cache.ProgramCache] = None,
+    prof: Optional[profiler.Profiler] = None,
+    limits: Optional[Limits] = None,
+):
+    if limits is not None:
+        # one governor for the whole script, so its forms share the limits.
+        with Governor(limits):
+            return run_script(path, program_cache, prof)
+
+    environment = env.new()
+    if path == "-":
+        for val in _eval_stream(sys.stdin, environment, prof):
+            _print_value(val)
+        return
+
+    if program_cache is not None:
+        # the whole file is needed for its hash, so it is not streamed.
+        with open(path) as f:
+            text = f.read()
+        src = source.Source(path, text)
+        for first_token, form in source.index_forms(program_cache.forms(text)):
+            _print_value(_eval_form(form, first_token, environment, prof, src))
+        return
+
+    # the file is only read again when a position is needed.
+    src = source.Source(path)
+    with open(path) as f:
+        for val in _eval_stream(f, environment, prof, src):
+            _print_value(val)
+
+
+def find_scripts(paths: Iterable[str]) -> Iterator[str]:
+    # files as given, and the .lisp files under directories in name order.
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".lisp"):
+                    yield os.path.join(root, name)
+
+
+def run_batch_script(
+    path: str,
+    engine: str = None,
+    cache_dir: Optional[str] = None,
+    limits: Optional[Limits] = None,
+) -> dict:
+    # runs one script of a batch in a fresh environment. what it prints is
+    # returned instead of written to stdout, where the results of the other
+    # scripts go.
+    previous_engine = leval.DEFAULT_ENGINE
+    if engine is not None:
+        leval.DEFAULT_ENGINE = engine
+    program_cache = None
+    if cache_dir is not None:
+        program_cache = cache.ProgramCache(directory=cache_dir)
+
+    output = io.StringIO()
+    result = {"path": path, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            run_script(path, program_cache, limits=limits)
+    except Exception as e:
+        # RecursionError and other python errors fail the script, not the
+        # batch.
+        result["status"] = "error"
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+        if isinstance(e, EvalError) and e.location is not None:
+            result["location"] = e.location
+    finally:
+        leval.DEFAULT_ENGINE = previous_engine
+    result["seconds"] = time.perf_counter() - start
+    result["output"] = output.getvalue()
+    return result
+
+
+def _run_batch_chunk(
+    paths: List[str],
+    engine: Optional[str],
+    cache_dir: Optional[str],
+    limits: Optional[Limits],
+) -> List[dict]:
+    return [run_batch_script(path, engine, cache_dir, limits) for path in paths]
+
+
+def run_batch(
+    paths: Iterable[str],
+    jobs: int = None,
+    engine: str = None,
+    cache_dir: Optional[str] = None,
+    limits: Optional[Limits] = None,
+    out: TextIO = sys.stdout,
+) -> int:
+    # writes a JSON line per script as soon as it is done, so results come
+    # in completion order. returns the number of scripts that failed.
+    scripts = list(find_scripts(paths))
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs < 1:
+        raise ValueError("jobs must be positive: {}".format(jobs))
+    failures = 0
+
+    def write(results: List[dict]):
+        nonlocal failures
+        for result in results:
+            failures += result["status"] != "ok"
+            out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    if jobs == 1:
+        for path in scripts:
+            write([run_batch_script(path, engine, cache_dir, limits)])
+        return failures
+
+    # workers take several small scripts at a time, which saves a round trip
+    # per script, but few enough that every worker stays busy.
+    size = max(1, min(BATCH_CHUNK_SIZE, len(scripts) // (jobs * 4)))
+    chunks = [scripts[i:i + size] for i in range(0, len(scripts), size)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_run_batch_chunk, chunk, engine, cache_dir, limits)
+            for chunk in chunks
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            write(future.result())
+    return failures
+
+
+def repl():
     environment = env.new()
 
     while True:
@@ -19,24 +220,134 @@ def main():
             break
 
         val = _eval_program(line, environment)
-        if val.object_type == lobject.ObjectType.VOID:
-            pass
-        elif val.object_type == lobject.ObjectType.INTEGER:
-            print("{}".format(val.i))
-        elif val.object_type == lobject.ObjectType.BOOL:
-            print("{}".format(val.b))
-        elif val.object_type == lobject.ObjectType.SYMBOL:
-            print("{}".format(val.s))
-        elif val.object_type == lobject.ObjectType.LAMBDA:
-            print("Lambda(", end="")
-            for param in val.params:
-                print("{} ".format(param), end="")
-            print(")", end="")
-            for expr in val.body:
-                print(" {}".format(expr), end="")
-            print("")
-        else:
-            return print("{}".format(val))
+        _print_value(val)
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be positive: {}".format(value))
+    return number
+
+
+def main(argv: List[str] = None):
+    arg_parser = argparse.ArgumentParser(description="lisp-py interpreter")
+    arg_parser.add_argument(
+        "scripts", nargs="*", help='script files to run. "-" reads from stdin.'
+    )
+    arg_parser.add_argument(
+        "--engine",
+        choices=leval.ENGINES,
+        default=leval.DEFAULT_ENGINE,
+        help='evaluation engine. "vm" runs lisp calls on its own frame stack, '
+        "so recursion depth is only limited by memory.",
+    )
+    arg_parser.add_argument(
+        "--cache-dir",
+        help="directory to keep parsed script files in, so that running them "
+        "again skips the lexer and parser.",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the calls and time of each lisp function and top-level "
+        "form to stderr after the scripts ran. profiling uses the tree engine.",
+    )
+    arg_parser.add_argument(
+        "--profile-stacks",
+        metavar="FILE",
+        help="profile the scripts and write collapsed stacks for flame graph "
+        "tools to FILE.",
+    )
+    arg_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="run each script, or each .lisp file under a directory, in a fresh "
+        "environment on a pool of processes and write a JSON line with the "
+        "output, error and time of each.",
+    )
+    arg_parser.add_argument(
+        "--jobs",
+        type=_positive_int,
+        help="number of processes for --batch. defaults to the number of CPUs.",
+    )
+    arg_parser.add_argument(
+        "--pool",
+        choices=parallel.POOLS,
+        default=parallel.POOL,
+        help="pool pmap and pfilter run their chunks on.",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        help="number of workers of the pmap and pfilter pool. defaults to the "
+        "number of CPUs.",
+    )
+    arg_parser.add_argument(
+        "--max-steps",
+        type=int,
+        help="stop a script after this many lisp calls.",
+    )
+    arg_parser.add_argument(
+        "--max-list-size",
+        type=int,
+        help="stop a script that makes a list of more elements.",
+    )
+    arg_parser.add_argument(
+        "--max-depth",
+        type=int,
+        help="stop a script whose calls nest deeper.",
+    )
+    arg_parser.add_argument(
+        "--timeout",
+        type=float,
+        help="stop a script after this many seconds.",
+    )
+    args = arg_parser.parse_args(argv)
+    if args.batch and (args.profile or args.profile_stacks is not None):
+        arg_parser.error("--profile and --profile-stacks cannot be used with --batch")
+    leval.DEFAULT_ENGINE = args.engine
+    parallel.POOL = args.pool
+    parallel.WORKERS = args.workers
+
+    limits = None
+    if any(
+        limit is not None
+        for limit in [args.max_steps, args.max_list_size, args.max_depth, args.timeout]
+    ):
+        limits = Limits(args.max_steps, args.max_list_size, args.max_depth, args.timeout)
+
+    if args.batch:
+        failures = run_batch(
+            args.scripts, args.jobs, args.engine, args.cache_dir, limits
+        )
+        sys.exit(1 if failures > 0 else 0)
+
+    program_cache = None
+    if args.cache_dir is not None:
+        program_cache = cache.ProgramCache(directory=args.cache_dir)
+
+    if len(args.scripts) == 0:
+        repl()
+        return
+
+    prof = None
+    if args.profile or args.profile_stacks is not None:
+        prof = profiler.Profiler()
+
+    try:
+        for path in args.scripts:
+            run_script(path, program_cache, prof, limits)
+    except EvalError as e:
+        location = e.location if e.location is not None else "error"
+        sys.stderr.write("{}: {}\n".format(location, e))
+        sys.exit(1)
+    finally:
+        if args.profile:
+            sys.stderr.write(prof.report())  # type: ignore
+        if args.profile_stacks is not None:
+            with open(args.profile_stacks, "w") as f:
+                f.write(prof.collapsed())  # type: ignore
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+import asyncio
+import io
+
+import pytest
+
+from lisp import aio, env, lobject
+from lisp.limits import Limits, StepLimitError
+from lisp.primitives import EvalError
+
+
+class Stream(object):
+    # the parts of asyncio.StreamWriter aio uses.
+    def __init__(self):
+        self.data = io.BytesIO()
+        self.drains = 0
+
+    def write(self, data: bytes):
+        self.data.write(data)
+
+    async def drain(self):
+        self.drains += 1
+
+
+LONG_LOOP = """
+(define count (lambda (i acc) (if (= i 0) acc (count (- i 1) (+ acc 1)))))
+(count 5000 0)
+"""
+
+
+def test_run():
+    out = Stream()
+    result = asyncio.run(
+        aio.run('(define x 20) (print "start") (+ x 22)', env.new(), out)
+    )
+    assert result == lobject.Integer(42)
+    assert out.data.getvalue() == b"start\n"
+
+
+def run_with_ticker(program: str, slice_calls: int):
+    # the result of program and the number of times a task running next to it
+    # got to run.
+    ticks = []
+
+    async def ticker(done: asyncio.Event):
+        while not done.is_set():
+            ticks.append(1)
+            await asyncio.sleep(0)
+
+    async def main():
+        done = asyncio.Event()
+        tick_task = asyncio.create_task(ticker(done))
+        result = await aio.run(program, env.new(), slice_calls=slice_calls)
+        done.set()
+        await tick_task
+        return result
+
+    return asyncio.run(main()), len(ticks)
+
+
+def test_run_yields_to_the_loop():
+    result, ticks = run_with_ticker(LONG_LOOP, 100)
+    assert result == lobject.Integer(5000)
+    # about one tick for every 100 calls.
+    assert ticks >= 50
+
+
+def test_vectorizable_loops_yield_to_the_loop():
+    # the lambda would run as one python function over the whole range.
+    result, ticks = run_with_ticker(
+        "(reduce (lambda (a b) (+ a b)) (range 0 5000 1))", 100
+    )
+    assert result == lobject.Integer(sum(range(5000)))
+    assert ticks >= 40
+
+
+def test_concurrent_scripts_have_their_own_output():
+    async def script(name: str, out: Stream):
+        program = """
+        (define loop (lambda (i) (if (= i 0) 0 (loop (- i 1)))))
+        (map (lambda (x) (print (+ "{name}" x))) (list "1" "2" "3"))
+        (loop 1000)
+        (print "{name} done")
+        """.format(name=name)
+        await aio.run(program, env.new(), out, slice_calls=2)
+
+    async def main():
+        outs = [Stream() for _ in range(3)]
+        await asyncio.gather(*[script(str(i), out) for i, out in enumerate(outs)])
+        return outs
+
+    for i, out in enumerate(asyncio.run(main())):
+        assert out.data.getvalue().decode().splitlines() == [
+            "{}1".format(i),
+            "{}2".format(i),
+            "{}3".format(i),
+            "{} done".format(i),
+        ]
+        assert out.drains >= 2
+
+
+def test_run_error():
+    out = Stream()
+    with pytest.raises(EvalError, match="Unbound symbol"):
+        asyncio.run(aio.run('(print "before") (+ 1 y)', env.new(), out))
+    # output printed before the error is still written.
+    assert out.data.getvalue() == b"before\n"
+
+
+def test_run_limits():
+    # the governor counts the calls of every slice.
+    with pytest.raises(StepLimitError):
+        asyncio.run(
+            aio.run(LONG_LOOP, env.new(), slice_calls=100, limits=Limits(steps=1000))
+        )
@@ -0,0 +1,30 @@
+from benchmarks import suite
+
+
+def report(seconds: float, peak_bytes):
+    return {"results": {"fib": {"seconds": seconds, "peak_bytes": peak_bytes}}}
+
+
+def test_compare():
+    baseline = report(1.0, 1000)
+    assert suite.compare(report(1.05, 1050), baseline, 0.1, 0.1) == []
+    regressions = suite.compare(report(1.2, 1000), baseline, 0.1, 0.1)
+    assert regressions == ["fib: 1.0000s -> 1.2000s (+20.0%)"]
+    regressions = suite.compare(report(1.0, 2000), baseline, 0.1, 0.5)
+    assert regressions == ["fib: peak 1000.0B -> 2.0KB (+100.0%)"]
+
+
+def test_compare_skips_noise_and_new_workloads():
+    assert suite.compare(report(0.002, None), report(0.001, None), 0.1, 0.1) == []
+    assert suite.compare(report(1.0, 1000), {"results": {}}, 0.1, 0.1) == []
+
+
+def test_run_writes_json(tmp_path):
+    output = tmp_path / "results.json"
+    baseline = tmp_path / "baseline.json"
+    argv = ["--workloads", "fib-closure", "--repeat", "1"]
+    assert suite.main(argv + ["--save-baseline", str(baseline)]) == 0
+    argv += ["--output", str(output), "--baseline", str(baseline), "--threshold", "100"]
+    assert suite.main(argv) == 0
+    result = suite._read(str(output))["results"]["fib-closure"]
+    assert result["seconds"] > 0 and result["peak_bytes"] > 0
@@ -0,0 +1,57 @@
+import os
+
+from lisp import cache, env, lobject, serialize
+
+PROGRAM = """
+(define sqr (lambda (x) (* x x)))
+(if #t (sqr 7) #nil)
+"""
+
+
+def test_evaluate_caches_forms():
+    program_cache = cache.ProgramCache()
+    for _ in range(3):
+        assert program_cache.evaluate(PROGRAM, env.new()) == lobject.Integer(49)
+    assert (program_cache.hits, program_cache.misses) == (2, 1)
+    assert program_cache.forms(PROGRAM) is program_cache.forms(PROGRAM)
+
+
+def test_evaluate_each_engine():
+    program_cache = cache.ProgramCache()
+    for engine in ["closure", "vm", "tree"]:
+        result = program_cache.evaluate(PROGRAM, env.new(), engine=engine)
+        assert result == lobject.Integer(49)
+    assert program_cache.misses == 1
+
+
+def test_eviction():
+    program_cache = cache.ProgramCache(maxsize=2)
+    for source in ["(+ 1 1)", "(+ 1 2)", "(+ 1 3)", "(+ 1 1)"]:
+        program_cache.forms(source)
+    assert program_cache.misses == 4
+    assert len(program_cache.entries) == 2
+
+
+def test_disk_cache(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache.ProgramCache(directory=directory).forms(PROGRAM)
+    assert len(os.listdir(directory)) == 1
+
+    program_cache = cache.ProgramCache(directory=directory)
+    forms = program_cache.forms(PROGRAM)
+    assert (program_cache.disk_hits, program_cache.misses) == (1, 0)
+    assert forms[1].object_list[0] is lobject.If
+    assert program_cache.evaluate(PROGRAM, env.new()) == lobject.Integer(49)
+
+
+def test_disk_cache_version_mismatch(tmp_path):
+    directory = str(tmp_path)
+    cache.ProgramCache(directory=directory).forms(PROGRAM)
+    (path,) = [os.path.join(directory, name) for name in os.listdir(directory)]
+    with open(path, "r+b") as f:
+        f.seek(len(serialize.MAGIC))
+        f.write(bytes([serialize.FORMAT_VERSION + 1]))
+
+    program_cache = cache.ProgramCache(directory=directory)
+    assert program_cache.evaluate(PROGRAM, env.new()) == lobject.Integer(49)
+    assert (program_cache.disk_hits, program_cache.misses) == (0, 1)
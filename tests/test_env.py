@@ -0,0 +1,63 @@
+from lisp import env, lobject
+
+
+def test_get_from_parent():
+    root = env.new()
+    root.set("x", lobject.Integer(1))
+    child = env.extend(env.extend(root))
+    assert child.get("x") == lobject.Integer(1)
+    assert child.get("y") is None
+
+
+def test_frame_slots():
+    root = env.new()
+    root.set("x", lobject.Integer(1))
+    frame = env.frame(root, {"x": 0, "y": 1}, [lobject.Integer(2), lobject.Integer(3)])
+    assert frame.get("x") == lobject.Integer(2)
+    assert frame.get("y") == lobject.Integer(3)
+
+    frame.set("y", lobject.Integer(4))
+    assert frame.slots[1] == lobject.Integer(4)
+    frame.set("z", lobject.Integer(5))
+    assert frame.get("z") == lobject.Integer(5)
+    assert root.get("z") is None
+
+
+def test_tail_call_parent():
+    root = env.new()
+    param_index = env.make_param_index(["n"])
+    frame = env.frame(root, param_index, [lobject.Integer(1)])
+
+    assert env.tail_call_parent(frame, param_index) is root
+    assert env.tail_call_parent(frame, env.make_param_index(["n"])) is frame
+
+    frame.set("local", lobject.Integer(2))
+    assert env.tail_call_parent(frame, param_index) is frame
+
+
+def test_deep_lookup_cache():
+    root = env.new()
+    root.set("x", lobject.Integer(1))
+    param_index = env.make_param_index(["n"])
+    frames = [root]
+    for i in range(50):
+        frames.append(env.frame(frames[-1], param_index, [lobject.Integer(i)]))
+    assert frames[-1].get("x") == lobject.Integer(1)
+    assert frames[-1].cache is not None
+
+    # a new variable further down the chain hides the cached one.
+    frames[25].set("x", lobject.Integer(2))
+    assert frames[-1].get("x") == lobject.Integer(2)
+    assert frames[10].get("x") == lobject.Integer(1)
+
+    # rebinding the variable that was found needs no new lookup.
+    frames[25].set("x", lobject.Integer(3))
+    assert frames[-1].get("x") == lobject.Integer(3)
+
+
+def test_extend_with_variables():
+    root = env.new()
+    root.set("x", lobject.Integer(1))
+    child = env.extend(root, {"x": lobject.Integer(2)})
+    assert child.get("x") == lobject.Integer(2)
+    assert root.get("x") == lobject.Integer(1)
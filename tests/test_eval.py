@@ -1,6 +1,17 @@
+import tracemalloc
+from array import array
+
+import pytest
+
 from lisp import leval, lexer, parser, lobject, env
 
 
+@pytest.fixture(autouse=True, params=leval.ENGINES)
+def engine(request, monkeypatch):
+    monkeypatch.setattr(leval, "DEFAULT_ENGINE", request.param)
+    return request.param
+
+
 def eval_program(program: str):
     environment = env.new()
     tokens = lexer.tokenize(program)
@@ -210,6 +221,292 @@ def test_range():
     )
 
 
+def test_range_is_numeric():
+    result = eval_program("(range 0 1000 1)")
+    assert isinstance(result, lobject.LazyListData)
+    assert isinstance(result.materialize(), lobject.NumericListData)
+    assert result == lobject.ListData([lobject.Integer(i) for i in range(1000)])
+    assert eval_program("(length (range 0 1000 3))") == lobject.Integer(334)
+
+
+def test_range_beyond_int64():
+    result = eval_program("(range 9223372036854775806 9223372036854775809 1)")
+    assert not isinstance(result.materialize(), lobject.NumericListData)
+    assert eval_program("(length (range 9223372036854775806 9223372036854775809 1))") == (
+        lobject.Integer(3)
+    )
+
+
+def test_numeric_list_ops():
+    assert eval_program("(+ (range 0 2 1) (range 5 7 1))") == lobject.ListData(
+        [lobject.Integer(i) for i in [0, 1, 5, 6]]
+    )
+    assert eval_program("(+ (range 0 2 1) (list 7))") == lobject.ListData(
+        [lobject.Integer(i) for i in [0, 1, 7]]
+    )
+    program = """(
+        (define odd (lambda (x) (= 1 (% x 2))))
+        (reduce (lambda (x y) (+ x y)) (map (lambda (x) (* x x)) (filter odd (range 0 10 1))))
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.Integer(165)])
+    result = eval_program("(map (lambda (x) (* x 2)) (range 0 3 1))")
+    assert isinstance(result.materialize(), lobject.NumericListData)
+    assert eval_program("(map (lambda (x) (= x 1)) (range 0 2 1))") == (
+        lobject.ListData([lobject.FALSE, lobject.TRUE])
+    )
+
+
+def test_list_primitives():
+    assert eval_program("(car (list 1 2 3))") == lobject.Integer(1)
+    assert eval_program("(cdr (list 1 2 3))") == eval_program("(list 2 3)")
+    assert eval_program("(cdr (list))") == lobject.ListData([])
+    assert eval_program("(nth (range 0 10 1) 4)") == lobject.Integer(4)
+    assert eval_program('(nth (+ (range 0 70 1) (list "x")) 70)') == lobject.String("x")
+    assert eval_program("(cons 0 (range 1 4 1))") == eval_program("(range 0 4 1)")
+    assert eval_program("(append (list 1) (list 2 3) (range 4 6 1))") == (
+        eval_program("(range 1 6 1)")
+    )
+    assert eval_program("(append)") == lobject.ListData([])
+    assert eval_program("(reverse (+ (range 0 50 1) (range 50 100 1)))") == (
+        eval_program("(range 99 -1 -1)")
+    )
+    assert eval_program("(slice (range 0 200 1) 3 7)") == eval_program("(range 3 7 1)")
+    assert eval_program("(slice (list 1 2 3) 2 1)") == lobject.ListData([])
+    assert eval_program("(length (cdr (cdr (range 0 10 1))))") == lobject.Integer(8)
+    # car of a lazy filter stops at the first element.
+    assert eval_program(
+        "(car (filter (lambda (x) (> x 5)) (range 0 100000000 1)))"
+    ) == lobject.Integer(6)
+
+
+def test_list_primitive_errors():
+    with pytest.raises(leval.EvalError, match="car of empty list"):
+        eval_program("(car (list))")
+    with pytest.raises(leval.EvalError, match="nth index out of range: 1"):
+        eval_program("(nth (list 1) 1)")
+    with pytest.raises(leval.EvalError, match="non-negative Integer"):
+        eval_program("(slice (list 1) 0 -1)")
+    with pytest.raises(leval.EvalError, match="Invalid cons arguments"):
+        eval_program("(cons 1 2)")
+
+
+def test_hash_map():
+    program = """(
+        (define m (hash-map 1 "one" "two" 2 #t 3))
+        (define n (assoc m 1 "uno"))
+        (list (get m 1) (get n 1) (get m "two") (get m 5) (get m 5 0))
+    )"""
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.ListData(
+                [
+                    lobject.String("one"),
+                    lobject.String("uno"),
+                    lobject.Integer(2),
+                    lobject.Void,
+                    lobject.Integer(0),
+                ]
+            )
+        ]
+    )
+    assert eval_program("(keys (dissoc (hash-map 1 2 3 4) 1))") == (
+        lobject.ListData([lobject.Integer(3)])
+    )
+    assert eval_program("(contains? (hash-map #t 1) #t)") == lobject.TRUE
+    # 1 and 1.0 are different keys.
+    assert eval_program("(contains? (hash-map 1 1) 1.0)") == lobject.FALSE
+    assert eval_program("(length (hash-map 1 2 3 4))") == lobject.Integer(2)
+    program = """(
+        (define squares (lambda (m k) (assoc m k (* k k))))
+        (get (reduce squares (cons (hash-map) (range 0 1000 1))) 999)
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.Integer(999 * 999)])
+
+
+def test_hash_map_errors():
+    with pytest.raises(leval.EvalError, match="arguments for hash-map"):
+        eval_program("(hash-map 1)")
+    with pytest.raises(leval.EvalError, match="Not a hash map"):
+        eval_program("(get (list 1) 0)")
+    with pytest.raises(leval.EvalError, match="Invalid assoc key"):
+        eval_program("(assoc (hash-map) (list 1) 2)")
+
+
+def test_lazy_pipeline():
+    program = """(
+        (define odd (lambda (x) (= 1 (% x 2))))
+        (define l (map (lambda (x) (* x x)) (filter odd (range 0 10 1))))
+        (length l)
+        l
+        (+ l (list 0))
+        (length (+ l (range 0 5 1)))
+    )"""
+    squares = [lobject.Integer(i * i) for i in [1, 3, 5, 7, 9]]
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.Integer(5),
+            lobject.ListData(squares),
+            lobject.ListData(squares + [lobject.Integer(0)]),
+            lobject.Integer(10),
+        ]
+    )
+
+
+def test_map_over_lazy_list_runs_lambda_once(capfd):
+    program = """(
+        (define k 1)
+        (define xs (map (lambda (x) (+ x k)) (range 0 3 1)))
+        (define k 100)
+        xs
+    )"""
+    result = eval_program(program)
+    assert result.object_list[-1] == eval_program("(range 1 4 1)")
+
+    program = """(
+        (define show (lambda (x) (print x)))
+        (define ys (filter (lambda (x) (= 1 (length (list (show x))))) (range 0 3 1)))
+        (length (map show (range 0 2 1)))
+        (length ys)
+        ys
+    )"""
+    eval_program(program)
+    assert capfd.readouterr().out == "0\n1\n2\n0\n1\n"
+    with pytest.raises(leval.EvalError):
+        eval_program('(length (map (lambda (x) (+ x "a")) (range 0 3 1)))')
+
+
+def test_lazy_pipeline_runs_in_constant_memory():
+    program = "(reduce (lambda (x y) (+ x y)) (map (lambda (x) (* x 2)) (filter (lambda (x) (> x 2)) (range 0 20000 1))))"
+    tracemalloc.start()
+    try:
+        result = eval_program(program)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert result == lobject.Integer(sum(x * 2 for x in range(3, 20000)))
+    # the boxed intermediate lists alone would take over 1MB.
+    assert peak < 200000
+
+    # a materialized range of this size would not fit in memory.
+    assert eval_program("(length (range 0 1000000000000 1))") == lobject.Integer(10**12)
+    assert eval_program(
+        "(length (map (lambda (x) (* x 2)) (range 0 1000000000000 1)))"
+    ) == lobject.Integer(10**12)
+
+
+@pytest.mark.parametrize(
+    "pipeline",
+    [
+        "(map (lambda (x) (* x x)) {})",
+        "(map (lambda (x) (- (/ x 3) (% x 4))) {})",
+        "(map (lambda (x) (< x 10)) {})",
+        "(filter (lambda (x) (= (% x 3) 0)) {})",
+        "(reduce (lambda (x y) (+ x (* y y))) {})",
+        "(reduce (lambda (x y) (if (> x y) x y)) {})",
+        "(map (lambda (x) (* x 4611686018427387904)) {})",
+        "(reduce (lambda (x y) (+ (* x 31) y)) (map (lambda (x) (+ x 1)) {}))",
+    ],
+)
+def test_vectorized_matches_interpreter(pipeline):
+    values = [(x * 37) % 23 - 5 for x in range(40)]
+    boxed = "(list {})".format(" ".join(str(x) for x in values))
+    numeric = "(map (lambda (x) (- (% (* x 37) 23) 5)) (range 0 40 1))"
+    expected = eval_program(pipeline.format(boxed))
+    assert eval_program(pipeline.format(numeric)) == expected
+
+    environment = env.new()
+    environment.set("l", lobject.NumericListData(array("q", values)))
+    o = parser.parse(lexer.tokenize(pipeline.format("l")))
+    assert leval.evaluate(o, environment) == expected
+
+
+def test_vectorized_errors_match_interpreter():
+    with pytest.raises(ZeroDivisionError):
+        eval_program("(map (lambda (x) (/ 10 x)) (range 0 3 1))").materialize()
+    with pytest.raises(leval.EvalError):
+        eval_program("(map (lambda (x) (+ x 1.5)) (range 0 3 1))").materialize()
+    with pytest.raises(leval.EvalError):
+        eval_program("(reduce (lambda (x y) (+ x y)) (range 0 0 1))")
+
+
+def test_memoize():
+    program = """(
+        (define fib (memoize (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))))
+        (fib 90)
+        (memo-stats fib)
+    )"""
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.Integer(2880067194370816120),
+            lobject.ListData([lobject.Integer(i) for i in [88, 91, 0, 91]]),
+        ]
+    )
+
+
+def test_memoize_size():
+    program = """(
+        (define fib (memoize (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))) 3))
+        (fib 60)
+        (memo-stats fib)
+    )"""
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.Integer(1548008755920),
+            lobject.ListData([lobject.Integer(i) for i in [58, 61, 58, 3]]),
+        ]
+    )
+
+
+def test_memoize_in_map_and_tail_position():
+    program = """(
+        (define sqr (memoize (lambda (x) (* x x))))
+        (map sqr (list 1 2 1 2))
+        (define call-sqr (lambda (x) (sqr x)))
+        (call-sqr 3)
+        (call-sqr 3)
+        (memo-stats sqr)
+    )"""
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.ListData([lobject.Integer(i) for i in [1, 4, 1, 4]]),
+            lobject.Integer(9),
+            lobject.Integer(9),
+            lobject.ListData([lobject.Integer(i) for i in [3, 3, 0, 3]]),
+        ]
+    )
+
+
+def test_memoize_over_numeric_lists():
+    program = """(
+        (define sqr (memoize (lambda (x) (* x x))))
+        (map sqr (range 0 3 1))
+        (map sqr (list 1 2 1 2))
+        (memo-stats sqr)
+    )"""
+    assert eval_program(program) == lobject.LList(
+        [
+            lobject.ListData([lobject.Integer(i) for i in [0, 1, 4]]),
+            lobject.ListData([lobject.Integer(i) for i in [1, 4, 1, 4]]),
+            lobject.ListData([lobject.Integer(i) for i in [4, 3, 0, 3]]),
+        ]
+    )
+
+
+def test_memoize_errors():
+    with pytest.raises(leval.EvalError):
+        eval_program("(memoize 1)")
+    with pytest.raises(leval.EvalError):
+        eval_program("(memoize (lambda (x) (+ x 1)) 0)")
+    with pytest.raises(leval.EvalError):
+        eval_program("(memo-stats (lambda (x) (+ x 1)))")
+
+
+def test_print_numeric_list(capfd):
+    eval_program("(print (range 0 3 1))")
+    out, _ = capfd.readouterr()
+    assert out == "(0 1 2)\n"
+
+
 def test_sum_n():
     program = """(
         (define sum-n
@@ -233,3 +530,93 @@ def test_print(capfd):
     assert eval_program(program) == lobject.LList([])
     out, err = capfd.readouterr()
     assert out == "10\nfoo bar\n3\n"
+
+
+def test_unbound_symbol():
+    with pytest.raises(leval.EvalError):
+        eval_program("(+ 1 x)")
+
+
+def test_invalid_form_in_untaken_branch():
+    assert eval_program("(if #t 1 (+ 1 2 3))") == lobject.Integer(1)
+    with pytest.raises(leval.EvalError):
+        eval_program("(if #f 1 (+ 1 2 3))")
+
+
+def test_unknown_engine():
+    o = parser.parse(lexer.tokenize("(+ 1 2)"))
+    with pytest.raises(ValueError):
+        leval.evaluate(o, env.new(), engine="unknown")
+
+
+def test_deep_tail_recursion():
+    program = """(
+        (define sum-n
+            (lambda (n a)
+                (if (= n 0) a
+                    (sum-n (- n 1) (+ n a)))))
+        (sum-n 3000 0)
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.Integer((3000 * 3001) // 2)])
+
+
+def test_dynamic_scope():
+    program = """(
+        (define get-x (lambda () (+ x 0)))
+        (define f (lambda (x) (get-x)))
+        (define g (lambda (x) (+ 1 (get-x))))
+        (f 10)
+        (g 20)
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.Integer(10), lobject.Integer(21)])
+
+
+def test_define_param_in_body():
+    program = """(
+        (define f (lambda (x) ((define x (* x 2)) (+ x 1))))
+        (f 10)
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.LList([lobject.Integer(21)])])
+
+
+def test_shared_constants():
+    assert eval_program("(< 1 2)") is lobject.TRUE
+    assert eval_program("(if #f #t #f)") is lobject.FALSE
+
+    o = parser.parse(lexer.tokenize('(if #t "foo" "bar")'))
+    assert leval.evaluate(o, env.new()) is o.object_list[2]
+
+
+def test_list_data_add_in_a_loop():
+    # each + shares acc in a rope instead of copying it.
+    program = """(
+        (define build (lambda (i acc) (if (= i 0) acc (build (- i 1) (+ acc (list i))))))
+        (define xs (build 3000 (list)))
+        (list (length xs) (reduce (lambda (a b) (+ a b)) xs)
+            (length (filter (lambda (x) (> x 1500)) (+ xs (range 0 10 1)))))
+    )"""
+    o = eval_program(program)
+    assert o.object_list[-1] == lobject.ListData(  # type: ignore
+        [lobject.Integer(3000), lobject.Integer(3000 * 3001 // 2), lobject.Integer(1500)]
+    )
+
+
+def test_call_arity_is_checked_before_arguments(capsys):
+    with pytest.raises(leval.EvalError, match="expected=2, actual=1"):
+        eval_program('((define f (lambda (x y) (+ x y))) (f (print "a")))')
+    assert capsys.readouterr().out == ""
+
+    # arguments without a parameter are not evaluated, in tail position too.
+    program = """(
+        (define f (lambda (x) (+ x 1)))
+        (define g (lambda (x) (f x (print "b"))))
+        (+ (f 1 (print "c")) (g 2))
+    )"""
+    assert eval_program(program) == lobject.LList([lobject.Integer(5)])
+    assert capsys.readouterr().out == ""
+
+
+def test_list_of_lambda():
+    result = eval_program("((lambda (x) (+ x 1)) #nil)")
+    assert len(result.object_list) == 1
+    assert isinstance(result.object_list[0], lobject.Lambda)
@@ -0,0 +1,65 @@
+import random
+
+from lisp import hamt
+
+
+class Key(object):
+    # a key with a chosen hash, to make collisions.
+    def __init__(self, value: int, h: int):
+        self.value = value
+        self.h = h
+
+    def __hash__(self) -> int:
+        return self.h
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Key) and self.value == other.value
+
+
+def test_assoc_and_get():
+    root = hamt.EMPTY
+    for i in range(1000):
+        root, added = hamt.assoc(root, i, i * i)
+        assert added
+    root, added = hamt.assoc(root, 10, -1)
+    assert not added
+    assert hamt.get(root, 10) == -1
+    assert hamt.get(root, 999) == 999 * 999
+    assert hamt.get(root, 1000, "missing") == "missing"
+    assert sorted(key for key, _ in hamt.items(root)) == list(range(1000))
+
+
+def test_updates_share_structure():
+    root = hamt.EMPTY
+    for i in range(1000):
+        root, _ = hamt.assoc(root, i, i)
+    updated, _ = hamt.assoc(root, 0, "zero")
+    assert hamt.get(root, 0) == 0
+    assert hamt.get(updated, 0) == "zero"
+    shared = [a is b for a, b in zip(root.entries, updated.entries)]
+    assert shared.count(False) == 1
+
+
+def test_random_against_dict():
+    rng = random.Random(1)
+    hashes = [[v, v % 7, -v, v << 40, 2**63 + v][v % 5] for v in range(100)]
+    root = hamt.EMPTY
+    expected = {}
+    for step in range(3000):
+        v = rng.randrange(100)
+        key = Key(v, hashes[v])
+        if rng.random() < 0.6:
+            root, added = hamt.assoc(root, key, step)
+            assert added == (v not in expected)
+            expected[v] = step
+        else:
+            root, removed = hamt.dissoc(root, key)
+            assert removed == (v in expected)
+            expected.pop(v, None)
+        assert hamt.get(root, key, None) == expected.get(v)
+    assert {key.value: value for key, value in hamt.items(root)} == expected
+
+    for key, _ in list(hamt.items(root)):
+        root, removed = hamt.dissoc(root, key)
+        assert removed
+    assert root.entries == ()
@@ -1,3 +1,5 @@
+import pytest
+
 from lisp import lexer
 from lisp.token import Token, TokenType
 
@@ -64,3 +66,49 @@ def test_float():
         Token(TokenType.FLOAT, "3.14"),
         Token(TokenType.RPAREN, ")"),
     ]
+
+
+def test_trailing_word():
+    tokens = lexer.tokenize("(+ 1 2) abc")
+    assert tokens[-1] == Token(TokenType.SYMBOL, "abc")
+
+
+def test_whitespace_only():
+    assert lexer.tokenize(" \t\r\n ") == []
+
+
+def test_empty_string():
+    tokens = lexer.tokenize('(print "")')
+    assert tokens == [
+        Token(TokenType.LPAREN, "("),
+        Token(TokenType.KEYWORD, "print"),
+        Token(TokenType.STRING, ""),
+        Token(TokenType.RPAREN, ")"),
+    ]
+
+
+def test_unterminated_string():
+    with pytest.raises(lexer.TokenError):
+        lexer.tokenize('(print "Hello)')
+
+
+def test_iter_tokens_matches_tokenize():
+    program = '(define str "Hello World") (print (+ str "!")) (define pi 3.14)'
+    expected = lexer.tokenize(program)
+    for size in range(1, len(program) + 1):
+        chunks = [program[i : i + size] for i in range(0, len(program), size)]
+        assert list(lexer.iter_tokens(chunks)) == expected
+
+
+def test_iter_tokens_unterminated_string():
+    with pytest.raises(lexer.TokenError):
+        list(lexer.iter_tokens(["(print ", '"Hel', "lo)"]))
+
+
+def test_token_spans():
+    program = '(define s  "a b")\n(+ 1\n 2)'
+    starts, ends = lexer.token_spans(program)
+    assert len(starts) == len(lexer.tokenize(program))
+    assert [program[s:e] for s, e in zip(starts, ends)] == [
+        "(", "define", "s", '"a b"', ")", "(", "+", "1", "2", ")"
+    ]
@@ -0,0 +1,200 @@
+import threading
+
+import pytest
+
+from lisp import env, leval, lexer, limits, lobject, parallel, parser
+from lisp.limits import Limits
+from lisp.primitives import EvalError
+
+
+@pytest.fixture(autouse=True, params=leval.ENGINES)
+def engine(request, monkeypatch):
+    monkeypatch.setattr(leval, "DEFAULT_ENGINE", request.param)
+    return request.param
+
+
+COUNT = "(define count (lambda (n) (if (= n 0) 0 (+ 1 (count (- n 1))))))"
+LOOP = "(define loop (lambda (n) (if (= n 0) 0 (loop (- n 1)))))"
+
+
+def integers(*values):
+    return lobject.ListData([lobject.Integer(v) for v in values])
+
+
+def eval_program(program: str, governor: limits.Governor):
+    environment = env.new()
+    result = None
+    with governor:
+        for o in parser.parse_iter(lexer.tokenize(program)):
+            result = leval.evaluate(o, environment)
+    return result
+
+
+def test_steps():
+    # (count 10) makes 11 calls.
+    governor = limits.Governor(Limits(steps=11))
+    assert eval_program(COUNT + "(count 10)", governor).i == 10  # type: ignore
+    assert governor.steps == 11
+
+    with pytest.raises(limits.StepLimitError):
+        eval_program(COUNT + "(count 11)", limits.Governor(Limits(steps=11)))
+
+    # map calls its lambda for every element.
+    with pytest.raises(limits.StepLimitError):
+        eval_program(
+            "(map (lambda (x) (+ x 1)) (list 1 2 3 4))",
+            limits.Governor(Limits(steps=3)),
+        )
+
+
+def test_steps_are_shared_by_the_forms_of_a_governor():
+    governor = limits.Governor(Limits(steps=25))
+    eval_program(COUNT + "(count 10) (count 10)", governor)
+    assert governor.steps == 22
+    with pytest.raises(limits.StepLimitError):
+        eval_program(COUNT + "(count 3)", governor)
+
+
+def test_depth(engine):
+    program = COUNT + "(count 50)"
+    assert eval_program(program, limits.Governor(Limits(depth=51))).i == 50  # type: ignore
+    with pytest.raises(limits.DepthLimitError):
+        eval_program(program, limits.Governor(Limits(depth=50)))
+
+    if engine != "tree":
+        # a tail call replaces the frame of its caller.
+        program = LOOP + "(loop 5000)"
+        assert eval_program(program, limits.Governor(Limits(depth=2))).i == 0  # type: ignore
+
+
+def test_list_size():
+    governor = limits.Governor(Limits(list_size=10))
+    assert eval_program("(length (range 0 10 1))", governor).i == 10  # type: ignore
+    for program in [
+        "(range 0 1000000000 1)",
+        "(list 1 2 3 4 5 6 7 8 9 10 11)",
+        "(+ (range 0 6 1) (range 0 6 1))",
+        "(+ (list 1 2 3 4 5 6) (list 1 2 3 4 5 6))",
+        # the size of a filtered lazy list is only known once it is walked.
+        "(print (+ (filter (lambda (x) (> x 0)) (range 0 10 1))"
+        " (filter (lambda (x) (> x 0)) (range 0 10 1))))",
+    ]:
+        with pytest.raises(limits.ListSizeError):
+            eval_program(program, limits.Governor(Limits(list_size=10)))
+
+
+def test_timeout():
+    now = [0.0]
+
+    def clock():
+        now[0] += 1.0
+        return now[0]
+
+    governor = limits.Governor(Limits(timeout=5.0), clock=clock)
+    with pytest.raises(limits.DeadlineError):
+        eval_program(LOOP + "(loop 100000)", governor)
+
+
+def test_loops_without_frames_are_checked():
+    # the vectorized reduce walks 100 elements.
+    program = "(reduce (lambda (a b) (+ a b)) (range 0 100 1))"
+    assert eval_program(program, limits.Governor(Limits(steps=100))).i == 4950  # type: ignore
+    with pytest.raises(limits.StepLimitError):
+        eval_program(program, limits.Governor(Limits(steps=99)))
+    with pytest.raises(limits.StepLimitError):
+        eval_program(
+            "(length (filter (lambda (x) (< x 0)) (range 0 1000 1)))",
+            limits.Governor(Limits(steps=500)),
+        )
+
+    now = [0.0]
+
+    def clock():
+        now[0] += 1.0
+        return now[0]
+
+    for program in [
+        "(reduce (lambda (a b) (+ a b)) (range 0 100000 1))",
+        "(length (filter (lambda (x) (< x 0)) (range 0 100000 1)))",
+        "(print (map (lambda (x) (* x 2)) (range 0 100000 1)))",
+    ]:
+        with pytest.raises(limits.DeadlineError):
+            eval_program(program, limits.Governor(Limits(timeout=5.0), clock=clock))
+
+
+def test_governors_are_per_thread():
+    results = []
+
+    def run():
+        results.append(eval_program(COUNT + "(count 10)", limits.Governor(Limits())))
+        results.append(limits.state.active)
+
+    governor = limits.Governor(Limits(steps=5))
+    with governor:
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        assert limits.state.active is governor
+    assert results == [lobject.Integer(10), None]
+    assert governor.steps == 0
+
+
+def test_thread_pool_workers_share_the_governor(monkeypatch):
+    monkeypatch.setattr(parallel, "POOL", "thread")
+    monkeypatch.setattr(parallel, "WORKERS", 2)
+    program = "(pmap (lambda (x) (+ x 1)) (list {}) 10)".format(
+        " ".join(str(i) for i in range(200))
+    )
+    try:
+        governor = limits.Governor(Limits(steps=300))
+        eval_program(program, governor)
+        assert governor.steps >= 200
+        with pytest.raises(limits.StepLimitError):
+            eval_program(program, limits.Governor(Limits(steps=150)))
+    finally:
+        parallel.shutdown()
+
+
+def test_process_pool_workers_get_the_limits_left(monkeypatch):
+    monkeypatch.setattr(parallel, "POOL", "process")
+    monkeypatch.setattr(parallel, "WORKERS", 2)
+    forever = "(define forever (lambda (x) (forever x)))"
+    try:
+        # the pool is made before the governor.
+        assert eval_program(
+            "(pmap (lambda (x) (+ x 1)) (list 1 2 3 4) 2)", limits.Governor(Limits())
+        ) == integers(2, 3, 4, 5)
+        with pytest.raises(limits.StepLimitError):
+            eval_program(
+                forever + "(pmap forever (list 1 2 3 4) 2)",
+                limits.Governor(Limits(steps=100000, timeout=10.0)),
+            )
+        with pytest.raises(limits.DeadlineError):
+            eval_program(
+                LOOP + "(pmap loop (list 100000000 1) 1)",
+                limits.Governor(Limits(timeout=0.5)),
+            )
+
+        # the steps of the workers count for the caller.
+        governor = limits.Governor(Limits(steps=1000))
+        eval_program(COUNT + "(pmap count (list 100 100) 1)", governor)
+        assert governor.steps >= 202
+
+        # workers forked under a governor do not keep it.
+        parallel.shutdown()
+        program = LOOP + "(pmap loop (list 100 100) 1)"
+        with pytest.raises(limits.StepLimitError):
+            eval_program(program, limits.Governor(Limits(steps=50)))
+        assert eval_program(program, limits.Governor(Limits())) == integers(0, 0)
+    finally:
+        parallel.shutdown()
+
+
+def test_evaluate_limits():
+    o = parser.parse(lexer.tokenize("(range 0 100 1)"))
+    with pytest.raises(limits.ListSizeError) as e:
+        leval.evaluate(o, env.new(), limits=Limits(list_size=50))
+    # limit errors are evaluation errors.
+    assert isinstance(e.value, EvalError)
+    assert limits.state.active is None
+    assert leval.evaluate(o, env.new()) is not None
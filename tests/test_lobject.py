@@ -0,0 +1,111 @@
+from array import array
+
+import pytest
+
+from lisp import lobject
+
+
+def test_make_bool():
+    assert lobject.make_bool(1 < 2) is lobject.TRUE
+    assert lobject.make_bool(1 > 2) is lobject.FALSE
+    assert lobject.TRUE == lobject.Bool(True)
+
+
+def test_make_integer():
+    assert lobject.make_integer(10) is lobject.make_integer(10)
+    assert lobject.make_integer(10**6) == lobject.Integer(10**6)
+    assert lobject.make_integer(-128) == lobject.Integer(-128)
+
+
+def test_objects_have_no_dict():
+    for obj in [
+        lobject.Integer(1),
+        lobject.Float(1.0),
+        lobject.Symbol("a"),
+        lobject.String("a"),
+        lobject.ListData([]),
+        lobject.LList([]),
+        lobject.Lambda([], []),
+    ]:
+        assert not hasattr(obj, "__dict__")
+
+
+def test_hash():
+    d = {lobject.Integer(1): "a", lobject.Symbol("x"): "b"}
+    assert d[lobject.Integer(1)] == "a"
+    assert d[lobject.Symbol("x")] == "b"
+    assert lobject.Integer(1) != lobject.Symbol("x")
+    assert len({lobject.String("s"), lobject.String("s")}) == 1
+
+
+def test_numeric_list_data():
+    ints = lobject.NumericListData(array("q", [1, 2, 3]))
+    assert ints.list_data == [lobject.Integer(1), lobject.Integer(2), lobject.Integer(3)]
+    assert ints == lobject.ListData(ints.list_data)
+    assert lobject.ListData(ints.list_data) == ints
+    assert ints != lobject.NumericListData(array("d", [1.0, 2.0, 3.0]))
+    assert str(lobject.NumericListData(array("d", [1.5]))) == "(1.5)"
+
+
+def test_make_list_data():
+    assert isinstance(
+        lobject.make_list_data([lobject.Integer(1), lobject.Integer(2)]),
+        lobject.NumericListData,
+    )
+    assert isinstance(lobject.make_list_data([lobject.Float(1.0)]), lobject.NumericListData)
+    assert not isinstance(
+        lobject.make_list_data([lobject.Integer(1), lobject.Float(1.0)]),
+        lobject.NumericListData,
+    )
+    assert not isinstance(
+        lobject.make_list_data([lobject.Integer(2**64)]), lobject.NumericListData
+    )
+
+
+def test_concat():
+    small = lobject.concat(
+        lobject.NumericListData(array("q", [1])), lobject.NumericListData(array("q", [2]))
+    )
+    assert isinstance(small, lobject.NumericListData)
+
+    ints = lobject.NumericListData(array("q", range(100)))
+    strings = lobject.ListData([lobject.String(str(i)) for i in range(100)])
+    both = lobject.concat(ints, strings)
+    assert isinstance(both, lobject.RopeListData)
+    assert both.value_type is None
+    assert both == lobject.ListData(ints.list_data + strings.list_data)
+    assert lobject.ListData(ints.list_data + strings.list_data) == both
+    assert str(both) == str(lobject.ListData(ints.list_data + strings.list_data))
+    assert list(both) == ints.list_data + strings.list_data
+
+    numbers = lobject.concat(ints, ints)
+    assert numbers.value_type is int  # type: ignore
+    flat = numbers.flatten()  # type: ignore
+    assert isinstance(flat, lobject.NumericListData)
+    assert flat == lobject.NumericListData(array("q", list(range(100)) * 2))
+    assert numbers == flat
+
+
+def test_sub_list_shares_storage():
+    ints = lobject.NumericListData(array("q", range(10)))
+    view = lobject.sub_list(ints, 2, 5)
+    assert isinstance(view, lobject.RopeListData)
+    assert view.rope.seq is ints.array
+    assert view.value_type is int
+    assert view == lobject.NumericListData(array("q", [2, 3, 4]))
+    assert lobject.element(view, 1) == lobject.Integer(3)
+    assert lobject.sub_list(ints, 8, 100) == lobject.NumericListData(array("q", [8, 9]))
+
+    strings = lobject.ListData([lobject.String(str(i)) for i in range(5)])
+    view = lobject.sub_list(strings, 1, 5)
+    assert view.rope.seq is strings.list_data  # type: ignore
+    assert lobject.element(view, 0) == lobject.String("1")
+
+    lazy = lobject.NumericLazyListData(lambda: range(10), int, 10)
+    view = lobject.sub_list(lazy, 3, 20)
+    assert isinstance(view, lobject.NumericLazyListData)
+    assert view.size == 7
+    assert lazy.materialized is None
+    assert lobject.element(lazy, 9) == lobject.Integer(9)
+    with pytest.raises(IndexError):
+        lobject.element(lazy, 10)
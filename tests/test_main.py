@@ -0,0 +1,109 @@
+import io
+import json
+
+import pytest
+
+import main
+from lisp.limits import Limits
+
+
+def write_scripts(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.lisp").write_text("(define x 2)\n(print (* x 21))\n")
+    (tmp_path / "sub" / "b.lisp").write_text("(print x)\n")
+    (tmp_path / "sub" / "notes.txt").write_text("(print 1)\n")
+    (tmp_path / "c.lisp").write_text('(print "unterminated)\n')
+
+
+def run_batch(paths, jobs):
+    out = io.StringIO()
+    failures = main.run_batch(paths, jobs=jobs, out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    return failures, {r["path"]: r for r in results}
+
+
+def test_find_scripts(tmp_path):
+    write_scripts(tmp_path)
+    extra = str(tmp_path / "sub" / "notes.txt")
+    assert list(main.find_scripts([str(tmp_path), extra])) == [
+        str(tmp_path / "a.lisp"),
+        str(tmp_path / "c.lisp"),
+        str(tmp_path / "sub" / "b.lisp"),
+        extra,
+    ]
+
+
+def test_batch(tmp_path):
+    write_scripts(tmp_path)
+    for jobs in [1, 2]:
+        failures, results = run_batch([str(tmp_path)], jobs)
+        assert failures == 2
+        assert len(results) == 3
+
+        a = results[str(tmp_path / "a.lisp")]
+        assert a["status"] == "ok"
+        assert a["output"] == "42\n"
+        assert a["seconds"] >= 0
+
+        # every script gets a fresh environment.
+        b = results[str(tmp_path / "sub" / "b.lisp")]
+        assert b["status"] == "error"
+        assert b["error"] == "EvalError: Unbound symbol: x"
+        assert b["location"] == "{}:1:1".format(tmp_path / "sub" / "b.lisp")
+
+        c = results[str(tmp_path / "c.lisp")]
+        assert c["error"].startswith("TokenError")
+
+
+def test_batch_engine(tmp_path):
+    (tmp_path / "deep.lisp").write_text(
+        "(define f (lambda (n) (if (= n 0) 0 (+ 1 (f (- n 1))))))\n(print (f 5000))\n"
+    )
+    # the closure engine runs out of python stack.
+    failures, results = run_batch([str(tmp_path)], 1)
+    assert failures == 1
+    assert results[str(tmp_path / "deep.lisp")]["error"].startswith("RecursionError")
+
+    for jobs in [1, 2]:
+        out = io.StringIO()
+        assert main.run_batch([str(tmp_path)], jobs=jobs, engine="vm", out=out) == 0
+        assert json.loads(out.getvalue())["output"] == "5000\n"
+
+
+def test_batch_limits(tmp_path):
+    (tmp_path / "long.lisp").write_text(
+        "(define f (lambda (n) (if (= n 0) 0 (f (- n 1)))))\n(print 1)\n(print (f 5000))\n"
+    )
+    for jobs in [1, 2]:
+        out = io.StringIO()
+        limits = Limits(steps=1000)
+        assert main.run_batch([str(tmp_path)], jobs=jobs, limits=limits, out=out) == 1
+        result = json.loads(out.getvalue())
+        assert result["error"] == "StepLimitError: Step limit exceeded: 1000"
+        assert result["location"] == "{}:1:37".format(tmp_path / "long.lisp")
+        assert result["output"] == "1\n"
+
+
+def test_batch_arguments(tmp_path, capsys):
+    with pytest.raises(ValueError, match="jobs must be positive"):
+        main.run_batch([str(tmp_path)], jobs=0, out=io.StringIO())
+
+    for argv in [
+        ["--batch", "--jobs", "0", str(tmp_path)],
+        ["--batch", "--profile", str(tmp_path)],
+        ["--batch", "--profile-stacks", "stacks.txt", str(tmp_path)],
+    ]:
+        with pytest.raises(SystemExit) as exc_info:
+            main.main(argv)
+        assert exc_info.value.code == 2
+    err = capsys.readouterr().err
+    assert "--jobs: must be positive: 0" in err
+    assert "cannot be used with --batch" in err
+
+
+def test_workers_must_be_positive(capsys):
+    for workers in ["0", "-1"]:
+        with pytest.raises(SystemExit) as exc_info:
+            main.main(["--workers", workers, "-"])
+        assert exc_info.value.code == 2
+        assert "--workers: must be positive: {}".format(workers) in capsys.readouterr().err
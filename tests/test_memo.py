@@ -0,0 +1,30 @@
+from lisp import lobject, memo
+
+
+def test_lru_cache():
+    cache = memo.LRUCache(2)
+    one, two, three = lobject.Integer(1), lobject.Integer(2), lobject.Integer(3)
+    assert cache.get([one]) is None
+    cache.put([one], lobject.String("a"))
+    cache.put([two], lobject.String("b"))
+    assert cache.get([one]) == lobject.String("a")
+
+    # two is now the least recently used.
+    cache.put([three], lobject.String("c"))
+    assert cache.get([two]) is None
+    assert cache.get([three]) == lobject.String("c")
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 2, 1)
+    assert len(cache.entries) == 2
+
+
+def test_lru_cache_keys():
+    cache = memo.LRUCache()
+    cache.put([lobject.Integer(1)], lobject.String("int"))
+    assert cache.get([lobject.Float(1.0)]) is None
+    assert cache.get([lobject.TRUE]) is None
+
+    # lists have no hash and are never cached.
+    args = [lobject.ListData([lobject.Integer(1)])]
+    cache.put(args, lobject.String("list"))
+    assert cache.get(args) is None
+    assert len(cache.entries) == 1
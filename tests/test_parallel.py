@@ -0,0 +1,125 @@
+import pytest
+
+from lisp import env, leval, lexer, lobject, parallel, parser
+from lisp.primitives import EvalError
+
+
+@pytest.fixture(autouse=True, params=leval.ENGINES)
+def engine(request, monkeypatch):
+    monkeypatch.setattr(leval, "DEFAULT_ENGINE", request.param)
+    return request.param
+
+
+@pytest.fixture(autouse=True, params=parallel.POOLS)
+def pool(request, monkeypatch):
+    monkeypatch.setattr(parallel, "POOL", request.param)
+    monkeypatch.setattr(parallel, "WORKERS", 2)
+    yield request.param
+    # the next test may use another engine, which forked workers inherit.
+    parallel.shutdown()
+
+
+def eval_program(program: str):
+    environment = env.new()
+    result = None
+    for o in parser.parse_iter(lexer.tokenize(program)):
+        result = leval.evaluate(o, environment)
+    return result
+
+
+def integers(*values):
+    return lobject.ListData([lobject.Integer(v) for v in values])
+
+
+def test_pmap():
+    for chunk in [1, 3, 10, 100]:
+        o = eval_program("(pmap (lambda (x) (* x x)) (range 0 10 1) {})".format(chunk))
+        assert o == integers(*[x * x for x in range(10)])
+
+
+def test_pmap_default_chunk_size():
+    o = eval_program(
+        "(length (pmap (lambda (x) (+ x 1)) (range 0 {} 1)))".format(
+            parallel.DEFAULT_CHUNK_SIZE * 3 + 1
+        )
+    )
+    assert o == lobject.Integer(parallel.DEFAULT_CHUNK_SIZE * 3 + 1)
+
+
+def test_pmap_objects():
+    o = eval_program('(pmap (lambda (s) (+ s "!")) (list "a" "b" "c" "d") 3)')
+    assert o == lobject.ListData([lobject.String(s + "!") for s in "abcd"])
+
+
+def test_pmap_captured_values():
+    o = eval_program(
+        """
+        (define k 10)
+        (define scale (lambda (x) (* x k)))
+        (define shift (lambda (x) (+ (scale x) 1)))
+        (pmap (lambda (x) (shift x)) (list 1 2 3 4) 2)
+        """
+    )
+    assert o == integers(11, 21, 31, 41)
+
+
+def test_pfilter():
+    for chunk in [1, 2, 5]:
+        o = eval_program(
+            "(pfilter (lambda (x) (= 0 (% x 3))) (list 1 3 4 6 7 9 10) {})".format(chunk)
+        )
+        assert o == integers(3, 6, 9)
+
+    o = eval_program("(pfilter (lambda (x) (> x 100)) (range 0 10 1) 2)")
+    assert o == integers()
+
+
+def test_preduce():
+    for chunk in [2, 3, 1000]:
+        o = eval_program(
+            "(preduce (lambda (a b) (+ a b)) (range 0 100 1) {})".format(chunk)
+        )
+        assert o == lobject.Integer(sum(range(100)))
+
+    # associative but not commutative, so the order of the chunks matters.
+    o = eval_program(
+        '(preduce (lambda (a b) (+ a b)) (list "a" "b" "c" "d" "e" "f" "g") 2)'
+    )
+    assert o == lobject.String("abcdefg")
+
+    o = eval_program(
+        """
+        (define larger (lambda (a b) (if (> a b) a b)))
+        (preduce (lambda (a b) (larger a b)) (list 3 9 2 7 11 4 1) 2)
+        """
+    )
+    assert o == lobject.Integer(11)
+
+
+def test_pmap_errors():
+    with pytest.raises(EvalError, match="Unbound symbol: y"):
+        eval_program("(pmap (lambda (x) (+ x y)) (range 0 10 1) 2)")
+    with pytest.raises(EvalError, match="Invalid fitler result"):
+        eval_program("(pfilter (lambda (x) (+ x 1)) (range 0 10 1) 2)")
+    with pytest.raises(EvalError, match="chunk size"):
+        eval_program("(pmap (lambda (x) (+ x 1)) (range 0 10 1) 0)")
+    with pytest.raises(EvalError, match="Invalid number of arguments for pmap"):
+        eval_program("(pmap (lambda (x) (+ x 1)))")
+    with pytest.raises(EvalError, match="Not a lambda"):
+        eval_program("(pfilter 1 (list 1 2))")
+    with pytest.raises(EvalError, match="chunk size"):
+        eval_program("(preduce (lambda (a b) (+ a b)) (range 0 10 1) 1)")
+    with pytest.raises(EvalError, match="reduce of empty list"):
+        eval_program("(preduce (lambda (a b) (+ a b)) (list) 2)")
+
+
+def test_chunks_and_join():
+    numbers = lobject.pack_values(range(7), int)
+    parts = parallel.chunks(numbers, 3)
+    assert [len(part.array) for part in parts] == [3, 3, 1]  # type: ignore
+    joined = parallel.join(parts)
+    assert isinstance(joined, lobject.NumericListData)
+    assert joined == numbers
+
+    mixed = parallel.join([integers(1), lobject.ListData([lobject.String("a")])])
+    assert mixed == lobject.ListData([lobject.Integer(1), lobject.String("a")])
@@ -1,3 +1,5 @@
+import pytest
+
 from lisp import lexer, lobject, parser
 
 
@@ -55,3 +57,42 @@ def test_area_of_circle_str():
     tokens = lexer.tokenize(programs)
     result = parser.parse(tokens)
     assert "{}".format(result) == "((define r 10) (* pi (* r r)))"
+
+
+def test_parse_iter():
+    tokens = lexer.iter_tokens(["(define r 10) (* r", " r) r"])
+    forms = parser.parse_iter(tokens)
+
+    assert next(forms) == lobject.LList(
+        [lobject.Keyword("define"), lobject.Symbol("r"), lobject.Integer(10)]
+    )
+    assert next(forms) == lobject.LList(
+        [lobject.BinaryOp("*"), lobject.Symbol("r"), lobject.Symbol("r")]
+    )
+    assert next(forms) == lobject.Symbol("r")
+    assert list(forms) == []
+
+
+def test_parse_iter_unterminated():
+    with pytest.raises(parser.ParseError):
+        list(parser.parse_iter(lexer.tokenize("(+ 1 (* 2 3)")))
+
+
+def test_parse_iter_unexpected_rparen():
+    with pytest.raises(parser.ParseError):
+        list(parser.parse_iter(lexer.tokenize("(+ 1 2))")))
+
+
+def test_shared_atoms():
+    result = parser.parse(lexer.tokenize('((* r r) "s" "s" 1000 1000)'))
+    mul = result.object_list[0]
+    assert mul.object_list[1] is mul.object_list[2]
+    assert result.object_list[1] is result.object_list[2]
+    assert result.object_list[3] is result.object_list[4]
+
+
+def test_parse_iter_indexed():
+    tokens = lexer.tokenize("(define a 1) a (+ a (* a 2))")
+    result = list(parser.parse_iter_indexed(tokens))
+    assert [index for index, _ in result] == [0, 5, 6]
+    assert result[1][1] == lobject.Symbol("a")
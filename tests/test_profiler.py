@@ -0,0 +1,132 @@
+import pytest
+
+from lisp import env, leval, lexer, lobject, parallel, parser, profiler
+
+PROGRAM = """
+(define fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))
+(define loop (lambda (i) (if (= i 0) 0 (loop (- i 1)))))
+(fib 5)
+(loop 100)
+(map (lambda (x) (* x x)) (list 1 2 3))
+"""
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self) -> int:
+        return self.now
+
+
+def run(program: str, prof: profiler.Profiler):
+    environment = env.new()
+    results = []
+    for form in parser.parse_iter(lexer.tokenize(program)):
+        results.append(leval.evaluate(form, environment, profiler=prof))
+    return results
+
+
+def test_self_and_total_time():
+    clock = FakeClock()
+    prof = profiler.Profiler(clock)
+    prof.enter("main")
+    clock.now += 10
+    prof.enter("f")
+    clock.now += 100
+    prof.enter("f")
+    clock.now += 1000
+    prof.exit()
+    prof.exit()
+    prof.exit()
+
+    main, f = prof.stats["main"], prof.stats["f"]
+    assert (main.calls, main.self_time, main.total_time) == (1, 10, 1110)
+    # a recursive call is counted once in the total time.
+    assert (f.calls, f.self_time, f.total_time) == (2, 1100, 1100)
+    assert prof.collapsed() == "main;f;f 1\n"
+
+
+def test_calls():
+    prof = profiler.Profiler()
+    results = run(PROGRAM, prof)
+    assert results[2:4] == [lobject.Integer(5), lobject.Integer(0)]
+    assert prof.stats["fib"].calls == 15
+    # every tail call is a call of its own.
+    assert prof.stats["loop"].calls == 101
+    assert prof.stats["(lambda (x) (* x x))"].calls == 3
+    assert prof.stats["(fib 5)"].calls == 1
+    assert prof.frames == []
+
+
+def test_collapsed_stacks():
+    clock = FakeClock()
+
+    def tick() -> int:
+        # every frame takes at least the microsecond the output resolves.
+        clock.now += 1000
+        return clock.now
+
+    prof = profiler.Profiler(tick)
+    run(PROGRAM, prof)
+    stacks = dict(line.rsplit(" ", 1) for line in prof.collapsed().splitlines())
+    assert "(fib 5);fib;fib;fib;fib" in stacks
+    # a tail call ends the frame of its caller.
+    assert "(loop 100);loop" in stacks
+    assert "(loop 100);loop;loop" not in stacks
+    assert "(map (lambda (x) (* x x)) (list 1 2 3));(lambda (x) (* x x))" in stacks
+
+
+def test_report():
+    prof = profiler.Profiler()
+    run(PROGRAM, prof)
+    lines = prof.report(sort="calls", limit=2).splitlines()
+    assert lines[0].split() == ["calls", "self(ms)", "total(ms)", "name"]
+    assert lines[1].split()[0] == "101" and lines[1].endswith("loop")
+    assert lines[2].split()[0] == "15" and lines[2].endswith("fib")
+    assert len(lines) == 3
+    with pytest.raises(ValueError):
+        prof.report(sort="name")
+
+
+def test_memoized_calls():
+    prof = profiler.Profiler()
+    run("(define f (memoize (lambda (n) (* n 2))))\n(f 1)\n(f 1)", prof)
+    assert prof.stats["f"].calls == 2
+
+
+def test_frames_end_on_error():
+    prof = profiler.Profiler()
+    with pytest.raises(leval.EvalError):
+        run("(define f (lambda (x) (+ x y)))\n(f 1)", prof)
+    assert prof.frames == []
+    assert prof.stats["f"].calls == 1
+    # evaluation without a profiler is not profiled.
+    run("(define g (lambda (x) (+ x 0)))\n(g 1)", profiler.Profiler())
+    leval.evaluate(parser.parse(lexer.tokenize("(+ 1 2)")), env.new())
+    assert leval._state.active is None
+
+
+def test_thread_pool_workers_are_not_profiled(monkeypatch):
+    monkeypatch.setattr(parallel, "POOL", "thread")
+    monkeypatch.setattr(parallel, "WORKERS", 4)
+    prof = profiler.Profiler()
+    program = """
+    (define f (lambda (x) (g x)))
+    (define g (lambda (x) (+ x 1)))
+    (f 1)
+    (pmap f (range 0 2000 1) 10)
+    """
+    try:
+        run(program, prof)
+    finally:
+        parallel.shutdown()
+    # only the calls of the thread that evaluates the program are reported.
+    assert prof.frames == []
+    assert prof.stats["f"].calls == 1
+    assert prof.stats["g"].calls == 1
+
+
+def test_long_names_are_shortened():
+    o = parser.parse(lexer.tokenize("(list {})".format(" ".join(["1"] * 100))))
+    assert len(profiler.form_name(o)) == profiler.MAX_NAME_LENGTH
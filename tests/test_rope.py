@@ -0,0 +1,109 @@
+import random
+from array import array
+
+import pytest
+
+from lisp import rope
+
+
+def check_balanced(r: rope.Rope) -> int:
+    # the depth of r, checking that every node is balanced and sized.
+    if r.seq is not None:
+        assert r.depth == 0
+        return 0
+    left = check_balanced(r.left)  # type: ignore
+    right = check_balanced(r.right)  # type: ignore
+    assert abs(left - right) <= 1
+    assert r.size == r.left.size + r.right.size  # type: ignore
+    assert r.depth == max(left, right) + 1
+    return r.depth
+
+
+def from_pieces(pieces):
+    r = rope.EMPTY
+    for piece in pieces:
+        r = rope.concat(r, rope.leaf(piece))
+    return r
+
+
+def test_append():
+    r = rope.EMPTY
+    for i in range(1000):
+        r = rope.concat(r, rope.leaf([i]))
+    assert list(rope.values(r)) == list(range(1000))
+    assert len(r) == 1000
+    check_balanced(r)
+    # small leaves are merged.
+    assert all(stop - start == rope.LEAF_SIZE for _, start, stop in list(rope.leaves(r))[:-1])
+
+
+def test_concat_shares():
+    left = rope.leaf(list(range(100)))
+    right = rope.leaf(list(range(100, 300)))
+    r = rope.concat(left, right)
+    assert r.left is left and r.right is right
+    assert list(rope.values(r)) == list(range(300))
+
+
+def test_random_concat_index_and_split():
+    rng = random.Random(1)
+    pieces = []
+    start = 0
+    for _ in range(300):
+        size = rng.randint(0, 100)
+        pieces.append(list(range(start, start + size)))
+        start += size
+    # concatenated in a random tree shape.
+    ropes = [rope.leaf(piece) for piece in pieces]
+    while len(ropes) > 1:
+        i = rng.randrange(len(ropes) - 1)
+        ropes[i : i + 2] = [rope.concat(ropes[i], ropes[i + 1])]
+    r = ropes[0]
+    check_balanced(r)
+    assert list(rope.values(r)) == list(range(start))
+
+    for i in [0, 1, 63, 64, 1000, start - 1]:
+        assert rope.index(r, i) == i
+    with pytest.raises(IndexError):
+        rope.index(r, start)
+
+    for i in [0, 5, 64, start // 2, start - 1, start]:
+        head, tail = rope.split(r, i)
+        check_balanced(head)
+        check_balanced(tail)
+        assert list(rope.values(head)) == list(range(i))
+        assert list(rope.values(tail)) == list(range(i, start))
+
+    assert list(rope.values(rope.sub(r, 100, 250))) == list(range(100, 250))
+    assert list(rope.values(rope.sub(r, 250, 100))) == []
+
+
+def test_split_shares_leaves():
+    values = list(range(1000))
+    head, tail = rope.split(rope.leaf(values), 400)
+    assert head.seq is values and tail.seq is values
+    assert (tail.start, tail.size) == (400, 600)
+
+
+def test_typecode():
+    ints = from_pieces([array("q", range(100)), array("q", range(5))])
+    assert ints.typecode == "q"
+    assert list(rope.values(ints)) == list(range(100)) + list(range(5))
+
+    assert from_pieces([array("q", range(100)), array("d", [1.0])]).typecode is None
+    assert from_pieces([array("q", range(100)), [1]]).typecode is None
+
+
+class NoIter(list):
+    def __iter__(self):
+        raise AssertionError("walked from the start")
+
+
+def test_sub_does_not_walk_from_the_start():
+    objects = rope.leaf(NoIter(range(1000)))
+    assert list(rope.values(rope.sub(objects, 990, 995))) == [990, 991, 992, 993, 994]
+
+    numbers = rope.concat(rope.leaf(array("q", range(1000))), rope.leaf(array("q", [7])))
+    assert list(rope.values(rope.sub(numbers, 998, 1001))) == [998, 999, 7]
+    floats = rope.leaf(array("d", [0.5, 1.5, 2.5]))
+    assert list(rope.values(rope.sub(floats, 1, 3))) == [1.5, 2.5]
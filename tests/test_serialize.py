@@ -0,0 +1,176 @@
+import pytest
+
+from lisp import env, leval, lexer, lobject, parser, serialize
+
+
+def round_trip(o: lobject.Object) -> lobject.Object:
+    return serialize.loads(serialize.dumps(o))
+
+
+@pytest.mark.parametrize(
+    "o",
+    [
+        lobject.Integer(0),
+        lobject.Integer(-1),
+        lobject.Integer(2 ** 70),
+        lobject.Integer(-(2 ** 70)),
+        lobject.Float(-1.25),
+        lobject.String(""),
+        lobject.String("héllo wörld"),
+        lobject.Symbol("x"),
+        lobject.Keyword("map"),
+        lobject.BinaryOp("<="),
+        lobject.TRUE,
+        lobject.FALSE,
+        lobject.If,
+        lobject.Void,
+        lobject.LList([]),
+        lobject.ListData([lobject.Integer(1), lobject.String("a")]),
+        lobject.pack_values([1, -2, 2 ** 62], int),
+        lobject.pack_values([0.5, -1.5], float),
+    ],
+)
+def test_round_trip(o):
+    assert round_trip(o) == o
+
+
+def test_round_trip_program():
+    program = """
+(define fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))
+(print "fib" (fib 10) 1.5 #t #nil)
+"""
+    forms = lobject.LList(list(parser.parse_iter(lexer.tokenize(program))))
+    assert round_trip(forms) == forms
+
+
+def test_round_trip_lambda():
+    lambda_obj = leval.evaluate(
+        parser.parse(lexer.tokenize("(lambda (x y) (+ x y))")), env.new()
+    )
+    result = round_trip(lambda_obj)
+    assert isinstance(result, lobject.Lambda)
+    assert result.params == ["x", "y"]
+    environment = env.new()
+    environment.set("f", result)
+    result = leval.evaluate(parser.parse(lexer.tokenize("(f 2 3)")), environment)
+    assert result == lobject.Integer(5)
+
+
+def test_lazy_list_is_materialized():
+    lazy = leval.evaluate(parser.parse(lexer.tokenize("(range 0 5 1)")), env.new())
+    result = round_trip(lazy)
+    assert isinstance(result, lobject.NumericListData)
+    assert list(result.array) == [0, 1, 2, 3, 4]
+
+
+def test_rope_is_flattened():
+    numbers = lobject.concat(
+        lobject.pack_values(range(100), int), lobject.pack_values(range(100), int)
+    )
+    assert isinstance(numbers, lobject.RopeListData)
+    result = round_trip(numbers)
+    assert isinstance(result, lobject.NumericListData)
+    assert list(result.array) == list(range(100)) * 2
+
+    strings = lobject.ListData([lobject.String(str(i)) for i in range(100)])
+    result = round_trip(lobject.concat(strings, strings))
+    assert result == lobject.ListData(strings.list_data * 2)
+
+
+def test_hash_map():
+    hash_map = (
+        lobject.HashMap()
+        .assoc(lobject.String("a"), lobject.ListData([lobject.Integer(1)]))
+        .assoc(lobject.Integer(2), lobject.Void)
+    )
+    assert round_trip(hash_map) == hash_map
+    assert round_trip(lobject.HashMap()) == lobject.HashMap()
+
+
+def test_hash_map_with_unhashable_key():
+    # a hash map whose key is a list, as a forged or corrupted file could hold.
+    key = serialize.dumps(lobject.ListData([lobject.Integer(1)]))
+    value = serialize.dumps(lobject.Integer(2))
+    header = len(serialize.MAGIC) + 2
+    data = key[:header] + bytes([serialize._HASH_MAP, 2]) + key[header:] + value[header:]
+    with pytest.raises(serialize.SerializeError, match="Invalid hash map key"):
+        serialize.loads(data)
+
+    data = key[:header] + bytes([serialize._HASH_MAP, 1]) + key[header:]
+    with pytest.raises(serialize.SerializeError):
+        serialize.loads(data)
+
+
+def test_symbols_are_interned_once():
+    o = parser.parse(lexer.tokenize("(+ abc (+ abc abc))"))
+    data = serialize.dumps(o)
+    assert data.count(b"abc") == 1
+    result = round_trip(o)
+    inner = result.object_list[2].object_list
+    assert result.object_list[1] is inner[1] is inner[2]
+    assert result.object_list[0] is inner[0]
+
+
+def test_small_integers_take_one_byte():
+    small = serialize.dumps(lobject.Integer(-64))
+    large = serialize.dumps(lobject.Integer(64))
+    assert len(large) == len(small) + 1
+
+
+def test_numeric_list_is_raw():
+    values = lobject.pack_values(range(1000), int)
+    assert len(serialize.dumps(values)) < 1000 * 8 + 16
+
+
+def test_deep_nesting():
+    o: lobject.Object = lobject.Integer(1)
+    for _ in range(20000):
+        o = lobject.LList([o])
+    result = round_trip(o)
+    for _ in range(20000):
+        assert isinstance(result, lobject.LList)
+        result = result.object_list[0]
+    assert result == lobject.Integer(1)
+
+
+def test_load_file(tmp_path):
+    path = str(tmp_path / "forms.lpb")
+    o = parser.parse(lexer.tokenize('(print "a" (list 1 2))'))
+    serialize.dump(o, path)
+    assert serialize.load(path) == o
+
+
+def test_load_empty_file(tmp_path):
+    path = tmp_path / "empty.lpb"
+    path.write_bytes(b"")
+    with pytest.raises(serialize.SerializeError):
+        serialize.load(str(path))
+
+
+def test_bad_magic():
+    with pytest.raises(serialize.SerializeError):
+        serialize.loads(b"XXXX\x01\x00\x00")
+
+
+def test_bad_version():
+    data = bytearray(serialize.dumps(lobject.Integer(1)))
+    data[len(serialize.MAGIC)] = serialize.FORMAT_VERSION + 1
+    with pytest.raises(serialize.SerializeError, match="version"):
+        serialize.loads(bytes(data))
+
+
+def test_truncated():
+    data = serialize.dumps(parser.parse(lexer.tokenize("(list 1 2 3)")))
+    for end in range(len(data) - 1):
+        with pytest.raises(serialize.SerializeError):
+            serialize.loads(data[:end])
+
+
+def test_trailing_data():
+    with pytest.raises(serialize.SerializeError):
+        serialize.loads(serialize.dumps(lobject.Integer(1)) + b"\x00")
+
+
+def test_cannot_serialize():
+    with pytest.raises(serialize.SerializeError):
+        serialize.dumps(object())  # type: ignore
@@ -0,0 +1,98 @@
+import pytest
+
+from lisp import env, leval, lexer, parser, profiler, source
+
+PROGRAM = """(define sq (lambda (x) (* x x)))
+(define f (lambda (n)
+  (if (< n 1) (+ n "a") (f (- n 1)))))
+(sq 4)
+  (print (f 3))
+(print (sq y))
+"""
+
+
+def run(program: str, engine: str, src: source.Source):
+    environment = env.new()
+    for first_token, form in parser.parse_iter_indexed(lexer.tokenize(program)):
+        src.add_form(form, first_token)
+        try:
+            leval.evaluate(form, environment, engine=engine)
+        except leval.EvalError as e:
+            src.locate_error(e, form, first_token)
+            raise
+
+
+def test_position():
+    src = source.Source("test", "ab\ncd\n\nef")
+    assert src.position(0) == source.Position(1, 1)
+    assert src.position(4) == source.Position(2, 2)
+    assert src.position(7) == source.Position(4, 1)
+
+
+def test_locate():
+    src = source.Source("test", PROGRAM)
+    forms = list(parser.parse_iter_indexed(lexer.tokenize(PROGRAM)))
+    first_token, form = forms[1]
+    assert src.locate(form, first_token) == source.Span(
+        source.Position(2, 1), source.Position(3, 39)
+    )
+    body = form.object_list[2].object_list[2]
+    then_branch = body.object_list[2]
+    assert str(then_branch) == "(+ n a)"
+    assert src.locate(form, first_token, then_branch) == source.Span(
+        source.Position(3, 15), source.Position(3, 24)
+    )
+    # an equal list elsewhere is not the same node.
+    assert src.locate(forms[0][1], forms[0][0], then_branch) is None
+
+
+def test_index_forms():
+    tokens = lexer.tokenize(PROGRAM)
+    forms = [form for _, form in parser.parse_iter_indexed(tokens)]
+    assert list(source.index_forms(forms)) == list(parser.parse_iter_indexed(tokens))
+
+
+@pytest.mark.parametrize("engine", leval.ENGINES)
+def test_error_in_called_definition(engine):
+    src = source.Source("test.lisp", PROGRAM)
+    with pytest.raises(leval.EvalError) as e:
+        run(PROGRAM[: PROGRAM.index("(print (sq y))")], engine, src)
+    assert e.value.location == "test.lisp:3:15"
+
+
+@pytest.mark.parametrize("engine", leval.ENGINES)
+def test_unbound_symbol(engine):
+    program = "(define a 1)\n(list a\n  (+ a b))"
+    src = source.Source("test.lisp", program)
+    with pytest.raises(leval.EvalError) as e:
+        run(program, engine, src)
+    assert e.value.location == "test.lisp:3:3"
+
+
+@pytest.mark.parametrize("engine", leval.ENGINES)
+def test_error_in_keyword_lambda(engine):
+    program = "(map (lambda (x) (if x 1 2))\n  (list 1 2))"
+    src = source.Source("test.lisp", program)
+    with pytest.raises(leval.EvalError) as e:
+        run(program, engine, src)
+    # the tree engine evaluates the body as a new list, found in no form,
+    # so the error is located at the enclosing form.
+    expected = "test.lisp:1:1" if engine == "tree" else "test.lisp:1:18"
+    assert e.value.location == expected
+
+
+def test_source_file_is_read_when_needed(tmp_path):
+    path = tmp_path / "script.lisp"
+    path.write_text("(define a 1)\n\n(+ a c)\n")
+    src = source.Source(str(path))
+    with pytest.raises(leval.EvalError) as e:
+        run(path.read_text(), "closure", src)
+    assert e.value.location == "{}:3:1".format(path)
+
+
+def test_profiler_location():
+    prof = profiler.Profiler()
+    prof.location = "test.lisp:4"
+    leval.evaluate(parser.parse(lexer.tokenize("(+ 1 2)")), env.new(), profiler=prof)
+    assert list(prof.stats) == ["test.lisp:4 (+ 1 2)"]
+    assert prof.location is None
@@ -0,0 +1,60 @@
+import pytest
+
+from lisp import env, leval, lexer, lobject, parser, vectorize
+
+
+def make_lambda(program: str) -> lobject.Lambda:
+    return leval.evaluate(parser.parse(lexer.tokenize(program)), env.new())
+
+
+def test_analyze_arithmetic():
+    func, result_type = vectorize.analyze(make_lambda("(lambda (x) (* x x))"), int)
+    assert result_type is int
+    assert func(7) == 49
+
+
+def test_analyze_comparison():
+    func, result_type = vectorize.analyze(make_lambda("(lambda (x) (< x 10))"), int)
+    assert result_type is bool
+    assert func(3) is True
+    assert func(30) is False
+
+
+def test_analyze_if_and_two_params():
+    lambda_obj = make_lambda("(lambda (x y) (if (> x y) x y))")
+    func, result_type = vectorize.analyze(lambda_obj, int)
+    assert result_type is int
+    assert func(3, 5) == 5
+
+
+def test_analyze_int_division():
+    func, _ = vectorize.analyze(make_lambda("(lambda (x) (/ x 2))"), int)
+    assert func(-7) == -4
+    func, result_type = vectorize.analyze(make_lambda("(lambda (x) (/ x 2.0))"), float)
+    assert result_type is float
+    assert func(-7.0) == -3.5
+
+
+@pytest.mark.parametrize(
+    "program, value_type",
+    [
+        # types the engines reject are left to them, so they raise as before.
+        ("(lambda (x) (+ x 1.5))", int),
+        ("(lambda (x) (< x 1.5))", float),
+        ("(lambda (x) (% x 2.0))", float),
+        ("(lambda (x) (+ (< x 1) 1))", int),
+        ("(lambda (x) (if (< x 1) x #f))", int),
+        ('(lambda (x) (+ x "a"))', int),
+        # other symbols are looked up in the dynamic environment.
+        ("(lambda (x) (+ x y))", int),
+        ("(lambda (x) (f x))", int),
+        ("(lambda (x) ((+ x 1)))", int),
+    ],
+)
+def test_analyze_rejects(program, value_type):
+    assert vectorize.analyze(make_lambda(program), value_type) is None
+
+
+def test_analyze_is_cached():
+    lambda_obj = make_lambda("(lambda (x) (* x x))")
+    assert vectorize.analyze(lambda_obj, int) is vectorize.analyze(lambda_obj, int)
@@ -0,0 +1,92 @@
+from lisp import env, lexer, lobject, parser, vm
+from lisp.vm import Op
+
+
+def compile_program(program: str) -> vm.Code:
+    return vm.compile_obj(parser.parse(lexer.tokenize(program)))
+
+
+def opcodes(code: vm.Code):
+    return [Op(op) for op in code.ops[::2]]
+
+
+def test_binary_op():
+    code = compile_program("(+ 1 2)")
+    assert opcodes(code) == [Op.CONST, Op.CONST, Op.BINARY_OP, Op.RETURN]
+    assert vm.run(code, env.new()) == lobject.Integer(3)
+
+
+def test_if_in_tail_position():
+    code = compile_program("(if (< 1 2) 1 2)")
+    assert Op.JUMP not in opcodes(code)
+    assert opcodes(code).count(Op.RETURN) == 2
+
+
+def test_tail_call():
+    program = """(
+        (define f (lambda (n) (if (= n 0) 0 (f (- n 1)))))
+        (f 10)
+    )"""
+    code = compile_program(program)
+    assert Op.CALL in opcodes(code)
+
+    environment = env.new()
+    assert vm.run(code, environment) == lobject.LList([lobject.Integer(0)])
+
+    body = environment.get("f").bytecode  # type: ignore
+    assert Op.TAIL_CALL in opcodes(body)
+    assert Op.LOAD_LOCAL in opcodes(body)
+
+
+def test_disassemble():
+    code = compile_program("(define r 10)")
+    assert str(code).splitlines() == [
+        "   0 CONST            0 10",
+        "   2 STORE            0 r",
+        "   4 RETURN           0",
+    ]
+
+
+def test_deep_recursion():
+    program = """(
+        (define count (lambda (n) (if (= n 0) 0 (+ 1 (count (- n 1))))))
+        (count 20000)
+    )"""
+    assert vm.run(compile_program(program), env.new()) == lobject.LList(
+        [lobject.Integer(20000)]
+    )
+
+
+def test_deep_recursion_through_keywords():
+    # map and reduce call depth on the frame stack of the vm, not through
+    # python calls, so this is far deeper than the python recursion limit.
+    program = """(
+        (define depth
+            (lambda (n)
+                (if (= n 0) 0
+                    (+ 1 (reduce (lambda (a b) (+ a b)) (map depth (list (- n 1) 0)))))))
+        (depth 5000)
+    )"""
+    assert vm.run(compile_program(program), env.new()) == lobject.LList(
+        [lobject.Integer(5000)]
+    )
+
+
+def test_task():
+    program = """(
+        (define f (lambda (n) (if (= n 0) 0 (+ 1 (f (- n 1))))))
+        (reduce (lambda (a b) (+ a b)) (map (lambda (x) (f x)) (list 1 2 3)))
+    )"""
+    task = vm.Task(compile_program(program), env.new())
+    runs = 1
+    while not task.run(2):
+        runs += 1
+    assert task.done
+    assert task.result == lobject.LList([lobject.Integer(6)])
+    # 3 + 2 calls by map and reduce and 2 + 3 + 4 calls of f, in runs of 2
+    # calls, and a last run after the last call.
+    assert runs == 8
+
+    task = vm.Task(compile_program("(+ 1 2)"), env.new())
+    assert task.run(1)
+    assert task.result == lobject.Integer(3)